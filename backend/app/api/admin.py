@@ -0,0 +1,70 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Response, status
+from fastapi.responses import PlainTextResponse
+from app.core.profiling import is_admin_key, request_profiler
+from app.schemas.admin import ProfilingConfig, ProfilingStatus
+
+router = APIRouter()
+
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)) -> None:
+    """Allow the request only with the configured admin key; admin routes do not exist without one."""
+    if x_admin_key is None or not is_admin_key(x_admin_key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not Found"
+        )
+
+
+def _status() -> ProfilingStatus:
+    return ProfilingStatus(
+        enabled=request_profiler.enabled,
+        sample_rate=request_profiler.sample_rate,
+        worker_pid=os.getpid(),
+        profiles=[profile.summary() for profile in request_profiler.profiles()],
+    )
+
+
+@router.get("/profiling", response_model=ProfilingStatus, dependencies=[Depends(require_admin)])
+async def get_profiling():
+    """Profiling settings and the profiles currently held."""
+    return _status()
+
+
+@router.put("/profiling", response_model=ProfilingStatus, dependencies=[Depends(require_admin)])
+async def configure_profiling(config: ProfilingConfig):
+    """
+    Turn request profiling on or off at runtime.
+
+    This configures only the worker process that serves the call (see
+    `worker_pid`); with several workers, each holds its own settings and profiles.
+
+    While enabled, `sample_rate` of requests are profiled, and so is any request
+    sent with the admin key in the X-Profile header. Profiled responses carry an
+    X-Profile-Id header.
+    """
+    request_profiler.configure(config.enabled, config.sample_rate)
+    return _status()
+
+
+@router.get("/profiling/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: int = Path(..., ge=1)):
+    """Download a profile as folded stacks, for flamegraph.pl or speedscope."""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return PlainTextResponse(
+        profile.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
+
+
+@router.delete("/profiling", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
+async def clear_profiles():
+    """Drop all held profiles."""
+    request_profiler.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,130 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, status
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.deps import Principal, get_current_principal
+from app.core.executors import db_executor
+from app.models.alert import PriceAlert
+from app.schemas.alert import PriceAlertCreate, PriceAlertUpdate, PriceAlert as PriceAlertSchema
+from app.services.alerts import AlertRef, alert_engine
+
+router = APIRouter()
+
+
+def _to_ref(alert: PriceAlert) -> AlertRef:
+    return AlertRef(alert.id, alert.user_id, alert.symbol, alert.direction, alert.threshold)
+
+
+def _get_alert(db: Session, user_id: int, alert_id: int) -> PriceAlert:
+    alert = db.query(PriceAlert).filter(PriceAlert.id == alert_id, PriceAlert.user_id == user_id).first()
+    if alert is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert not found"
+        )
+    return alert
+
+
+def _list_alerts(db: Session, user_id: int, active: Optional[bool]) -> List[PriceAlert]:
+    query = db.query(PriceAlert).filter(PriceAlert.user_id == user_id)
+    if active is not None:
+        query = query.filter(PriceAlert.active.is_(active))
+    return query.order_by(PriceAlert.id).all()
+
+
+def _create_alert(db: Session, user_id: int, alert_in: PriceAlertCreate) -> PriceAlert:
+    count = db.query(PriceAlert).filter(PriceAlert.user_id == user_id, PriceAlert.active.is_(True)).count()
+    if count >= settings.ALERTS_MAX_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.ALERTS_MAX_PER_USER} active alerts are allowed per user"
+        )
+
+    alert = PriceAlert(user_id=user_id, **alert_in.model_dump())
+    db.add(alert)
+    db.commit()
+    db.refresh(alert)
+    return alert
+
+
+def _update_alert(db: Session, user_id: int, alert_id: int, alert_in: PriceAlertUpdate) -> PriceAlert:
+    alert = _get_alert(db, user_id, alert_id)
+    if not alert.active:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Alert has already been triggered"
+        )
+    for field, value in alert_in.model_dump(exclude_none=True).items():
+        setattr(alert, field, value)
+    db.commit()
+    db.refresh(alert)
+    return alert
+
+
+def _delete_alert(db: Session, user_id: int, alert_id: int) -> None:
+    db.delete(_get_alert(db, user_id, alert_id))
+    db.commit()
+
+
+@router.get("", response_model=List[PriceAlertSchema])
+async def list_alerts(
+    active: Optional[bool] = Query(None, description="Only active (true) or triggered (false) alerts"),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """List the current user's price alerts."""
+    return await db_executor.run(_list_alerts, db, current_user.id, active)
+
+
+@router.post("", response_model=PriceAlertSchema, status_code=status.HTTP_201_CREATED)
+async def create_alert(
+    alert_in: PriceAlertCreate,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a one-shot price alert.
+
+    It fires the first time a fresh quote for the symbol is at or above
+    ("above") or at or below ("below") the threshold, and is pushed to the
+    user's open quote streams as an "alert" message.
+    """
+    alert = await db_executor.run(_create_alert, db, current_user.id, alert_in)
+    await alert_engine.add(_to_ref(alert))
+    return alert
+
+
+@router.get("/{alert_id}", response_model=PriceAlertSchema)
+async def get_alert(
+    alert_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Get one of the current user's price alerts."""
+    return await db_executor.run(_get_alert, db, current_user.id, alert_id)
+
+
+@router.patch("/{alert_id}", response_model=PriceAlertSchema)
+async def update_alert(
+    alert_in: PriceAlertUpdate,
+    alert_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Change an active alert's direction or threshold."""
+    alert = await db_executor.run(_update_alert, db, current_user.id, alert_id, alert_in)
+    await alert_engine.add(_to_ref(alert))
+    return alert
+
+
+@router.delete("/{alert_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_alert(
+    alert_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Delete a price alert."""
+    await db_executor.run(_delete_alert, db, current_user.id, alert_id)
+    await alert_engine.remove(alert_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.executors import db_executor, password_executor
+from app.core.security import verify_and_update_password, get_password_hash, create_access_token
 from app.core.token_blacklist import blacklist_token
 from app.core.deps import security, get_current_user
 from app.models.user import User
@@ -11,6 +13,28 @@ from app.schemas.user import UserCreate, UserLogin, User as UserSchema, Token
 router = APIRouter()
 
 
+def _get_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+
+def _create_user(db: Session, email: str, hashed_password: str) -> User:
+    db_user = User(
+        email=email,
+        hashed_password=hashed_password
+    )
+    
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    
+    return db_user
+
+
+def _update_password_hash(db: Session, user_id: int, hashed_password: str) -> None:
+    db.query(User).filter(User.id == user_id).update({User.hashed_password: hashed_password})
+    db.commit()
+
+
 @router.post("/signup", response_model=UserSchema)
 async def signup(
     request: Request,
@@ -19,23 +43,16 @@ async def signup(
 ):
     """Signs up a new user."""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_in.email).first()
+    existing_user = await db_executor.run(_get_user_by_email, db, user_in.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user_in.password)
-    db_user = User(
-        email=user_in.email,
-        hashed_password=hashed_password
-    )
-    
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # Create new user; hashing and DB writes run off the event loop
+    hashed_password = await password_executor.run(get_password_hash, user_in.password)
+    db_user = await db_executor.run(_create_user, db, user_in.email, hashed_password)
     
     return db_user
 
@@ -46,29 +63,27 @@ async def login(
     user_credentials: UserLogin,
     db: Session = Depends(get_db)
 ):
-    """Login user and return access token."""
-    
-    client_info = request.client or request.scope.get("client")
-    if client_info is None:
-        client_ip = "127.0.0.1"
-    elif hasattr(client_info, "host"):
-        client_ip = client_info.host
-    elif isinstance(client_info, (tuple, list)) and client_info:
-        client_ip = client_info[0]
-    else:
-        client_ip = "127.0.0.1"
-    
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    """Login user and return access token. Attempts are rate limited per client IP."""
+    user = await db_executor.run(_get_user_by_email, db, user_credentials.email)
     
     # Verify user exists and password is correct
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await password_executor.run(
+            verify_and_update_password, user_credentials.password, user.hashed_password
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.email})
+    # The hash uses an outdated cost: replace it while the plaintext is at hand
+    if new_hash is not None:
+        await db_executor.run(_update_password_hash, db, user.id, new_hash)
+    
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id})
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -88,6 +103,7 @@ async def logout(
     """Logout user by blacklisting their current token."""
     token = credentials.credentials
     
-    blacklist_token(token)
+    # Shared blacklist backends may write to the database or Redis
+    await db_executor.run(blacklist_token, token)
     
     return {"message": "Successfully logged out"}
\ No newline at end of file
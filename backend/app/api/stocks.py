@@ -1,60 +1,294 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path
-import httpx
+import asyncio
+import re
+from typing import List, Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.core.deps import get_current_user
-from app.models.user import User
-from app.schemas.stock import StockQuoteResponse
+from app.core.database import get_db
+from app.core.deps import Principal, authenticate_principal, get_current_principal
+from app.core.http_client import UpstreamClient, get_upstream_client
+from app.core.responses import cached_model_response, model_response, msgpack_available, pack_msgpack
+from app.schemas.stock import (
+    StockQuoteResponse, BatchQuoteResponse, CandlesResponse, IndicatorsResponse
+)
+from app.services.candles import RESOLUTION_SECONDS, get_candles
+from app.services.indicators import get_indicators
+from app.services.providers import QuoteProvider, get_quote_provider
+from app.services.quotes import get_quote, get_quote_items
+from app.services.streaming import Subscription, quote_stream_hub
 
 router = APIRouter()
 
+SYMBOL_PATTERN = re.compile(r"^[A-Z]{1,5}$")
+
+
+def parse_symbols(symbols: str, max_symbols: int) -> List[str]:
+    """Split a comma-separated symbol list, validating and deduplicating it."""
+    requested = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    
+    invalid = [symbol for symbol in requested if not SYMBOL_PATTERN.match(symbol)]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid stock symbols: {', '.join(invalid)}"
+        )
+    
+    unique_symbols = list(dict.fromkeys(requested))
+    if not unique_symbols:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="At least one stock symbol is required"
+        )
+    if len(unique_symbols) > max_symbols:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {max_symbols} symbols can be requested at once"
+        )
+    
+    return unique_symbols
+
 
 @router.get("/quote/{symbol}", response_model=StockQuoteResponse)
 async def get_stock_quote(
+    request: Request,
     symbol: str = Path(..., description="Stock symbol (e.g., AAPL, GOOGL)", pattern="^[A-Z]{1,5}$"),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal),
+    provider: QuoteProvider = Depends(get_quote_provider)
 ):
-    """Get stock quote for a given symbol. Requires authentication."""
+    """
+    Get stock quote for a given symbol. Requires authentication.
+    
+    Send `Accept: application/msgpack` for a MessagePack body instead of JSON.
+    Responses carry an ETag and Cache-Control for as long as the quote stays
+    cached; `If-None-Match` with a current ETag is answered with 304.
+    """
     symbol = symbol.upper()
     
-    # Call Finnhub API
-    async with httpx.AsyncClient() as client:
+    entry = await get_quote(symbol, provider)
+    
+    # Report how old the (possibly cached) quote is, and whether it is a stale fallback
+    headers = {"X-Quote-Age": f"{entry.age:.3f}"}
+    if entry.stale:
+        headers["X-Quote-Stale"] = "true"
+    
+    # Clients may reuse the quote until the cache would refetch it; stale ones must revalidate
+    max_age = 0 if entry.stale else settings.QUOTE_CACHE_TTL_SECONDS - entry.age
+    
+    # The body is encoded once per cached quote and reused for every hit
+    return cached_model_response(
+        request, entry.value, max_age, entry.modified_at, headers, rendered=entry.rendered
+    )
+
+
+@router.get("/quotes", response_model=BatchQuoteResponse)
+async def get_stock_quotes(
+    request: Request,
+    symbols: str = Query(..., description="Comma-separated stock symbols (e.g., AAPL,MSFT,GOOGL)"),
+    current_user: Principal = Depends(get_current_principal),
+    provider: QuoteProvider = Depends(get_quote_provider)
+):
+    """
+    Get quotes for several symbols at once. Requires authentication.
+    
+    Send `Accept: application/msgpack` for a MessagePack body instead of JSON.
+    """
+    unique_symbols = parse_symbols(symbols, settings.BATCH_QUOTE_MAX_SYMBOLS)
+    
+    quotes = await get_quote_items(unique_symbols, provider)
+    
+    return model_response(request, BatchQuoteResponse(quotes=quotes))
+
+
+@router.get("/candles/{symbol}", response_model=CandlesResponse)
+async def get_stock_candles(
+    symbol: str = Path(..., description="Stock symbol (e.g., AAPL, GOOGL)", pattern="^[A-Z]{1,5}$"),
+    resolution: str = Query("D", description="Bar resolution: 1, 5, 15, 30, 60 (minutes), D, W or M"),
+    start: int = Query(..., alias="from", ge=0, description="Range start (UNIX seconds)"),
+    end: int = Query(..., alias="to", ge=0, description="Range end (UNIX seconds)"),
+    current_user: Principal = Depends(get_current_principal),
+    upstream: UpstreamClient = Depends(get_upstream_client),
+    db: Session = Depends(get_db)
+):
+    """Get historical OHLCV bars for a symbol. Requires authentication."""
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="'to' must not be before 'from'"
+        )
+    if resolution in RESOLUTION_SECONDS and (end - start) // RESOLUTION_SECONDS[resolution] > settings.CANDLES_MAX_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.CANDLES_MAX_POINTS} bars can be requested at once"
+        )
+    
+    return await get_candles(symbol, resolution, start, end, upstream, db)
+
+
+@router.get("/indicators/{symbol}", response_model=IndicatorsResponse)
+async def get_stock_indicators(
+    symbol: str = Path(..., description="Stock symbol (e.g., AAPL, GOOGL)", pattern="^[A-Z]{1,5}$"),
+    resolution: str = Query("D", description="Bar resolution: 1, 5, 15, 30, 60 (minutes), D, W or M"),
+    start: int = Query(..., alias="from", ge=0, description="Range start (UNIX seconds)"),
+    end: int = Query(..., alias="to", ge=0, description="Range end (UNIX seconds)"),
+    limit: int = Query(settings.CANDLES_MAX_POINTS, ge=1, le=settings.CANDLES_MAX_POINTS,
+                       description="Most recent bars to return"),
+    current_user: Principal = Depends(get_current_principal),
+    upstream: UpstreamClient = Depends(get_upstream_client),
+    db: Session = Depends(get_db)
+):
+    """
+    Get SMA, EMA, RSI, MACD, Bollinger bands and VWAP for a symbol. Requires authentication.
+    
+    Values are null until enough bars exist for the indicator's period.
+    """
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="'to' must not be before 'from'"
+        )
+    if resolution not in RESOLUTION_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Resolution must be one of: {', '.join(RESOLUTION_SECONDS)}"
+        )
+    if (end - start) // RESOLUTION_SECONDS[resolution] > settings.CANDLES_MAX_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.CANDLES_MAX_POINTS} bars can be requested at once"
+        )
+    
+    return await get_indicators(symbol, resolution, start, end, limit, upstream, db)
+
+
+@router.get("/stream")
+async def stream_stock_quotes(
+    symbols: str = Query(..., description="Comma-separated stock symbols (e.g., AAPL,MSFT,GOOGL)"),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Stream quote updates as Server-Sent Events. Requires authentication."""
+    unique_symbols = parse_symbols(symbols, settings.STREAM_MAX_SYMBOLS)
+    
+    # Release the DB connection now rather than holding it for the whole stream
+    db.close()
+    
+    async def event_stream():
+        subscription = Subscription(user_id=current_user.id)
+        quote_stream_hub.subscribe(subscription, unique_symbols)
         try:
-            response = await client.get(
-                f"{settings.FINNHUB_BASE_URL}/quote",
-                params={
-                    "symbol": symbol,
-                    "token": settings.FINNHUB_API_KEY
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Check if we got valid data
-            if data.get("o") == 0 and data.get("h") == 0 and data.get("l") == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"No data found for symbol: {symbol}"
-                )
-            
-            return StockQuoteResponse(
-                symbol=symbol,
-                opening_price=data.get("o", 0),
-                current_price=data.get("c", 0),
-                high_price=data.get("h", 0),
-                low_price=data.get("l", 0),
-                previous_close=data.get("pc", 0)
-            )
-            
-        except HTTPException:
-            # Re-raise HTTPException without catching it
-            raise
-        except httpx.HTTPStatusError:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Unable to fetch stock data"
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="An error occurred while fetching stock data"
-            )
\ No newline at end of file
+            while True:
+                try:
+                    messages = await asyncio.wait_for(
+                        subscription.next_batch(), timeout=settings.STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                for message in messages:
+                    yield f"event: {message['type']}\ndata: {orjson.dumps(message).decode()}\n\n"
+        finally:
+            quote_stream_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def websocket_stock_quotes(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None, description="JWT access token"),
+    symbols: Optional[str] = Query(None, description="Comma-separated symbols to subscribe to on connect"),
+    encoding: str = Query("json", description="Update encoding: json (text frames) or msgpack (binary frames)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream quote updates over a WebSocket.
+    
+    Authenticate with a `token` query parameter (browsers cannot set headers on
+    WebSockets) or a bearer Authorization header. Send
+    {"action": "subscribe" | "unsubscribe", "symbols": [...]} to change symbols.
+    With `encoding=msgpack`, server messages are sent as MessagePack binary frames.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if token is None and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    
+    try:
+        if encoding not in ("json", "msgpack") or (encoding == "msgpack" and not msgpack_available()):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Unsupported encoding")
+        if not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+        principal = await authenticate_principal(token, db)
+        initial_symbols = parse_symbols(symbols, settings.STREAM_MAX_SYMBOLS) if symbols else []
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+        return
+    finally:
+        db.close()
+    
+    await websocket.accept()
+    subscription = Subscription(user_id=principal.id)
+    quote_stream_hub.subscribe(subscription, initial_symbols)
+    
+    async def send(message: dict):
+        if encoding == "msgpack":
+            await websocket.send_bytes(pack_msgpack(message))
+        else:
+            await websocket.send_text(orjson.dumps(message).decode())
+    
+    async def receive_commands():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+            try:
+                try:
+                    command = orjson.loads(message.get("text") or message.get("bytes") or b"")
+                except orjson.JSONDecodeError:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Commands must be JSON")
+                action = command.get("action") if isinstance(command, dict) else None
+                if action not in ("subscribe", "unsubscribe"):
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Action must be 'subscribe' or 'unsubscribe'"
+                    )
+                symbols = command.get("symbols") or []
+                if not isinstance(symbols, list) or not all(isinstance(symbol, str) for symbol in symbols):
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Symbols must be a list of strings"
+                    )
+                requested = parse_symbols(",".join(symbols), settings.STREAM_MAX_SYMBOLS)
+                if action == "subscribe":
+                    if len(subscription.symbols | set(requested)) > settings.STREAM_MAX_SYMBOLS:
+                        raise HTTPException(
+                            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"At most {settings.STREAM_MAX_SYMBOLS} symbols can be streamed at once"
+                        )
+                    quote_stream_hub.subscribe(subscription, requested)
+                else:
+                    quote_stream_hub.unsubscribe(subscription, requested)
+            except HTTPException as e:
+                await send({"type": "error", "status_code": e.status_code, "detail": e.detail})
+    
+    async def send_updates():
+        while True:
+            for message in await subscription.next_batch():
+                await send(message)
+    
+    tasks = [asyncio.create_task(receive_commands()), asyncio.create_task(send_updates())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        quote_stream_hub.unsubscribe(subscription)
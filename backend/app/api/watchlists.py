@@ -0,0 +1,242 @@
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.deps import Principal, get_current_principal
+from app.core.executors import db_executor
+from app.core.responses import model_response
+from app.models.watchlist import Watchlist, WatchlistItem
+from app.schemas.stock import BatchQuoteResponse
+from app.schemas.watchlist import (
+    WatchlistCreate, WatchlistUpdate, WatchlistItemCreate, Watchlist as WatchlistSchema
+)
+from app.services.providers import QuoteProvider, get_quote_provider
+from app.services.quotes import get_quote_items
+
+router = APIRouter()
+
+
+def _to_schema(watchlist: Watchlist) -> WatchlistSchema:
+    return WatchlistSchema(
+        id=watchlist.id,
+        name=watchlist.name,
+        symbols=[item.symbol for item in watchlist.items],
+        created_at=watchlist.created_at,
+    )
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Watchlist not found"
+    )
+
+
+def _check_symbol_limit(symbols: List[str]) -> None:
+    if len(symbols) > settings.WATCHLIST_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A watchlist can hold at most {settings.WATCHLIST_MAX_SYMBOLS} symbols"
+        )
+
+
+def _get_watchlist(db: Session, user_id: int, watchlist_id: int) -> Watchlist:
+    watchlist = (
+        db.query(Watchlist)
+        .filter(Watchlist.id == watchlist_id, Watchlist.user_id == user_id)
+        .first()
+    )
+    if watchlist is None:
+        raise _not_found()
+    return watchlist
+
+
+def _list_watchlists(db: Session, user_id: int) -> List[WatchlistSchema]:
+    watchlists = db.query(Watchlist).filter(Watchlist.user_id == user_id).order_by(Watchlist.id).all()
+    return [_to_schema(watchlist) for watchlist in watchlists]
+
+
+def _create_watchlist(db: Session, user_id: int, watchlist_in: WatchlistCreate) -> WatchlistSchema:
+    count = db.query(Watchlist).filter(Watchlist.user_id == user_id).count()
+    if count >= settings.WATCHLIST_MAX_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.WATCHLIST_MAX_PER_USER} watchlists are allowed per user"
+        )
+
+    watchlist = Watchlist(user_id=user_id, name=watchlist_in.name)
+    watchlist.items = [
+        WatchlistItem(user_id=user_id, symbol=symbol, position=position)
+        for position, symbol in enumerate(watchlist_in.symbols)
+    ]
+    db.add(watchlist)
+    db.commit()
+    db.refresh(watchlist)
+    return _to_schema(watchlist)
+
+
+def _read_watchlist(db: Session, user_id: int, watchlist_id: int) -> WatchlistSchema:
+    return _to_schema(_get_watchlist(db, user_id, watchlist_id))
+
+
+def _update_watchlist(db: Session, user_id: int, watchlist_id: int, watchlist_in: WatchlistUpdate) -> WatchlistSchema:
+    watchlist = _get_watchlist(db, user_id, watchlist_id)
+    if watchlist_in.name is not None:
+        watchlist.name = watchlist_in.name
+    if watchlist_in.symbols is not None:
+        # Keep rows for symbols that stay, so only the difference is written
+        kept = {item.symbol: item for item in watchlist.items}
+        items = []
+        for position, symbol in enumerate(watchlist_in.symbols):
+            item = kept.get(symbol) or WatchlistItem(user_id=user_id, symbol=symbol)
+            # Kept rows may have moved
+            item.position = position
+            items.append(item)
+        watchlist.items = items
+    db.commit()
+    db.refresh(watchlist)
+    return _to_schema(watchlist)
+
+
+def _delete_watchlist(db: Session, user_id: int, watchlist_id: int) -> None:
+    db.delete(_get_watchlist(db, user_id, watchlist_id))
+    db.commit()
+
+
+def _add_symbol(db: Session, user_id: int, watchlist_id: int, symbol: str) -> WatchlistSchema:
+    watchlist = _get_watchlist(db, user_id, watchlist_id)
+    if symbol not in {item.symbol for item in watchlist.items}:
+        _check_symbol_limit([item.symbol for item in watchlist.items] + [symbol])
+        position = max((item.position for item in watchlist.items), default=-1) + 1
+        watchlist.items.append(WatchlistItem(user_id=user_id, symbol=symbol, position=position))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Added concurrently by another request
+            db.rollback()
+        db.refresh(watchlist)
+    return _to_schema(watchlist)
+
+
+def _remove_symbol(db: Session, user_id: int, watchlist_id: int, symbol: str) -> WatchlistSchema:
+    watchlist = _get_watchlist(db, user_id, watchlist_id)
+    watchlist.items = [item for item in watchlist.items if item.symbol != symbol]
+    db.commit()
+    db.refresh(watchlist)
+    return _to_schema(watchlist)
+
+
+def _load_symbols(db: Session, user_id: int, watchlist_id: int) -> List[str]:
+    """Resolve a watchlist's symbols in a single query, raising 404 if the user does not own it."""
+    rows: List[Tuple[int, Optional[str]]] = (
+        db.query(Watchlist.id, WatchlistItem.symbol)
+        .outerjoin(WatchlistItem, WatchlistItem.watchlist_id == Watchlist.id)
+        .filter(Watchlist.id == watchlist_id, Watchlist.user_id == user_id)
+        .order_by(WatchlistItem.position, WatchlistItem.id)
+        .all()
+    )
+    if not rows:
+        raise _not_found()
+    return [symbol for _, symbol in rows if symbol is not None]
+
+
+@router.get("", response_model=List[WatchlistSchema])
+async def list_watchlists(
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """List the current user's watchlists."""
+    return await db_executor.run(_list_watchlists, db, current_user.id)
+
+
+@router.post("", response_model=WatchlistSchema, status_code=status.HTTP_201_CREATED)
+async def create_watchlist(
+    watchlist_in: WatchlistCreate,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Create a watchlist for the current user."""
+    _check_symbol_limit(watchlist_in.symbols)
+    return await db_executor.run(_create_watchlist, db, current_user.id, watchlist_in)
+
+
+@router.get("/{watchlist_id}", response_model=WatchlistSchema)
+async def get_watchlist(
+    watchlist_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Get one of the current user's watchlists."""
+    return await db_executor.run(_read_watchlist, db, current_user.id, watchlist_id)
+
+
+@router.patch("/{watchlist_id}", response_model=WatchlistSchema)
+async def update_watchlist(
+    watchlist_in: WatchlistUpdate,
+    watchlist_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Rename a watchlist and/or replace its symbols."""
+    if watchlist_in.symbols is not None:
+        _check_symbol_limit(watchlist_in.symbols)
+    return await db_executor.run(_update_watchlist, db, current_user.id, watchlist_id, watchlist_in)
+
+
+@router.delete("/{watchlist_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_watchlist(
+    watchlist_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Delete a watchlist."""
+    await db_executor.run(_delete_watchlist, db, current_user.id, watchlist_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/{watchlist_id}/symbols", response_model=WatchlistSchema)
+async def add_watchlist_symbol(
+    item_in: WatchlistItemCreate,
+    watchlist_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Add a symbol to a watchlist. Adding a symbol that is already there is a no-op."""
+    return await db_executor.run(_add_symbol, db, current_user.id, watchlist_id, item_in.symbol)
+
+
+@router.delete("/{watchlist_id}/symbols/{symbol}", response_model=WatchlistSchema)
+async def remove_watchlist_symbol(
+    watchlist_id: int = Path(..., ge=1),
+    symbol: str = Path(..., description="Stock symbol (e.g., AAPL, GOOGL)", pattern="^[A-Z]{1,5}$"),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Remove a symbol from a watchlist."""
+    return await db_executor.run(_remove_symbol, db, current_user.id, watchlist_id, symbol)
+
+
+@router.get("/{watchlist_id}/quotes", response_model=BatchQuoteResponse)
+async def get_watchlist_quotes(
+    request: Request,
+    watchlist_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(get_current_principal),
+    provider: QuoteProvider = Depends(get_quote_provider),
+    db: Session = Depends(get_db)
+):
+    """
+    Get quotes for every symbol on a watchlist.
+
+    Symbols are fetched as one concurrent batch through the shared quote cache,
+    so a symbol on many users' watchlists is fetched from upstream once per TTL.
+    """
+    symbols = await db_executor.run(_load_symbols, db, current_user.id, watchlist_id)
+
+    # Release the DB connection before waiting on upstream
+    db.close()
+
+    quotes = await get_quote_items(symbols, provider)
+
+    return model_response(request, BatchQuoteResponse(quotes=quotes))
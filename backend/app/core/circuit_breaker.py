@@ -0,0 +1,139 @@
+import time
+from collections import deque
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, registry
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for upstream calls.
+
+    Outcomes of the last `window_size` calls are tracked. Once at least
+    `min_calls` are recorded and the failure rate reaches `failure_rate`, the
+    circuit opens and calls fail fast for `open_seconds`. It then goes half-open
+    and lets `half_open_max_calls` trial calls through. A successful trial closes
+    it again; a failed trial re-opens it.
+    """
+
+    def __init__(
+        self,
+        window_size: int,
+        min_calls: int,
+        failure_rate: float,
+        open_seconds: float,
+        half_open_max_calls: int = 1,
+    ):
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.reset()
+
+    def reset(self) -> None:
+        self._state = CLOSED
+        self._outcomes: deque = deque(maxlen=self.window_size)
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call should fail fast."""
+        state = self.state
+        if state == OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(self.open_seconds - (time.monotonic() - self._opened_at))
+        if state == HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.open_seconds)
+            self._half_open_calls += 1
+
+    def record_success(self) -> None:
+        if self._state == HALF_OPEN:
+            self._state = CLOSED
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls and self.failure_rate >= self.failure_rate_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """Give back a half-open trial slot for a call that neither succeeded nor failed."""
+        if self._state == HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate, 4),
+            "window_calls": len(self._outcomes),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+upstream_circuit_breaker = CircuitBreaker(
+    window_size=settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+    min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+    failure_rate=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+    open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+)
+
+# Exported states: 0 closed, 1 half-open, 2 open
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+registry.register(Gauge(
+    "upstream_circuit_state",
+    "Upstream circuit breaker state (0 closed, 1 half-open, 2 open)",
+    function=lambda: STATE_VALUES[upstream_circuit_breaker.state],
+))
+registry.register(Counter(
+    "upstream_circuit_opened_total",
+    "Times the upstream circuit breaker opened",
+    function=lambda: upstream_circuit_breaker.times_opened,
+))
+registry.register(Counter(
+    "upstream_circuit_rejected_calls_total",
+    "Upstream calls rejected while the circuit was open or half-open",
+    function=lambda: upstream_circuit_breaker.rejected,
+))
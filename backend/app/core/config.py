@@ -11,13 +11,166 @@ class Settings(BaseSettings):
     
     DATABASE_URL: str
     
+    # SQLAlchemy connection pool (recycle below MySQL's wait_timeout)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Verified-token cache size (0 disables caching of decoded JWTs)
+    JWT_CACHE_MAX_SIZE: int = 10000
+    
+    # Revoked token store: "memory" (single process), or shared by workers: "local"
+    # (the shared state server), "sql" or "redis"
+    TOKEN_BLACKLIST_BACKEND: str = "memory"
+    TOKEN_BLACKLIST_REDIS_URL: Optional[str] = None
+    # How long a shared-backend "not revoked" answer is trusted locally
+    TOKEN_BLACKLIST_NEGATIVE_CACHE_SECONDS: float = 1.0
+    # When a shared backend is unreachable: reject authenticated requests with 503
+    # (false), or accept tokens not known locally to be revoked (true)
+    TOKEN_BLACKLIST_FAIL_OPEN: bool = False
+    # How often expired revocations are deleted (0 only cleans up on startup)
+    TOKEN_BLACKLIST_CLEANUP_INTERVAL_SECONDS: float = 600.0
+    
+    # Build the request principal straight from verified token claims instead of
+    # loading the user row. Tokens without a user id claim fall back to the user cache.
+    AUTH_STATELESS: bool = True
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAX_SIZE: int = 10000
+    
+    # Password hashing: "bcrypt" or "argon2" (needs argon2-cffi). PASSWORD_HASH_ROUNDS is
+    # the bcrypt cost or argon2 time cost; 0 calibrates it on startup to the highest cost
+    # that verifies within PASSWORD_HASH_TARGET_MS, or the scheme's minimum if that is 0 or
+    # less (once in the gunicorn master for multi-worker mode). Hashes at a lower cost or in another scheme are rehashed on login.
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_HASH_ROUNDS: int = 0
+    PASSWORD_HASH_TARGET_MS: float = 100.0
+    PASSWORD_ARGON2_MEMORY_KIB: int = 65536
+    PASSWORD_ARGON2_PARALLELISM: int = 1
+    
+    # Thread pools for blocking work called from async handlers (0 = unbounded queue)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    DB_EXECUTOR_WORKERS: int = 10
+    DB_EXECUTOR_MAX_QUEUE: int = 0
     
     FINNHUB_API_KEY: str
     FINNHUB_BASE_URL: str = "https://finnhub.io/api/v1"
     
+    # Shared upstream HTTP client (connection pool, keep-alive and timeouts)
+    FINNHUB_MAX_CONNECTIONS: int = 100
+    FINNHUB_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    FINNHUB_KEEPALIVE_EXPIRY: float = 30.0
+    FINNHUB_CONNECT_TIMEOUT: float = 3.0
+    FINNHUB_READ_TIMEOUT: float = 5.0
+    FINNHUB_WRITE_TIMEOUT: float = 5.0
+    FINNHUB_POOL_TIMEOUT: float = 2.0
+    FINNHUB_HTTP2: bool = False
+    
+    # Quote source: "finnhub", "replay" (recorded ticks from QUOTE_REPLAY_FILE) or
+    # "failover" (the fastest healthy provider in QUOTE_PROVIDER_CHAIN)
+    QUOTE_PROVIDER: str = "finnhub"
+    QUOTE_PROVIDER_CHAIN: str = "finnhub,replay"
+    # How long a failed provider is skipped by the failover chain
+    QUOTE_PROVIDER_COOLDOWN_SECONDS: float = 30.0
+    QUOTE_REPLAY_FILE: Optional[str] = None
+    # Recorded seconds replayed per second (0 holds the first tick), and whether to wrap around
+    QUOTE_REPLAY_SPEED: float = 1.0
+    QUOTE_REPLAY_LOOP: bool = True
+    
+    # Outbound budget for the shared Finnhub API key (0 disables pacing).
+    # "local" shares one budget across workers on a host, "redis" across replicas too.
+    UPSTREAM_RATE_LIMIT_PER_SECOND: float = 1.0
+    UPSTREAM_RATE_LIMIT_BURST: int = 30
+    UPSTREAM_RATE_LIMIT_MAX_WAIT_SECONDS: float = 2.0
+    UPSTREAM_RATE_LIMIT_MAX_QUEUE: int = 100
+    UPSTREAM_RATE_LIMIT_BACKEND: str = "memory"
+    UPSTREAM_RATE_LIMIT_REDIS_URL: Optional[str] = None
+    
+    # In-process quote cache
+    QUOTE_CACHE_TTL_SECONDS: float = 5.0
+    QUOTE_CACHE_MAX_SIZE: int = 1000
+    
+    # Stale-while-revalidate: how long past the TTL a quote may still be served
+    # as stale, and how long to wait on upstream before doing so
+    QUOTE_STALE_MAX_AGE_SECONDS: float = 900.0
+    QUOTE_LATENCY_BUDGET_SECONDS: float = 1.5
+    
+    # Inbound request rate limits per client (GCRA), keyed by user id for authenticated
+    # requests and by client IP otherwise; 0 disables a policy. Backend: "memory" (per
+    # process), or shared by workers: "local" (the shared state server) or "redis"
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_AUTH_PER_MINUTE: int = 10
+    RATE_LIMIT_STOCKS_PER_MINUTE: int = 300
+    RATE_LIMIT_DEFAULT_PER_MINUTE: int = 600
+    
+    # Multi-worker mode: Unix socket of the shared state server (see gunicorn.conf.py).
+    # When set, workers share cached quotes and fetch each symbol from upstream once
+    # between them, and only one worker runs background ingestion.
+    SHARED_STATE_SOCKET: Optional[str] = None
+    SHARED_STATE_TIMEOUT_SECONDS: float = 1.0
+    # How long one worker may hold a symbol's fetch claim before another takes over
+    SHARED_STATE_FETCH_LEASE_SECONDS: float = 10.0
+    
+    # Circuit breaker around upstream quote fetches
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20
+    CIRCUIT_BREAKER_MIN_CALLS: int = 10
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS: int = 1
+    
+    # Background ingestion: refresh the most requested symbols into the quote cache.
+    # Refreshes use at most INGESTION_BUDGET_SHARE of the upstream rate limit, and the
+    # hot set is capped at what that share can refresh within QUOTE_CACHE_TTL_SECONDS.
+    INGESTION_ENABLED: bool = True
+    INGESTION_HOT_SET_SIZE: int = 20
+    INGESTION_HOT_HALF_LIFE_SECONDS: float = 300.0
+    INGESTION_MAX_TRACKED_SYMBOLS: int = 10000
+    INGESTION_MARKET_INTERVAL_SECONDS: float = 4.0
+    INGESTION_CLOSED_INTERVAL_SECONDS: float = 900.0
+    INGESTION_JITTER: float = 0.1
+    INGESTION_BUDGET_SHARE: float = 0.5
+    
+    # Price alerts: per-user limit, and how many alerted symbols ingestion keeps polling
+    ALERTS_MAX_PER_USER: int = 100
+    ALERTS_MAX_POLLED_SYMBOLS: int = 100
+    
+    # Batch quote fan-out
+    BATCH_QUOTE_MAX_SYMBOLS: int = 50
+    BATCH_QUOTE_CONCURRENCY: int = 10
+    
+    # Historical candles: most bars a single request may span
+    CANDLES_MAX_POINTS: int = 5000
+    
+    # Watchlists: per-user limits
+    WATCHLIST_MAX_PER_USER: int = 20
+    WATCHLIST_MAX_SYMBOLS: int = 50
+    
+    # Technical indicators: bars kept per series buffer and series kept in memory
+    INDICATOR_MAX_BARS: int = 100000
+    INDICATOR_MAX_SERIES: int = 200
+    
+    # Streaming quotes (WebSocket / Server-Sent Events)
+    STREAM_POLL_INTERVAL_SECONDS: float = 5.0
+    STREAM_MAX_SYMBOLS: int = 50
+    STREAM_MAX_PENDING_MESSAGES: int = 100
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Admin endpoints (runtime profiling) are disabled unless a key is set;
+    # send it in the X-Admin-Key header
+    ADMIN_API_KEY: Optional[str] = None
+    
+    # Request profiling: profiles kept in memory and stack sampling interval
+    PROFILING_MAX_PROFILES: int = 50
+    PROFILING_SAMPLE_INTERVAL_SECONDS: float = 0.001
+    
     BACKEND_CORS_ORIGINS: list[str] = ["http://localhost:3000"]
 
 
@@ -1,10 +1,75 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from typing import Generator
 
 from app.core.config import settings
+from app.core.metrics import Gauge, Histogram, HistogramFamily, registry
+
+# Time spent waiting for a pooled connection, and how long connections stay checked out
+pool_checkout_wait = Histogram()
+pool_checkout_duration = Histogram()
+
+registry.register(HistogramFamily(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    histogram=pool_checkout_wait,
+))
+registry.register(HistogramFamily(
+    "db_pool_checkout_duration_seconds",
+    "How long database connections stay checked out",
+    histogram=pool_checkout_duration,
+))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+def _engine_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite (used for local benchmarks) has no server-side pool to tune
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        pool_checkout_duration.observe(time.perf_counter() - checked_out_at)
+
+
+registry.register(Gauge(
+    "db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool",
+    function=lambda: engine.pool.checkedout() if isinstance(engine.pool, QueuePool) else 0,
+))
 
-engine = create_engine(settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -21,4 +86,39 @@ def get_db() -> Generator:
 
 def init_db():
     """Initialize database tables - creates them if they don't exist"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+
+
+def check_db() -> dict:
+    """Check database reachability with a trivial query and report pool usage."""
+    start = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        reachable = True
+    except Exception:
+        reachable = False
+    
+    return {
+        "reachable": reachable,
+        "latency_seconds": round(time.perf_counter() - start, 6),
+        "pool": pool_stats(),
+    }
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    stats = {
+        "class": type(pool).__name__,
+        "checkout_wait_seconds": pool_checkout_wait.snapshot(),
+        "checkout_duration_seconds": pool_checkout_duration.snapshot(),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+        })
+    return stats
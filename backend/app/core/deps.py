@@ -1,38 +1,49 @@
+from dataclasses import dataclass
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import decode_access_token
+from app.core.executors import db_executor
+from app.core.metrics import stage_duration
+from app.core.security import decode_access_token_claims
 from app.core.token_blacklist import is_token_blacklisted
+from app.core.user_cache import user_cache
 from app.models.user import User
 
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user. Checks if token is valid and not blacklisted."""
-    token = credentials.credentials
+@dataclass(frozen=True)
+class Principal:
+    """Lightweight authenticated identity that does not need a users-table row."""
+    id: int
+    email: str
+
+
+async def verify_token(token: str) -> dict:
+    """Verify a token's signature and expiry, check it is not blacklisted, and return its claims."""
+    claims = decode_access_token_claims(token)
     
-    if is_token_blacklisted(token):
+    if not claims:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has been revoked. Please login again.",
+            detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    email = decode_access_token(token)
-    
-    if not email:
+    if await is_token_blacklisted(token, claims):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
+            detail="Token has been revoked. Please login again.",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    return claims
+
+
+def _load_user(email: str, db: Session) -> User:
     user = db.query(User).filter(User.email == email).first()
     if not user:
         raise HTTPException(
@@ -40,5 +51,53 @@ async def get_current_user(
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return user
+
+
+async def authenticate_token(token: str, db: Session) -> User:
+    """Resolve a bearer token to its user. Checks if token is valid and not blacklisted."""
+    with stage_duration.labels("auth").time():
+        claims = await verify_token(token)
+        return await db_executor.run(_load_user, claims["sub"], db)
+
+
+def _load_principal(email: str, db: Session) -> Principal:
+    user = _load_user(email, db)
+    return user_cache.set(email, Principal(id=user.id, email=user.email))
+
+
+async def authenticate_principal(token: str, db: Session) -> Principal:
+    """
+    Resolve a bearer token to a Principal.
     
-    return user
\ No newline at end of file
+    In stateless mode the principal comes straight from the token's `uid` and `sub`
+    claims. Otherwise (or for tokens issued without `uid`) it comes from the user
+    cache, and only a cache miss queries the users table.
+    """
+    with stage_duration.labels("auth").time():
+        claims = await verify_token(token)
+        email = claims["sub"]
+        
+        if settings.AUTH_STATELESS and claims.get("uid") is not None:
+            return Principal(id=claims["uid"], email=email)
+        
+        principal = user_cache.get(email)
+        if principal is None:
+            principal = await db_executor.run(_load_principal, email, db)
+        return principal
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get the current authenticated user. Checks if token is valid and not blacklisted."""
+    return await authenticate_token(credentials.credentials, db)
+
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """Get the current authenticated principal without loading the user row when possible."""
+    return await authenticate_principal(credentials.credentials, db)
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import Gauge, registry, stage_duration
+
+
+class BlockingExecutor:
+    """
+    Bounded thread pool for blocking work called from async handlers.
+
+    Running blocking calls (synchronous SQLAlchemy sessions, bcrypt) here keeps
+    the event loop free to serve other requests. When `max_queue` is set, work
+    arriving while that many calls are already waiting is rejected with a 503
+    instead of piling up behind a burst.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int = 0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        """Calls submitted but not yet picked up by a worker thread."""
+        return max(self.pending - self.active, 0)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.name,
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on the pool and await its result."""
+        if self.max_queue and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        def call():
+            with self._lock:
+                self.active += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        self.pending += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            # Timed from submission, so queueing behind busy workers shows up too
+            with stage_duration.labels(self.name).time():
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        """Stop the worker threads. A new pool is created on the next call."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+# bcrypt hashing/verification for signup and login
+password_executor = BlockingExecutor(
+    "password-hash",
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+# Synchronous SQLAlchemy session work
+db_executor = BlockingExecutor(
+    "db",
+    max_workers=settings.DB_EXECUTOR_WORKERS,
+    max_queue=settings.DB_EXECUTOR_MAX_QUEUE,
+)
+
+registry.register(Gauge(
+    "executor_queued_calls",
+    "Blocking calls waiting for a worker thread",
+    ("executor",),
+    function=lambda: {(executor.name,): executor.queued for executor in (password_executor, db_executor)},
+))
@@ -0,0 +1,55 @@
+import math
+import time
+from typing import Dict, List
+
+from app.core.config import settings
+
+
+class HotSymbols:
+    """
+    Exponentially decaying request counts per symbol.
+
+    Each request adds one to a symbol's score and scores halve every
+    `half_life` seconds, so the top of the ranking follows what users are
+    asking for now rather than all-time totals.
+    """
+
+    def __init__(self, half_life: float, max_tracked: int):
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        self.clear()
+
+    def clear(self) -> None:
+        self._scores: Dict[str, float] = {}
+        self._updated_at = time.monotonic()
+
+    def _decay(self) -> None:
+        now = time.monotonic()
+        factor = math.exp(-math.log(2) * (now - self._updated_at) / self.half_life)
+        self._updated_at = now
+        if factor < 1.0:
+            # Forget symbols nobody has asked for in a while
+            self._scores = {symbol: score * factor for symbol, score in self._scores.items() if score * factor >= 0.01}
+
+    def record(self, symbol: str) -> None:
+        self._scores[symbol] = self._scores.get(symbol, 0.0) + 1.0
+        if len(self._scores) > self.max_tracked:
+            # Drop the coldest tenth at once so this stays rare
+            self._decay()
+            excess = len(self._scores) - self.max_tracked * 9 // 10
+            for cold in sorted(self._scores, key=self._scores.get)[:excess]:
+                del self._scores[cold]
+
+    def top(self, count: int) -> List[str]:
+        """Return up to `count` symbols with the highest current score."""
+        self._decay()
+        return sorted(self._scores, key=self._scores.get, reverse=True)[:count]
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+hot_symbols = HotSymbols(
+    half_life=settings.INGESTION_HOT_HALF_LIFE_SECONDS,
+    max_tracked=settings.INGESTION_MAX_TRACKED_SYMBOLS,
+)
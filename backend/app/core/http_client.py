@@ -0,0 +1,138 @@
+import importlib.util
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import Gauge, registry, stage_duration
+from app.core.rate_limiter import UpstreamRateLimiter, upstream_rate_limiter
+
+
+class UpstreamClient:
+    """
+    Application-scoped HTTP client for upstream market data calls.
+
+    A single pooled httpx.AsyncClient is created on startup and reused for
+    every request, so connections to the upstream stay alive between quotes
+    instead of paying a new TCP+TLS handshake each time.
+    """
+
+    def __init__(self, rate_limiter: Optional[UpstreamRateLimiter] = None):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.rate_limiter = rate_limiter
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.pool_timeouts = 0
+
+    @property
+    def is_started(self) -> bool:
+        return self._client is not None
+
+    @property
+    def http2_enabled(self) -> bool:
+        """HTTP/2 is only used when requested and the optional h2 package is installed."""
+        return settings.FINNHUB_HTTP2 and importlib.util.find_spec("h2") is not None
+
+    async def start(self) -> None:
+        """Create the pooled client. Called from the application lifespan."""
+        if self._client is not None:
+            return
+
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.FINNHUB_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.FINNHUB_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.FINNHUB_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.FINNHUB_CONNECT_TIMEOUT,
+                read=settings.FINNHUB_READ_TIMEOUT,
+                write=settings.FINNHUB_WRITE_TIMEOUT,
+                pool=settings.FINNHUB_POOL_TIMEOUT,
+            ),
+            http2=self.http2_enabled,
+        )
+
+    async def close(self) -> None:
+        """Close all pooled connections. Called on application shutdown."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("Upstream client has not been started")
+        return self._client
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a GET request through the shared pool, tracking in-flight usage.
+
+        Calls are paced by the rate limiter, which raises UpstreamRateLimited when
+        no slot is free within its wait budget. A 429 response pauses all calls
+        for the upstream's Retry-After period.
+        """
+        if self.rate_limiter is not None:
+            with stage_duration.labels("upstream_rate_limit_wait").time():
+                await self.rate_limiter.acquire()
+        
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            with stage_duration.labels("upstream").time():
+                response = await self.client.get(url, **kwargs)
+            if response.status_code == 429 and self.rate_limiter is not None:
+                await self.rate_limiter.penalize(response.headers.get("Retry-After"))
+            return response
+        except httpx.PoolTimeout:
+            self.pool_timeouts += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """Return connection pool saturation metrics."""
+        open_connections = 0
+        idle_connections = 0
+        queued_requests = 0
+
+        if self._client is not None:
+            # httpcore keeps the pool on the transport; guard against internals changing
+            pool = getattr(self._client._transport, "_pool", None)
+            connections = getattr(pool, "connections", [])
+            open_connections = len(connections)
+            idle_connections = sum(1 for conn in connections if conn.is_idle())
+            queued_requests = sum(
+                1 for request in getattr(pool, "_requests", []) if request.is_queued()
+            )
+
+        max_connections = settings.FINNHUB_MAX_CONNECTIONS
+        return {
+            "started": self.is_started,
+            "http2": self.http2_enabled,
+            "max_connections": max_connections,
+            "open_connections": open_connections,
+            "idle_connections": idle_connections,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "queued_requests": queued_requests,
+            "saturation": round(self.in_flight / max_connections, 4) if max_connections else 0.0,
+            "total_requests": self.total_requests,
+            "pool_timeouts": self.pool_timeouts,
+        }
+
+
+upstream_client = UpstreamClient(rate_limiter=upstream_rate_limiter)
+
+registry.register(Gauge(
+    "upstream_requests_in_flight",
+    "Upstream HTTP requests currently in flight",
+    function=lambda: upstream_client.in_flight,
+))
+
+
+def get_upstream_client() -> UpstreamClient:
+    return upstream_client
@@ -0,0 +1,297 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram, cheap enough to observe on every request."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def reset(self) -> None:
+        # One extra slot for observations above the largest bucket (+Inf)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def cumulative_counts(self) -> list:
+        """Cumulative count per bucket upper bound, ending with +Inf."""
+        totals = []
+        running = 0
+        for count in self._counts:
+            running += count
+            totals.append(running)
+        return totals
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: the upper bound of the bucket containing it."""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        for bound, total in zip(self.buckets, self.cumulative_counts()):
+            if total >= target:
+                return bound
+        return float("inf")
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the wall-clock duration of the with-block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.cumulative_counts())),
+        }
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter, optionally split by label values.
+
+    Like Gauge, it can instead read a component's own running total from a
+    callback at scrape time.
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], Union[float, Dict[Tuple[str, ...], float]]]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def samples(self) -> List[str]:
+        values = self._values
+        if self.function is not None:
+            result = self.function()
+            values = result if isinstance(result, dict) else {(): result}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+            for labelvalues, value in sorted(values.items())
+        ]
+
+
+class Gauge:
+    """
+    Point-in-time value, either set directly or read from a callback at scrape time.
+
+    A callback returns a number, or for labelled gauges a dict mapping label
+    value tuples to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], Union[float, Dict[Tuple[str, ...], float]]]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def samples(self) -> List[str]:
+        values = self._values
+        if self.function is not None:
+            result = self.function()
+            values = result if isinstance(result, dict) else {(): result}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+            for labelvalues, value in sorted(values.items())
+        ]
+
+
+class HistogramFamily:
+    """Histograms split by label values, exported in Prometheus format."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        histogram: Optional[Histogram] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # An existing unlabelled histogram can be exported as-is
+        self._children: Dict[Tuple[str, ...], Histogram] = {(): histogram} if histogram is not None else {}
+
+    def labels(self, *labelvalues: str) -> Histogram:
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labelvalues, Histogram(self.buckets))
+        return child
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labelvalues, child in sorted(self._children.items()):
+            for bound, total in zip(list(child.buckets) + [float("inf")], child.cumulative_counts()):
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {total}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together for a Prometheus scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Gauge, HistogramFamily]] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Request metrics, recorded by PrometheusMiddleware
+http_request_duration = registry.register(HistogramFamily(
+    "http_request_duration_seconds",
+    "HTTP request latency by method, route template and status code",
+    ("method", "route", "status"),
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+))
+
+# Where request time goes: auth, blocking executors (db, password-hash) and upstream calls
+stage_duration = registry.register(HistogramFamily(
+    "stage_duration_seconds",
+    "Latency of request processing stages",
+    ("stage",),
+))
+upstream_errors = registry.register(Counter(
+    "upstream_errors_total",
+    "Failed upstream market data calls by reason",
+    ("reason",),
+))
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording latency and in-flight count for every HTTP request.
+
+    Routes are labelled by their path template (e.g. /stocks/quote/{symbol}) so
+    label cardinality stays bounded. Streaming responses are timed until the
+    last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,139 @@
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Awaitable, Callable, Deque, List, Optional
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+# Send the admin key in this header to profile a specific request while profiling is enabled
+PROFILE_HEADER = "X-Profile"
+
+
+def is_admin_key(key: str) -> bool:
+    """Whether key matches the configured admin key. Always false when no key is configured."""
+    if not settings.ADMIN_API_KEY:
+        return False
+    return secrets.compare_digest(key.encode(), settings.ADMIN_API_KEY.encode())
+
+
+@dataclass
+class RequestProfile:
+    id: int
+    method: str
+    path: str
+    started_at: float
+    duration: float = 0.0
+    samples: Counter = field(default_factory=Counter)
+
+    def folded(self) -> str:
+        """Stacks in the folded format read by flamegraph.pl, speedscope and similar tools."""
+        return "".join(f"{stack} {samples}\n" for stack, samples in self.samples.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_seconds": round(self.duration, 6),
+            "samples": sum(self.samples.values()),
+        }
+
+
+class _StackSampler(threading.Thread):
+    """Samples another thread's call stack at a fixed interval until stopped."""
+
+    def __init__(self, thread_id: int, interval: float, samples: Counter):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = samples
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+class RequestProfiler:
+    """
+    Opt-in sampling profiler for HTTP requests.
+
+    While enabled, `sample_rate` of requests (plus any carrying the admin key in
+    the X-Profile header) are profiled by sampling the event loop thread's call
+    stack. The loop is shared, so a profile also shows other requests' work that
+    ran in the meantime, and work handed to executor threads shows up as the
+    loop waiting in select. Only one request is profiled at a time, and the most
+    recent profiles are kept in a bounded ring buffer. When disabled the only
+    cost is checking `enabled`.
+    """
+
+    def __init__(self, max_profiles: int, interval: float):
+        self.interval = interval
+        self.enabled = False
+        self.sample_rate = 0.0
+        self._profiles: Deque[RequestProfile] = deque(maxlen=max_profiles)
+        self._ids = count(1)
+        self._active = False
+
+    def configure(self, enabled: bool, sample_rate: float) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+
+    def should_profile(self, request: Request) -> bool:
+        if self._active:
+            return False
+        requested = request.headers.get(PROFILE_HEADER)
+        if requested is not None and is_admin_key(requested):
+            return True
+        return random.random() < self.sample_rate
+
+    async def profile(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        """Run the rest of the middleware chain under the stack sampler."""
+        profile = RequestProfile(next(self._ids), request.method, request.url.path, time.time())
+        sampler = _StackSampler(threading.get_ident(), self.interval, profile.samples)
+        self._active = True
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            sampler.stop()
+            self._active = False
+            profile.duration = time.perf_counter() - start
+            self._profiles.append(profile)
+        response.headers["X-Profile-Id"] = str(profile.id)
+        return response
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def profiles(self) -> List[RequestProfile]:
+        return list(self._profiles)
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+request_profiler = RequestProfiler(
+    max_profiles=settings.PROFILING_MAX_PROFILES,
+    interval=settings.PROFILING_SAMPLE_INTERVAL_SECONDS,
+)
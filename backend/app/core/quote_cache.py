@@ -0,0 +1,285 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, registry
+from app.core.shared_state import SharedStateClient, SharedStateError, shared_state
+from app.schemas.stock import StockQuoteResponse
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    fetched_at: float = field(default_factory=time.monotonic)
+    # Wall-clock time of the same fetch, fixed once so every response for it
+    # carries the same Last-Modified
+    modified_at: float = field(default_factory=time.time)
+    stale: bool = False
+    # Encoded response bodies for value, keyed by media type
+    rendered: Dict[str, bytes] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the value was fetched from upstream."""
+        return time.monotonic() - self.fetched_at
+
+
+class SharedQuoteTier:
+    """
+    Cross-worker tier behind the per-process cache, backed by the shared state server.
+
+    A worker that misses locally asks the server first: it either gets a quote
+    another worker already fetched, waits for one that is being fetched, or is
+    told to fetch it itself and publish the result.
+    """
+
+    def __init__(
+        self,
+        client: SharedStateClient,
+        encode: Callable[[Any], Any],
+        decode: Callable[[Any], Any],
+        lease: float = settings.SHARED_STATE_FETCH_LEASE_SECONDS,
+    ):
+        self.client = client
+        self.encode = encode
+        self.decode = decode
+        self.lease = lease
+
+    async def claim(self, key: str, ttl: float) -> Optional[Tuple[Any, float, float]]:
+        """Return (value, fetched_at, modified_at) if a fresh value exists, or None if the caller should fetch it."""
+        # Waiting on another worker's fetch may take up to the lease
+        result = await self.client.call("quote_claim", key, ttl, self.lease, timeout=self.lease + self.client.timeout)
+        if result[0] == "hit":
+            return self.decode(result[1]), result[2], result[3]
+        return None
+
+    async def publish(self, key: str, value: Any, fetched_at: float, modified_at: float) -> None:
+        await self.client.call("quote_set", key, self.encode(value), fetched_at, modified_at)
+
+    async def release(self, key: str) -> None:
+        await self.client.call("quote_release", key)
+
+
+class QuoteCache:
+    """
+    In-process TTL cache for quotes, keyed by symbol, with LRU eviction.
+
+    Concurrent misses for the same symbol are coalesced: only the first caller
+    starts an upstream fetch and every other caller awaits the same result.
+    Expired entries are kept for `stale_ttl` more seconds as a last known value
+    to fall back on when the upstream is unavailable. Listeners are called with
+    every newly stored value.
+
+    With a `shared` tier, misses are coalesced across worker processes too, and
+    every value stored here is published for the other workers.
+    """
+
+    def __init__(self, ttl: float, max_size: int, stale_ttl: float = 0.0, shared: Optional[SharedQuoteTier] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+        self._publishing: Set[asyncio.Task] = set()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._listeners: List[Callable[[str, Any], Any]] = []
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale_served = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return a fresh entry for key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.age >= self.ttl:
+            if entry.age >= self.ttl + self.stale_ttl:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Return the last known entry for key, fresh or stale, without counting a lookup."""
+        entry = self._entries.get(key)
+        if entry is None or entry.age >= self.ttl + self.stale_ttl:
+            return None
+        return entry
+
+    def serve_stale(self, entry: CacheEntry) -> CacheEntry:
+        """Return a copy of entry marked as stale."""
+        self.stale_served += 1
+        return CacheEntry(entry.value, entry.fetched_at, entry.modified_at, stale=True, rendered=entry.rendered)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        fetched_at: Optional[float] = None,
+        modified_at: Optional[float] = None,
+        publish: bool = True,
+    ) -> CacheEntry:
+        """Store a value, evicting the least recently used entries when full."""
+        entry = CacheEntry(value)
+        if fetched_at is not None:
+            entry.fetched_at = fetched_at
+            entry.modified_at = modified_at if modified_at is not None else time.time() - entry.age
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        if publish and self.shared is not None:
+            task = asyncio.ensure_future(self._publish(key, value, entry.fetched_at, entry.modified_at))
+            self._publishing.add(task)
+            task.add_done_callback(self._publishing.discard)
+        for listener in self._listeners:
+            listener(key, value)
+        return entry
+
+    async def _publish(self, key: str, value: Any, fetched_at: float, modified_at: float) -> None:
+        try:
+            await self.shared.publish(key, value, fetched_at, modified_at)
+        except SharedStateError:
+            self.shared_errors += 1
+    
+    def add_listener(self, listener: Callable[[str, Any], Any]) -> None:
+        """Call listener(key, value) whenever a value is stored."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[str, Any], Any]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None,
+    ) -> CacheEntry:
+        """
+        Return a cached entry or fetch it once for all concurrent callers.
+
+        With a timeout, asyncio.TimeoutError is raised if the fetch takes longer,
+        but the fetch itself keeps running and still populates the cache.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_fetch(key, done))
+
+        # Shield the shared fetch so one cancelled caller does not cancel it for the others
+        if timeout is not None:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> CacheEntry:
+        if self.shared is None:
+            return self.set(key, await fetch())
+
+        try:
+            shared = await self.shared.claim(key, self.ttl)
+        except SharedStateError:
+            # Keep serving from upstream if the shared state server is unavailable
+            self.shared_errors += 1
+            return self.set(key, await fetch(), publish=False)
+        if shared is not None:
+            self.shared_hits += 1
+            return self.set(key, shared[0], fetched_at=shared[1], modified_at=shared[2], publish=False)
+
+        try:
+            value = await fetch()
+        except BaseException:
+            try:
+                await self.shared.release(key)
+            except SharedStateError:
+                self.shared_errors += 1
+            raise
+        return self.set(key, value)
+
+    def _finish_fetch(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark errors as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self) -> None:
+        """Drop all cached entries and reset counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale_served = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "stale_served": self.stale_served,
+            "in_flight": len(self._inflight),
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "shared": self.shared is not None,
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors,
+        }
+
+
+quote_cache = QuoteCache(
+    ttl=settings.QUOTE_CACHE_TTL_SECONDS,
+    max_size=settings.QUOTE_CACHE_MAX_SIZE,
+    stale_ttl=settings.QUOTE_STALE_MAX_AGE_SECONDS,
+    shared=SharedQuoteTier(
+        shared_state,
+        encode=lambda quote: quote.model_dump(),
+        decode=lambda data: StockQuoteResponse(**data),
+    ) if shared_state is not None else None,
+)
+
+registry.register(Counter(
+    "quote_cache_lookups_total",
+    "Quote cache lookups by result (coalesced: waited on another caller's fetch)",
+    ("result",),
+    function=lambda: {
+        ("hit",): quote_cache.hits,
+        ("miss",): quote_cache.misses,
+        ("coalesced",): quote_cache.coalesced,
+        ("stale",): quote_cache.stale_served,
+    },
+))
+registry.register(Counter(
+    "quote_cache_evictions_total",
+    "Quotes evicted from the cache to stay within its size",
+    function=lambda: quote_cache.evictions,
+))
+registry.register(Gauge(
+    "quote_cache_entries",
+    "Quotes held in the cache, fresh or stale",
+    function=lambda: quote_cache.stats()["size"],
+))
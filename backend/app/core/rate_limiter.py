@@ -0,0 +1,203 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.shared_state import SharedStateClient, shared_state
+
+# Used when the upstream answers 429 without a Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 5.0
+
+
+class UpstreamRateLimited(Exception):
+    """Raised when an outbound call cannot be scheduled within the wait budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream rate limit reached, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class MemoryBudgetBackend:
+    """
+    Per-process token bucket, implemented as GCRA.
+
+    The state is a single "theoretical arrival time" (TAT). Each call reserves one
+    emission interval; it may go ahead immediately while the TAT stays within the
+    burst tolerance of now, and otherwise sleeps until it would.
+    """
+
+    def __init__(self):
+        self._tat = 0.0
+        self._blocked_until = 0.0
+
+    async def reserve(self, interval: float, tolerance: float, max_wait: float) -> Optional[float]:
+        """Reserve a slot and return how long to wait for it, or None if that exceeds max_wait."""
+        now = time.time()
+        new_tat = max(self._tat, now) + interval
+        wait = max(new_tat - tolerance - now, self._blocked_until - now, 0.0)
+        if wait > max_wait:
+            return None
+        self._tat = new_tat
+        return wait
+
+    async def block(self, until: float) -> None:
+        self._blocked_until = max(self._blocked_until, until)
+
+    async def blocked_for(self) -> float:
+        return max(self._blocked_until - time.time(), 0.0)
+
+
+class RedisBudgetBackend:
+    """
+    Token bucket shared by every worker through a Redis-compatible server.
+
+    Reservation runs as one Lua script against the server clock, so replicas
+    with skewed clocks still share a single budget for the API key.
+    """
+
+    RESERVE_SCRIPT = """
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local interval = tonumber(ARGV[1])
+    local tolerance = tonumber(ARGV[2])
+    local max_wait = tonumber(ARGV[3])
+    local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+    local blocked_until = tonumber(redis.call('GET', KEYS[2]) or 0)
+    local new_tat = math.max(tat, now) + interval
+    local wait = math.max(new_tat - tolerance - now, blocked_until - now, 0)
+    if wait > max_wait then
+        return nil
+    end
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, key_prefix: str = "upstream-budget"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("UPSTREAM_RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self._redis = redis.Redis.from_url(url)
+        self._reserve = self._redis.register_script(self.RESERVE_SCRIPT)
+        self._tat_key = f"{key_prefix}:tat"
+        self._blocked_key = f"{key_prefix}:blocked-until"
+
+    async def reserve(self, interval: float, tolerance: float, max_wait: float) -> Optional[float]:
+        wait = await self._reserve(keys=[self._tat_key, self._blocked_key], args=[interval, tolerance, max_wait])
+        return float(wait) if wait is not None else None
+
+    async def block(self, until: float) -> None:
+        ttl_ms = int((until - time.time()) * 1000)
+        if ttl_ms > 0:
+            await self._redis.set(self._blocked_key, until, px=ttl_ms)
+
+    async def blocked_for(self) -> float:
+        until = await self._redis.get(self._blocked_key)
+        return max(float(until) - time.time(), 0.0) if until is not None else 0.0
+
+
+class LocalBudgetBackend:
+    """Token bucket shared by the worker processes on one host, held by the shared state server."""
+
+    def __init__(self, client: SharedStateClient, name: str = "upstream"):
+        self._client = client
+        self._name = name
+
+    async def reserve(self, interval: float, tolerance: float, max_wait: float) -> Optional[float]:
+        return await self._client.call("budget_reserve", self._name, interval, tolerance, max_wait)
+
+    async def block(self, until: float) -> None:
+        await self._client.call("budget_block", self._name, until)
+
+    async def blocked_for(self) -> float:
+        return await self._client.call("budget_blocked_for", self._name)
+
+
+class UpstreamRateLimiter:
+    """
+    Paces outbound calls so the shared API key stays under the upstream limit.
+
+    Calls wait at most `max_wait` seconds for a slot. When `max_queue` calls are
+    already waiting, or no slot is free within `max_wait`, the call is shed
+    straight away instead of waiting for a timeout.
+    """
+
+    def __init__(self, rate: float, burst: int, max_wait: float, max_queue: int, backend=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.backend = backend or MemoryBudgetBackend()
+        self.waiting = 0
+        self.acquired = 0
+        self.delayed = 0
+        self.shed = 0
+        self.throttled = 0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        if self.waiting >= self.max_queue:
+            self.shed += 1
+            raise UpstreamRateLimited(retry_after=self.max_wait)
+
+        interval = 1.0 / self.rate
+        tolerance = interval * self.burst
+        wait = await self.backend.reserve(interval, tolerance, self.max_wait)
+        if wait is None:
+            self.shed += 1
+            raise UpstreamRateLimited(retry_after=max(await self.backend.blocked_for(), interval))
+
+        if wait > 0:
+            self.delayed += 1
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+        self.acquired += 1
+
+    async def penalize(self, retry_after: Optional[str]) -> float:
+        """Pause all calls after a 429, honoring the upstream's Retry-After header."""
+        try:
+            delay = float(retry_after) if retry_after is not None else DEFAULT_RETRY_AFTER_SECONDS
+        except ValueError:
+            delay = DEFAULT_RETRY_AFTER_SECONDS
+        self.throttled += 1
+        await self.backend.block(time.time() + delay)
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "shed": self.shed,
+            "throttled_by_upstream": self.throttled,
+        }
+
+
+def create_budget_backend(backend: str = settings.UPSTREAM_RATE_LIMIT_BACKEND):
+    if backend == "memory":
+        return MemoryBudgetBackend()
+    if backend == "local":
+        if shared_state is None:
+            raise RuntimeError("SHARED_STATE_SOCKET must be set for the local backend")
+        return LocalBudgetBackend(shared_state)
+    if backend == "redis":
+        if not settings.UPSTREAM_RATE_LIMIT_REDIS_URL:
+            raise RuntimeError("UPSTREAM_RATE_LIMIT_REDIS_URL must be set for the redis backend")
+        return RedisBudgetBackend(settings.UPSTREAM_RATE_LIMIT_REDIS_URL)
+    raise ValueError(f"Unknown UPSTREAM_RATE_LIMIT_BACKEND: {backend}")
+
+
+upstream_rate_limiter = UpstreamRateLimiter(
+    rate=settings.UPSTREAM_RATE_LIMIT_PER_SECOND,
+    burst=settings.UPSTREAM_RATE_LIMIT_BURST,
+    max_wait=settings.UPSTREAM_RATE_LIMIT_MAX_WAIT_SECONDS,
+    max_queue=settings.UPSTREAM_RATE_LIMIT_MAX_QUEUE,
+    backend=create_budget_backend(),
+)
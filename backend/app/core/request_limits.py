@@ -0,0 +1,316 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import orjson
+
+from app.core.config import settings
+from app.core.security import decode_access_token_claims
+from app.core.shared_state import SharedStateClient, SharedStateError, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Paths that are never limited: probes and scrapes must keep working under load
+EXEMPT_PATHS = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """
+    `limit` requests per `period` seconds for each client, on requests whose path
+    starts with one of `paths` (and whose method is in `methods`, if given).
+
+    Clients are keyed by client IP with key="ip". With key="user" they are keyed
+    by the user id in a valid bearer token, falling back to the IP without one.
+    """
+    name: str
+    limit: int
+    period: float
+    key: str
+    paths: Tuple[str, ...] = ("/",)
+    methods: Tuple[str, ...] = ()
+
+    def matches(self, method: str, path: str) -> bool:
+        return (not self.methods or method in self.methods) and path.startswith(self.paths)
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+
+class MemoryRateLimitBackend:
+    """
+    Per-process GCRA state: one "theoretical arrival time" per client key.
+
+    Keys are kept in least-recently-used order and bounded by `max_keys`. A key
+    whose TAT has passed is back to a full burst, so it carries no state and is
+    dropped; a few are swept from the old end on every check, keeping each check
+    O(1) while idle clients expire on their own.
+    """
+
+    def __init__(self, max_keys: int = settings.RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    async def check(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        """
+        Count one request against `key`. Returns whether it is allowed and how
+        many seconds until the key's burst is fully available again.
+        """
+        now = time.time()
+        tat = max(self._tats.get(key, now), now)
+        new_tat = tat + interval
+        if new_tat - now > tolerance:
+            return False, tat - now
+
+        self._tats[key] = new_tat
+        self._tats.move_to_end(key)
+        self._expire(now)
+        return True, new_tat - now
+
+    def _expire(self, now: float, batch: int = 2) -> None:
+        for _ in range(batch):
+            if not self._tats:
+                return
+            key, tat = next(iter(self._tats.items()))
+            if tat > now and len(self._tats) <= self.max_keys:
+                return
+            del self._tats[key]
+
+    def clear(self) -> None:
+        self._tats.clear()
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class RedisRateLimitBackend:
+    """GCRA state shared by every worker and replica through a Redis-compatible server."""
+
+    CHECK_SCRIPT = """
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local interval = tonumber(ARGV[1])
+    local tolerance = tonumber(ARGV[2])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+    local new_tat = tat + interval
+    if new_tat - now > tolerance then
+        return {0, tostring(tat - now)}
+    end
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return {1, tostring(new_tat - now)}
+    """
+
+    KEY_PREFIX = "rate-limit:"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self._redis = redis.Redis.from_url(url)
+        self._check = self._redis.register_script(self.CHECK_SCRIPT)
+
+    async def check(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        allowed, reset = await self._check(keys=[self.KEY_PREFIX + key], args=[interval, tolerance])
+        return bool(allowed), float(reset)
+
+    def clear(self) -> None:
+        pass
+
+
+class LocalRateLimitBackend:
+    """GCRA state shared by the worker processes on one host, held by the shared state server."""
+
+    def __init__(self, client: SharedStateClient):
+        self._client = client
+
+    async def check(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        allowed, reset = await self._client.call("ratelimit_check", key, interval, tolerance)
+        return allowed, reset
+
+    def clear(self) -> None:
+        pass
+
+
+def create_rate_limit_backend(backend: str = settings.RATE_LIMIT_BACKEND):
+    if backend == "memory":
+        return MemoryRateLimitBackend()
+    if backend == "local":
+        if shared_state is None:
+            raise RuntimeError("SHARED_STATE_SOCKET must be set for the local backend")
+        return LocalRateLimitBackend(shared_state)
+    if backend == "redis":
+        if not settings.RATE_LIMIT_REDIS_URL:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL must be set for the redis backend")
+        return RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+
+def default_policies() -> List[RateLimitPolicy]:
+    """Route policies from settings, most specific first; a limit of 0 disables one."""
+    policies = [
+        # bcrypt-bound: limit by IP so credential guessing cannot rotate accounts
+        RateLimitPolicy("auth", settings.RATE_LIMIT_AUTH_PER_MINUTE, 60.0, "ip",
+                        paths=("/auth/login", "/auth/signup"), methods=("POST",)),
+        # Each cache miss spends upstream quota
+        RateLimitPolicy("stocks", settings.RATE_LIMIT_STOCKS_PER_MINUTE, 60.0, "user", paths=("/stocks/",)),
+        RateLimitPolicy("default", settings.RATE_LIMIT_DEFAULT_PER_MINUTE, 60.0, "user"),
+    ]
+    return [policy for policy in policies if policy.limit > 0]
+
+
+def client_ip(scope) -> str:
+    """The connecting client's address (behind a proxy, run uvicorn with --proxy-headers)."""
+    client = scope.get("client")
+    if client:
+        return client[0]
+    return "127.0.0.1"
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" else None
+    return None
+
+
+class RequestRateLimiter:
+    """
+    Applies the first matching policy to each request.
+
+    A shared backend that cannot be reached lets requests through (and counts
+    the error) rather than turning an outage of the limiter into one of the API.
+    """
+
+    def __init__(self, policies: List[RateLimitPolicy], backend=None, enabled: bool = True):
+        self.policies = policies
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    def policy_for(self, method: str, path: str) -> Optional[RateLimitPolicy]:
+        if method == "OPTIONS" or path.startswith(EXEMPT_PATHS):
+            return None
+        for policy in self.policies:
+            if policy.matches(method, path):
+                return policy
+        return None
+
+    def client_key(self, policy: RateLimitPolicy, scope) -> str:
+        if policy.key == "user":
+            token = _bearer_token(scope)
+            claims = decode_access_token_claims(token) if token else None
+            if claims is not None and claims.get("uid") is not None:
+                return f"{policy.name}:user:{claims['uid']}"
+        return f"{policy.name}:ip:{client_ip(scope)}"
+
+    async def check(self, policy: RateLimitPolicy, key: str) -> Optional[dict]:
+        """
+        Count a request and return its RateLimit headers, with Retry-After when it
+        is over the limit. None if the backend could not be reached.
+        """
+        try:
+            allowed, reset = await self.backend.check(key, policy.interval, policy.period)
+        except (SharedStateError, OSError) as e:
+            self.errors += 1
+            logger.debug("Rate limit backend unavailable: %s", e)
+            return None
+
+        headers = {
+            "RateLimit-Limit": str(policy.limit),
+            "RateLimit-Remaining": str(max(0, math.floor((policy.period - reset) / policy.interval + 1e-9))),
+            "RateLimit-Reset": str(math.ceil(reset)),
+            "RateLimit-Policy": f"{policy.limit};w={policy.period:g}",
+        }
+        if allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+            headers["RateLimit-Remaining"] = "0"
+            # The next request fits once one interval has drained from the burst
+            headers["Retry-After"] = str(max(1, math.ceil(reset + policy.interval - policy.period)))
+        return headers
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "policies": [
+                {"name": policy.name, "limit": policy.limit, "period": policy.period, "key": policy.key}
+                for policy in self.policies
+            ],
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "backend_errors": self.errors,
+        }
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing per-route request rate limits.
+
+    Allowed responses carry RateLimit-Limit/-Remaining/-Reset/-Policy headers;
+    requests over the limit are answered with 429 and Retry-After before
+    reaching the route.
+    """
+
+    def __init__(self, app, limiter: Optional["RequestRateLimiter"] = None):
+        self.app = app
+        self.limiter = limiter or request_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.limiter.policy_for(scope["method"], scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = await self.limiter.check(policy, self.limiter.client_key(policy, scope))
+        if headers is None:
+            await self.app(scope, receive, send)
+            return
+
+        raw_headers = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+        if "Retry-After" in headers:
+            body = orjson.dumps({"detail": "Too many requests"})
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *raw_headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *raw_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+request_limiter = RequestRateLimiter(
+    default_policies(),
+    backend=create_rate_limit_backend(),
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
@@ -0,0 +1,150 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # Optional: MessagePack is only offered when installed
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def pack_msgpack(content) -> bytes:
+    return msgpack.packb(content, use_bin_type=True)
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Pick the response media type for an Accept header.
+
+    MessagePack is chosen only when the client ranks it above JSON (or lists
+    no JSON at all) and the msgpack package is installed; everything else
+    gets JSON.
+    """
+    if not accept or msgpack is None:
+        return JSON_MEDIA_TYPE
+
+    msgpack_q = json_q = 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            json_q = max(json_q, q)
+    return MSGPACK_MEDIA_TYPE if msgpack_q > json_q else JSON_MEDIA_TYPE
+
+
+def encode(media_type: str, model: BaseModel) -> bytes:
+    """Serialize a validated model with pydantic's compiled serializer."""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return pack_msgpack(model.model_dump())
+    return model.__pydantic_serializer__.to_json(model)
+
+
+def model_response(
+    request: Request,
+    model: BaseModel,
+    headers: Optional[Dict[str, str]] = None,
+    rendered: Optional[Dict[str, bytes]] = None,
+) -> Response:
+    """
+    Respond with an already validated model as JSON or MessagePack, per the Accept header.
+
+    Returning a Response skips FastAPI's response_model pass, which would
+    validate the model again and encode it through jsonable_encoder. When
+    `rendered` is given it caches the encoded body per media type for as long
+    as the model lives (for quotes, the cache entry), so repeated hits are not
+    serialized again.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    if rendered is None:
+        body = encode(media_type, model)
+    else:
+        body = rendered.get(media_type)
+        if body is None:
+            body = rendered[media_type] = encode(media_type, model)
+    return Response(body, media_type=media_type, headers={**(headers or {}), "Vary": "Accept"})
+
+
+def entity_tag(model: BaseModel, rendered: Optional[Dict[str, bytes]] = None) -> str:
+    """
+    Weak ETag for a model: a hash of its JSON encoding.
+
+    Every media type a model is served as shares the tag, hence weak. The JSON
+    body is taken from (or stored in) `rendered` when given.
+    """
+    if rendered is None:
+        body = encode(JSON_MEDIA_TYPE, model)
+    else:
+        body = rendered.get(JSON_MEDIA_TYPE)
+        if body is None:
+            body = rendered[JSON_MEDIA_TYPE] = encode(JSON_MEDIA_TYPE, model)
+    return f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """
+    Whether the client's cached copy is current, per RFC 9110: If-None-Match
+    (weak comparison) when sent, otherwise If-Modified-Since.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        opaque = etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since
+
+
+def cached_model_response(
+    request: Request,
+    model: BaseModel,
+    max_age: float,
+    last_modified: float,
+    headers: Optional[Dict[str, str]] = None,
+    rendered: Optional[Dict[str, bytes]] = None,
+) -> Response:
+    """
+    model_response with HTTP caching validators for a model that is fresh for
+    another `max_age` seconds and was fetched at `last_modified` (UNIX time).
+
+    A client that already holds this version gets 304 Not Modified with no
+    body, so nothing is sent (or encoded) for unchanged data.
+    """
+    headers = {
+        **(headers or {}),
+        "ETag": entity_tag(model, rendered),
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": f"private, max-age={max(0, int(max_age))}",
+    }
+    if not_modified(request, headers["ETag"], last_modified):
+        return Response(status_code=304, headers={**headers, "Vary": "Accept"})
+    return model_response(request, model, headers, rendered)
@@ -1,21 +1,241 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from passlib.hash import argon2
 from app.core.config import settings
+from app.core.metrics import Counter, registry
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Cost bounds per scheme (bcrypt: log2 rounds, argon2: time cost). Calibration
+# never goes below the floor, however fast the target.
+MIN_ROUNDS = {"bcrypt": 10, "argon2": 2}
+MAX_ROUNDS = {"bcrypt": 16, "argon2": 20}
+# Cheap cost the hardware is timed at before extrapolating to the target
+PROBE_ROUNDS = {"bcrypt": 8, "argon2": 1}
+
+
+def build_password_context(scheme: str, rounds: int) -> CryptContext:
+    """
+    A CryptContext hashing with `scheme` at `rounds`.
+
+    Hashes in another scheme or below `rounds` need an update; stronger ones
+    are kept, so a host that calibrates lower never downgrades them.
+    """
+    if scheme == "bcrypt":
+        return CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds
+        )
+    if scheme == "argon2":
+        if not argon2.has_backend():
+            raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requires the 'argon2-cffi' package")
+        # Existing bcrypt hashes still verify, and are rehashed to argon2 on login
+        return CryptContext(
+            schemes=["argon2", "bcrypt"],
+            deprecated="auto",
+            argon2__default_rounds=rounds,
+            argon2__min_rounds=rounds,
+            argon2__memory_cost=settings.PASSWORD_ARGON2_MEMORY_KIB,
+            argon2__parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+        )
+    raise ValueError(f"Unknown PASSWORD_HASH_SCHEME: {scheme}")
+
+
+def time_verify(context: CryptContext, repeats: int = 3) -> float:
+    """Best-of-`repeats` seconds to verify a password hashed by `context`."""
+    hashed = context.hash("calibration-password")
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        context.verify("calibration-password", hashed)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate_rounds(scheme: str, target_seconds: float) -> int:
+    """
+    The highest cost at which verifying stays within `target_seconds` on this host.
+
+    Verify time is measured once at a cheap probe cost and extrapolated: each
+    bcrypt round doubles the work, while argon2 time cost scales linearly.
+    """
+    if target_seconds <= 0:
+        # No cost is fast enough, so settle on the floor
+        return MIN_ROUNDS[scheme]
+    probe = PROBE_ROUNDS[scheme]
+    elapsed = time_verify(build_password_context(scheme, probe))
+    if scheme == "bcrypt":
+        rounds = probe + math.floor(math.log2(target_seconds / elapsed))
+    else:
+        rounds = math.floor(probe * target_seconds / elapsed)
+    return min(max(rounds, MIN_ROUNDS[scheme]), MAX_ROUNDS[scheme])
+
+
+class PasswordHasher:
+    """
+    Password hashing at a configurable cost.
+
+    With `rounds` of 0 the cost is calibrated on startup to the highest one
+    that verifies within `target_ms` on the host. Until then the scheme's floor
+    is used. Workers sharing state must agree on the cost, so gunicorn.conf.py
+    calibrates once in the master and hands the result to every worker.
+    Hashes in another scheme or at a lower cost are rehashed on the next
+    successful login (see verify_and_update).
+    """
+
+    def __init__(self, scheme: str, rounds: int = 0, target_ms: float = 100.0):
+        self.scheme = scheme
+        self.target_ms = target_ms
+        self.calibrated = rounds <= 0
+        self.rounds = rounds if rounds > 0 else MIN_ROUNDS[scheme]
+        self.context = build_password_context(scheme, self.rounds)
+        self.verify_ms: Optional[float] = None
+        self.rehashed = 0
+        self._configured = not self.calibrated
+        self._lock = threading.Lock()
+
+    def configure(self) -> None:
+        """Calibrate the cost if needed and time a verify at it. Called from the application lifespan."""
+        with self._lock:
+            if self._configured:
+                return
+            if settings.SHARED_STATE_SOCKET:
+                # Workers calibrating separately can land on different costs
+                raise RuntimeError(
+                    "PASSWORD_HASH_ROUNDS must be fixed when SHARED_STATE_SOCKET is set; "
+                    "run under gunicorn.conf.py to calibrate it once for all workers"
+                )
+            self._calibrate()
+
+    def calibrate(self) -> int:
+        """Calibrate the cost now and return it. Called from the gunicorn master before forking workers."""
+        with self._lock:
+            self._calibrate()
+            return self.rounds
+
+    def _calibrate(self) -> None:
+        self.rounds = calibrate_rounds(self.scheme, self.target_ms / 1000)
+        self.context = build_password_context(self.scheme, self.rounds)
+        self.verify_ms = round(time_verify(self.context, repeats=1) * 1000, 3)
+        self._configured = True
+        logger.info("Password hashing: %s cost %d, %.1f ms per verify", self.scheme, self.rounds, self.verify_ms)
+
+    def hash(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self.context.verify(password, hashed)
+
+    def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; when its hash is outdated, also return a new hash at the current cost."""
+        verified, new_hash = self.context.verify_and_update(password, hashed)
+        if new_hash is not None:
+            self.rehashed += 1
+        return verified, new_hash
+
+    def stats(self) -> dict:
+        return {
+            "scheme": self.scheme,
+            "rounds": self.rounds,
+            "calibrated": self.calibrated,
+            "target_ms": self.target_ms if self.calibrated else None,
+            "verify_ms": self.verify_ms,
+            "rehashed": self.rehashed,
+        }
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_SCHEME,
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+    target_ms=settings.PASSWORD_HASH_TARGET_MS,
+)
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of already-verified tokens and their claims.
+
+    Repeated requests with the same bearer token skip the HMAC verification.
+    Each entry is dropped at the token's own `exp`, so expired tokens are never
+    served from the cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        claims = self._entries.get(token)
+        if claims is None:
+            self.misses += 1
+            return None
+        if claims["exp"] <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        if self.max_size <= 0 or not isinstance(claims.get("exp"), (int, float)):
+            return
+        self._entries[token] = claims
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+verified_token_cache = VerifiedTokenCache(max_size=settings.JWT_CACHE_MAX_SIZE)
+
+registry.register(Counter(
+    "jwt_cache_lookups_total",
+    "Verified-token cache lookups by result",
+    ("result",),
+    function=lambda: {("hit",): verified_token_cache.hits, ("miss",): verified_token_cache.misses},
+))
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning a replacement hash if the stored one uses an outdated cost."""
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -26,18 +246,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti identifies the token for revocation without storing the token itself
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[str]:
-    """Decode a JWT token and return the email."""
+def decode_access_token_claims(token: str) -> Optional[dict]:
+    """Decode and verify a JWT token, returning all of its claims."""
+    payload = verified_token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        if payload.get("sub") is None:
             return None
-        return email
+        verified_token_cache.set(token, payload)
+        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+
+def decode_access_token(token: str) -> Optional[str]:
+    """Decode a JWT token and return the email."""
+    payload = decode_access_token_claims(token)
+    if payload is None:
+        return None
+    return payload["sub"]
@@ -0,0 +1,454 @@
+"""
+Host-local shared state for running the API as several worker processes.
+
+One `SharedStateServer` process listens on a Unix socket and holds the hot
+state that must not diverge between workers: the latest quote per symbol
+(with a per-symbol fetch claim, so only one worker calls upstream for it),
+revoked tokens, the upstream rate-limit budget, per-client request rate
+limits, leader leases for background jobs, and a log of price alert changes
+that every worker follows. Workers reach it through `SharedStateClient` (async,
+multiplexed over one connection) or `SyncSharedStateClient` (blocking, for
+synchronous call sites).
+
+Frames are a 4-byte big-endian length followed by an orjson array:
+[request_id, op, *args] from the client, [request_id, ok, result] back.
+
+The gunicorn config starts the server automatically. Under another process
+manager, run it next to the workers and point SHARED_STATE_SOCKET at it:
+
+    python -m app.core.shared_state --socket /tmp/stockapp-state.sock
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.core.config import settings
+
+HEADER = struct.Struct(">I")
+
+# How often the server drops expired revocations and leases
+SWEEP_INTERVAL_SECONDS = 60.0
+
+# Alert changes kept for workers to catch up on, and fired alert ids remembered
+ALERT_EVENT_LOG_SIZE = 10000
+MAX_FIRED_ALERTS = 100000
+
+
+class SharedStateError(Exception):
+    """Raised when the shared state server cannot be reached or rejects a call."""
+
+
+def _encode(message: list) -> bytes:
+    payload = orjson.dumps(message)
+    return HEADER.pack(len(payload)) + payload
+
+
+class _Claim:
+    __slots__ = ("expires_at", "done")
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.done = asyncio.Event()
+
+
+class SharedStateServer:
+    """
+    The single owner of cross-worker state. All operations run on one event loop,
+    so each is atomic without locks.
+
+    Quote timestamps are time.monotonic() values, which share one clock for
+    every process on the host. Each quote also keeps the wall-clock time it was
+    fetched at, so every worker reports the same Last-Modified for it.
+    """
+
+    def __init__(self, max_quotes: int = settings.QUOTE_CACHE_MAX_SIZE):
+        from app.core.rate_limiter import MemoryBudgetBackend
+        from app.core.request_limits import MemoryRateLimitBackend
+
+        self.max_quotes = max_quotes
+        self._quotes: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._claims: Dict[str, _Claim] = {}
+        self._revoked: Dict[str, float] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._budgets: Dict[str, MemoryBudgetBackend] = {}
+        self._budget_backend = MemoryBudgetBackend
+        self._request_limits = MemoryRateLimitBackend()
+        self._alert_events: deque = deque(maxlen=ALERT_EVENT_LOG_SIZE)
+        self._alert_seq = 0
+        self._alert_changed = asyncio.Event()
+        self._fired_alerts: "OrderedDict[int, None]" = OrderedDict()
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self.connections = 0
+        self.calls = 0
+
+    # Quotes
+
+    async def op_quote_claim(self, key: str, ttl: float, lease: float):
+        """
+        Return ["hit", value, fetched_at, modified_at] for a fresh quote, or ["claim"] when the
+        caller should fetch it. While another worker holds the claim, wait for
+        its result instead of fetching the same symbol again.
+        """
+        while True:
+            now = time.monotonic()
+            entry = self._quotes.get(key)
+            if entry is not None and now - entry[1] < ttl:
+                self._quotes.move_to_end(key)
+                return ["hit", *entry]
+
+            claim = self._claims.get(key)
+            if claim is None or claim.expires_at <= now:
+                self._claims[key] = _Claim(now + lease)
+                return ["claim"]
+            try:
+                await asyncio.wait_for(claim.done.wait(), claim.expires_at - now)
+            except asyncio.TimeoutError:
+                pass
+
+    async def op_quote_set(self, key: str, value: Any, fetched_at: float, modified_at: float):
+        current = self._quotes.get(key)
+        if current is None or current[1] <= fetched_at:
+            self._quotes[key] = (value, fetched_at, modified_at)
+            self._quotes.move_to_end(key)
+            while len(self._quotes) > self.max_quotes:
+                self._quotes.popitem(last=False)
+        self._finish_claim(key)
+
+    async def op_quote_release(self, key: str):
+        """Give up a claim after a failed fetch; the next waiter claims it instead."""
+        self._finish_claim(key)
+
+    def _finish_claim(self, key: str) -> None:
+        claim = self._claims.pop(key, None)
+        if claim is not None:
+            claim.done.set()
+
+    # Revoked tokens
+
+    async def op_revoke_add(self, key: str, expires_at: float):
+        if expires_at > time.time():
+            self._revoked[key] = expires_at
+
+    async def op_revoke_get(self, key: str):
+        expires_at = self._revoked.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            del self._revoked[key]
+            return None
+        return expires_at
+
+    async def op_revoke_clear(self):
+        self._revoked.clear()
+
+    # Upstream rate-limit budget
+
+    def _budget(self, name: str):
+        budget = self._budgets.get(name)
+        if budget is None:
+            budget = self._budgets[name] = self._budget_backend()
+        return budget
+
+    async def op_budget_reserve(self, name: str, interval: float, tolerance: float, max_wait: float):
+        return await self._budget(name).reserve(interval, tolerance, max_wait)
+
+    async def op_budget_block(self, name: str, until: float):
+        await self._budget(name).block(until)
+
+    async def op_budget_blocked_for(self, name: str):
+        return await self._budget(name).blocked_for()
+
+    # Per-client request rate limits
+
+    async def op_ratelimit_check(self, key: str, interval: float, tolerance: float):
+        return await self._request_limits.check(key, interval, tolerance)
+
+    # Leader leases
+
+    async def op_lease(self, name: str, holder: str, ttl: float):
+        """Acquire or renew a named lease; True if holder owns it for the next ttl seconds."""
+        now = time.monotonic()
+        current = self._leases.get(name)
+        if current is None or current[0] == holder or current[1] <= now:
+            self._leases[name] = (holder, now + ttl)
+            return True
+        return False
+
+    # Price alert changes, followed by every worker
+
+    def _append_alert_event(self, event: dict) -> int:
+        self._alert_seq += 1
+        self._alert_events.append(event)
+        # Wake every waiting poll, then start a new round
+        self._alert_changed.set()
+        self._alert_changed = asyncio.Event()
+        return self._alert_seq
+
+    async def op_alerts_publish(self, event: dict):
+        """Log an alert change ({"type": "add", "alert": [...]} or {"type": "remove", "id": ...})."""
+        if event["type"] == "add":
+            # An alert saved again may fire again
+            self._fired_alerts.pop(event["alert"][0], None)
+        return self._append_alert_event(event)
+
+    async def op_alerts_trigger(self, alerts: List[list], price: float, triggered_at: str):
+        """
+        Fire crossed alerts exactly once across workers: return (and log as
+        triggered) only those no other worker has fired already.
+        """
+        fired = [alert for alert in alerts if alert[0] not in self._fired_alerts]
+        for alert in fired:
+            self._fired_alerts[alert[0]] = None
+        while len(self._fired_alerts) > MAX_FIRED_ALERTS:
+            self._fired_alerts.popitem(last=False)
+        if fired:
+            self._append_alert_event(
+                {"type": "triggered", "alerts": fired, "price": price, "triggered_at": triggered_at}
+            )
+        return fired
+
+    async def op_alerts_poll(self, after: int, timeout: float):
+        """
+        Return [seq, events logged after `after`], waiting up to `timeout` for one.
+        Events are None when they are no longer all in the log (or the server
+        restarted), and the caller must reload alerts from the database.
+        """
+        if after < 0:
+            return [self._alert_seq, []]
+        if after == self._alert_seq:
+            try:
+                await asyncio.wait_for(self._alert_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        first = self._alert_seq - len(self._alert_events) + 1
+        if after > self._alert_seq or after + 1 < first:
+            return [self._alert_seq, None]
+        return [self._alert_seq, list(itertools.islice(self._alert_events, after + 1 - first, None))]
+
+    async def op_stats(self):
+        return {
+            "quotes": len(self._quotes),
+            "claims": len(self._claims),
+            "revoked": len(self._revoked),
+            "rate_limited_clients": len(self._request_limits),
+            "leases": {name: holder for name, (holder, _) in self._leases.items()},
+            "alert_events": self._alert_seq,
+            "connections": self.connections,
+            "calls": self.calls,
+        }
+
+    def sweep(self) -> None:
+        now, wall = time.monotonic(), time.time()
+        self._revoked = {key: expires for key, expires in self._revoked.items() if expires > wall}
+        self._leases = {name: lease for name, lease in self._leases.items() if lease[1] > now}
+
+    # Transport
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._handlers[asyncio.current_task()] = writer
+        tasks = set()
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                request = orjson.loads(await reader.readexactly(HEADER.unpack(header)[0]))
+                # Calls run concurrently so a waiting quote claim does not block the connection
+                task = asyncio.ensure_future(self._dispatch(writer, request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            self._handlers.pop(asyncio.current_task(), None)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, request: list) -> None:
+        request_id, op, args = request[0], request[1], request[2:]
+        self.calls += 1
+        handler = getattr(self, f"op_{op}", None)
+        try:
+            if handler is None:
+                raise SharedStateError(f"Unknown operation: {op}")
+            response = [request_id, True, await handler(*args)]
+        except Exception as e:
+            response = [request_id, False, str(e)]
+        if not writer.is_closing():
+            writer.write(_encode(response))
+
+    async def serve(self, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        os.chmod(path, 0o600)
+        try:
+            async with server:
+                while True:
+                    await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+                    self.sweep()
+        finally:
+            # Drop open connections too, so no handler outlives the server
+            handlers = list(self._handlers.items())
+            for _, writer in handlers:
+                writer.close()
+            await asyncio.gather(*(handler for handler, _ in handlers), return_exceptions=True)
+
+
+class SharedStateClient:
+    """
+    Async client for the shared state server.
+
+    Calls from one event loop share a single connection; responses are matched
+    to callers by request id, so a call blocked on a quote claim does not hold
+    up others. The connection is opened on first use and reopened after errors.
+    """
+
+    def __init__(self, path: str, timeout: float = settings.SHARED_STATE_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._ids = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self.errors = 0
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (e.g. in tests): start over
+            self._loop, self._writer, self._reader_task = loop, None, None
+            self._pending = {}
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                self._reader_task = asyncio.ensure_future(self._read(reader))
+        return self._writer
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                request_id, ok, result = orjson.loads(await reader.readexactly(HEADER.unpack(header)[0]))
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(SharedStateError(result))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(SharedStateError(f"Shared state connection lost: {e!r}"))
+            self._pending.clear()
+
+    async def call(self, op: str, *args: Any, timeout: Optional[float] = None) -> Any:
+        try:
+            writer = await self._connect()
+        except OSError as e:
+            self.errors += 1
+            raise SharedStateError(f"Shared state server unavailable: {e}")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        writer.write(_encode([request_id, op, *args]))
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            raise SharedStateError(f"Shared state call {op} timed out")
+        except SharedStateError:
+            self.errors += 1
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+
+class SyncSharedStateClient:
+    """Blocking client with one connection per thread, for synchronous call sites."""
+
+    def __init__(self, path: str, timeout: float = settings.SHARED_STATE_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "socket", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.socket = sock
+        return sock
+
+    def _recv_exactly(self, sock: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("connection closed")
+            data.extend(chunk)
+        return bytes(data)
+
+    def call(self, op: str, *args: Any) -> Any:
+        try:
+            sock = self._socket()
+            sock.sendall(_encode([0, op, *args]))
+            size = HEADER.unpack(self._recv_exactly(sock, HEADER.size))[0]
+            _, ok, result = orjson.loads(self._recv_exactly(sock, size))
+        except OSError as e:
+            sock = getattr(self._local, "socket", None)
+            if sock is not None:
+                sock.close()
+                self._local.socket = None
+            raise SharedStateError(f"Shared state server unavailable: {e}")
+        if not ok:
+            raise SharedStateError(result)
+        return result
+
+
+shared_state: Optional[SharedStateClient] = (
+    SharedStateClient(settings.SHARED_STATE_SOCKET) if settings.SHARED_STATE_SOCKET else None
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared state server for multi-worker deployments")
+    parser.add_argument("--socket", default=settings.SHARED_STATE_SOCKET, help="Unix socket path to listen on")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("--socket or SHARED_STATE_SOCKET is required")
+    try:
+        asyncio.run(SharedStateServer().serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,376 @@
-from datetime import datetime, timedelta
-from typing import Set
+import asyncio
+import hashlib
+import heapq
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-# Simple in-memory token blacklist
-# In production, you'd use Redis or a database
-blacklisted_tokens: Set[str] = set()
+from fastapi import HTTPException, status
+from sqlalchemy.exc import SQLAlchemyError
 
-def blacklist_token(token: str):
-    """Add a token to the blacklist"""
-    blacklisted_tokens.add(token)
+from app.core.config import settings
+from app.core.executors import db_executor
+from app.core.security import decode_access_token_claims, verified_token_cache
+from app.core.shared_state import SharedStateClient, SharedStateError, SyncSharedStateClient, shared_state
 
-def is_token_blacklisted(token: str) -> bool:
+logger = logging.getLogger(__name__)
+
+
+class RevocationStore(ABC):
+    """
+    Interface for revoked-token storage.
+
+    Tokens are keyed by their `jti` claim and kept only until their own `exp`,
+    after which they are invalid anyway and can be forgotten.
+
+    `is_revoked` runs on every authenticated request and must not block the
+    event loop; the other methods may block and are called off the loop
+    (logout and the periodic sweep run them on the DB executor).
+    """
+
+    @abstractmethod
+    def add(self, key: str, expires_at: float) -> None:
+        ...
+
+    @abstractmethod
+    async def is_revoked(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def cleanup(self) -> int:
+        """Remove expired entries, returning how many were removed."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class MemoryRevocationStore(RevocationStore):
+    """
+    Per-process store: a dict for O(1) lookups plus a heap ordered by expiry for eviction.
+
+    Logout and the sweeper write from executor threads while requests read on
+    the event loop, so every access goes through a lock.
+    """
+
+    def __init__(self):
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, key: str, expires_at: float) -> None:
+        with self._lock:
+            self._cleanup()
+            if expires_at <= time.time():
+                return
+            self._expiry[key] = expires_at
+            heapq.heappush(self._heap, (expires_at, key))
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._expiry.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._expiry[key]
+                return False
+            return True
+
+    async def is_revoked(self, key: str) -> bool:
+        return self.contains(key)
+
+    def cleanup(self) -> int:
+        with self._lock:
+            return self._cleanup()
+
+    def _cleanup(self) -> int:
+        now = time.time()
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._heap)
+            if self._expiry.get(key) == expires_at:
+                del self._expiry[key]
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expiry.clear()
+            self._heap.clear()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+
+class SharedRevocationStore(RevocationStore):
+    """
+    Base for stores shared between worker processes.
+
+    Lookups are answered from a local copy whenever possible: tokens known to be
+    revoked stay revoked until they expire, and "not revoked" answers are trusted
+    for TOKEN_BLACKLIST_NEGATIVE_CACHE_SECONDS before asking the backend again.
+
+    When the backend cannot be reached, authenticated requests are rejected
+    with 503 (the default), or with fail_open, tokens not known locally to be
+    revoked are accepted so an outage of the store is not an outage of every
+    authenticated route.
+    """
+
+    # Errors meaning the backend could not answer, as opposed to bugs
+    backend_errors: Tuple[type, ...] = (SharedStateError, OSError)
+
+    def __init__(
+        self,
+        negative_ttl: float = settings.TOKEN_BLACKLIST_NEGATIVE_CACHE_SECONDS,
+        fail_open: bool = settings.TOKEN_BLACKLIST_FAIL_OPEN,
+    ):
+        self.negative_ttl = negative_ttl
+        self.fail_open = fail_open
+        self.lookup_errors = 0
+        self._revoked = MemoryRevocationStore()
+        self._not_revoked = MemoryRevocationStore()
+
+    def add(self, key: str, expires_at: float) -> None:
+        self._revoked.add(key, expires_at)
+        self._not_revoked.clear()
+        self._backend_add(key, expires_at)
+
+    async def is_revoked(self, key: str) -> bool:
+        if self._revoked.contains(key):
+            return True
+        if self.negative_ttl > 0 and self._not_revoked.contains(key):
+            return False
+
+        try:
+            expires_at = await self._backend_lookup(key)
+        except self.backend_errors as e:
+            self.lookup_errors += 1
+            if self.fail_open:
+                logger.warning("Revocation backend unavailable, accepting token: %s", e)
+                return False
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Token revocation check unavailable, please retry",
+                headers={"Retry-After": "1"},
+            )
+        if expires_at is not None:
+            self._revoked.add(key, expires_at)
+            return True
+        if self.negative_ttl > 0:
+            self._not_revoked.add(key, time.time() + self.negative_ttl)
+        return False
+
+    def cleanup(self) -> int:
+        self._revoked.cleanup()
+        self._not_revoked.cleanup()
+        return self._backend_cleanup()
+
+    def clear(self) -> None:
+        self._revoked.clear()
+        self._not_revoked.clear()
+        self._backend_clear()
+
+    @abstractmethod
+    def _backend_add(self, key: str, expires_at: float) -> None:
+        ...
+
+    @abstractmethod
+    async def _backend_lookup(self, key: str) -> Optional[float]:
+        """Return the expiry of a revoked key, or None if it is not revoked."""
+
+    def _backend_cleanup(self) -> int:
+        return 0
+
+    @abstractmethod
+    def _backend_clear(self) -> None:
+        ...
+
+
+class SQLRevocationStore(SharedRevocationStore):
+    """
+    Revoked tokens in the `revoked_tokens` table, shared through the application database.
+
+    Lookups run on the DB executor. Expired rows are deleted by the periodic sweep.
+    """
+
+    backend_errors = (SQLAlchemyError, OSError)
+
+    def __init__(self, session_factory=None, **kwargs):
+        super().__init__(**kwargs)
+        if session_factory is None:
+            from app.core.database import SessionLocal
+            session_factory = SessionLocal
+        self._session = session_factory
+
+    def _backend_add(self, key: str, expires_at: float) -> None:
+        from app.models.revoked_token import RevokedToken
+        with self._session() as db:
+            db.merge(RevokedToken(jti=key, expires_at=datetime.utcfromtimestamp(expires_at)))
+            db.commit()
+
+    async def _backend_lookup(self, key: str) -> Optional[float]:
+        return await db_executor.run(self._lookup, key)
+
+    def _lookup(self, key: str) -> Optional[float]:
+        from app.models.revoked_token import RevokedToken
+        with self._session() as db:
+            revoked = db.get(RevokedToken, key)
+            if revoked is None:
+                return None
+            expires_at = (revoked.expires_at - datetime(1970, 1, 1)).total_seconds()
+            return expires_at if expires_at > time.time() else None
+
+    def _backend_cleanup(self) -> int:
+        from app.models.revoked_token import RevokedToken
+        with self._session() as db:
+            removed = db.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+            db.commit()
+            return removed
+
+    def _backend_clear(self) -> None:
+        from app.models.revoked_token import RevokedToken
+        with self._session() as db:
+            db.query(RevokedToken).delete()
+            db.commit()
+
+
+class LocalRevocationStore(SharedRevocationStore):
+    """
+    Revoked tokens held by the shared state server, shared by the worker processes on one host.
+
+    Lookups go through the async client; writes come from executor threads and
+    use a blocking one.
+    """
+
+    def __init__(self, path: str, client: Optional[SharedStateClient] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._client = SyncSharedStateClient(path)
+        self._async_client = client or SharedStateClient(path)
+
+    def _backend_add(self, key: str, expires_at: float) -> None:
+        self._client.call("revoke_add", key, expires_at)
+
+    async def _backend_lookup(self, key: str) -> Optional[float]:
+        return await self._async_client.call("revoke_get", key)
+
+    def _backend_clear(self) -> None:
+        self._client.call("revoke_clear")
+
+
+class RedisRevocationStore(SharedRevocationStore):
+    """Revoked tokens in a Redis-compatible server. Keys expire on the server at the token's `exp`."""
+
+    KEY_PREFIX = "revoked-token:"
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("TOKEN_BLACKLIST_BACKEND=redis requires the 'redis' package")
+        self.backend_errors = (redis.RedisError, OSError)
+        # Writes come from executor threads, lookups from the event loop
+        self._redis = redis.Redis.from_url(url)
+        self._async_redis = redis.asyncio.Redis.from_url(url)
+
+    def _backend_add(self, key: str, expires_at: float) -> None:
+        self._redis.set(self.KEY_PREFIX + key, int(expires_at), exat=int(expires_at) + 1)
+
+    async def _backend_lookup(self, key: str) -> Optional[float]:
+        expires_at = await self._async_redis.get(self.KEY_PREFIX + key)
+        return float(expires_at) if expires_at is not None else None
+
+    def _backend_clear(self) -> None:
+        keys = list(self._redis.scan_iter(match=self.KEY_PREFIX + "*"))
+        if keys:
+            self._redis.delete(*keys)
+
+
+def create_revocation_store(backend: str = settings.TOKEN_BLACKLIST_BACKEND) -> RevocationStore:
+    if backend == "memory":
+        return MemoryRevocationStore()
+    if backend == "local":
+        if not settings.SHARED_STATE_SOCKET:
+            raise RuntimeError("SHARED_STATE_SOCKET must be set for the local backend")
+        return LocalRevocationStore(settings.SHARED_STATE_SOCKET, client=shared_state)
+    if backend == "sql":
+        return SQLRevocationStore()
+    if backend == "redis":
+        if not settings.TOKEN_BLACKLIST_REDIS_URL:
+            raise RuntimeError("TOKEN_BLACKLIST_REDIS_URL must be set for the redis backend")
+        return RedisRevocationStore(settings.TOKEN_BLACKLIST_REDIS_URL)
+    raise ValueError(f"Unknown TOKEN_BLACKLIST_BACKEND: {backend}")
+
+
+revoked_tokens: RevocationStore = create_revocation_store()
+
+
+def _token_key(token: str, claims: dict) -> str:
+    """Key on jti; tokens issued before jti existed fall back to a hash of the token."""
+    return claims.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+
+def blacklist_token(token: str, claims: Optional[dict] = None):
+    """Add a token to the blacklist until it expires"""
+    claims = claims or decode_access_token_claims(token)
+    if claims is None:
+        # Invalid or already expired tokens cannot be used anyway
+        return
+    revoked_tokens.add(_token_key(token, claims), float(claims["exp"]))
+    verified_token_cache.invalidate(token)
+
+
+async def is_token_blacklisted(token: str, claims: Optional[dict] = None) -> bool:
     """Check if a token is blacklisted"""
-    return token in blacklisted_tokens
+    claims = claims or decode_access_token_claims(token)
+    if claims is None:
+        return False
+    return await revoked_tokens.is_revoked(_token_key(token, claims))
+
 
-def cleanup_expired_tokens():
+def cleanup_expired_tokens() -> int:
     """
     Clean up expired tokens
     """
-    pass
+    return revoked_tokens.cleanup()
+
 
-# We'll clear the blacklist periodically
 def clear_blacklist():
     """Clear all blacklisted tokens"""
-    global blacklisted_tokens
-    blacklisted_tokens = set()
\ No newline at end of file
+    revoked_tokens.clear()
+
+
+class RevocationSweeper:
+    """Periodically removes expired revocations, so the shared stores do not grow without bound."""
+
+    def __init__(self, interval: float = settings.TOKEN_BLACKLIST_CLEANUP_INTERVAL_SECONDS):
+        self.interval = interval
+        self.removed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the background loop. Called from the application lifespan."""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background loop. Called on application shutdown."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.removed += await db_executor.run(cleanup_expired_tokens)
+            except Exception:
+                logger.exception("Revoked token cleanup failed")
+
+
+revocation_sweeper = RevocationSweeper()
@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models.user import User
+
+
+class UserCache:
+    """Small TTL cache of authenticated user snapshots, keyed by email, with LRU eviction."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> Optional[Any]:
+        entry = self._entries.get(email)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            self._entries.pop(email, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(email)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, email: str, value: Any) -> Any:
+        self._entries[email] = (value, time.monotonic())
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, email: str) -> None:
+        self._entries.pop(email, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+user_cache = UserCache(
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    max_size=settings.USER_CACHE_MAX_SIZE,
+)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target: User) -> None:
+    """Drop deleted users from the cache so their tokens stop resolving."""
+    user_cache.invalidate(target.email)
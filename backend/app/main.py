@@ -1,9 +1,26 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.circuit_breaker import upstream_circuit_breaker
 from app.core.config import settings
-from app.core.database import init_db
-from app.api import auth, stocks
+from app.core.database import check_db, init_db
+from app.core.executors import db_executor, password_executor
+from app.core.http_client import upstream_client
+from app.core.metrics import PrometheusMiddleware, registry
+from app.core.profiling import request_profiler
+from app.core.quote_cache import quote_cache
+from app.core.rate_limiter import upstream_rate_limiter
+from app.core.request_limits import RateLimitMiddleware, request_limiter
+from app.core.security import password_hasher, verified_token_cache
+from app.core.shared_state import SharedStateError, shared_state
+from app.core.token_blacklist import cleanup_expired_tokens, revocation_sweeper
+from app.core.user_cache import user_cache
+from app.services.alerts import alert_engine
+from app.services.ingestion import quote_ingestion
+from app.services.providers import quote_provider
+from app.services.streaming import quote_stream_hub
+from app.api import admin, alerts, auth, stocks, watchlists
 
 
 @asynccontextmanager
@@ -12,8 +29,27 @@ async def lifespan(app: FastAPI):
     # Startup
     init_db()
     print("Database tables created")
+    cleanup_expired_tokens()
+    # Pick the password hash cost for this host before serving logins
+    await password_executor.run(password_hasher.configure)
+    await upstream_client.start()
+    await quote_provider.start()
+    await alert_engine.start()
+    await revocation_sweeper.start()
+    if settings.INGESTION_ENABLED:
+        await quote_ingestion.start()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    await quote_ingestion.close()
+    await revocation_sweeper.close()
+    await alert_engine.close()
+    await quote_stream_hub.close()
+    await quote_provider.close()
+    await upstream_client.close()
+    if shared_state is not None:
+        await shared_state.close()
+    password_executor.shutdown()
+    db_executor.shutdown()
     print("Application shutting down")
 
 
@@ -22,9 +58,14 @@ app = FastAPI(
     title="Stock Price Checker API",
     description="API for checking stock prices with authentication",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Serialize response bodies with orjson instead of the stdlib encoder
+    default_response_class=ORJSONResponse
 )
 
+# Innermost, so 429 responses still get CORS and security headers
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.BACKEND_CORS_ORIGINS,
@@ -37,7 +78,11 @@ app.add_middleware(
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
     """Add basic security headers to all responses"""
-    response = await call_next(request)
+    # Sampled profiling when switched on at runtime; a single flag check otherwise
+    if request_profiler.enabled and request_profiler.should_profile(request):
+        response = await request_profiler.profile(request, call_next)
+    else:
+        response = await call_next(request)
     
     # Prevent MIME type sniffing attacks
     response.headers["X-Content-Type-Options"] = "nosniff"
@@ -50,9 +95,15 @@ async def add_security_headers(request: Request, call_next):
       
     return response
 
+# Record request latency per route; added last so it also times the middleware above
+app.add_middleware(PrometheusMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(stocks.router, prefix="/stocks", tags=["stocks"])
+app.include_router(watchlists.router, prefix="/watchlists", tags=["watchlists"])
+app.include_router(alerts.router, prefix="/alerts", tags=["alerts"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"], include_in_schema=False)
 
 
 @app.get("/")
@@ -64,4 +115,89 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: request latency per route, per-stage timers, in-flight gauges and upstream errors."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/db")
+async def db_health_check():
+    """Database reachability and connection pool usage."""
+    database = await db_executor.run(check_db)
+    if not database["reachable"]:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unhealthy", "database": database}
+        )
+    return {"status": "healthy", "database": database}
+
+
+@app.get("/health/upstream")
+async def upstream_health_check():
+    """Quote provider, upstream connection pool, rate limiter and circuit breaker metrics."""
+    return {
+        "status": "healthy",
+        "provider": quote_provider.stats(),
+        "pool": upstream_client.stats(),
+        "rate_limit": upstream_rate_limiter.stats(),
+        "circuit_breaker": upstream_circuit_breaker.stats(),
+    }
+
+
+@app.get("/health/cache")
+async def cache_health_check():
+    """Quote, user and verified-token cache hit/miss counters."""
+    return {
+        "status": "healthy",
+        "cache": quote_cache.stats(),
+        "users": user_cache.stats(),
+        "tokens": verified_token_cache.stats(),
+    }
+
+
+@app.get("/health/shared-state")
+async def shared_state_health_check():
+    """Shared state server used by multi-worker deployments."""
+    if shared_state is None:
+        return {"status": "healthy", "enabled": False}
+    try:
+        server = await shared_state.call("stats")
+    except SharedStateError as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unhealthy", "enabled": True, "error": str(e)}
+        )
+    return {"status": "healthy", "enabled": True, "server": server, "client_errors": shared_state.errors}
+
+
+@app.get("/health/rate-limits")
+async def rate_limits_health_check():
+    """Request rate limit policies and allowed/limited counters."""
+    return {"status": "healthy", "rate_limits": request_limiter.stats()}
+
+
+@app.get("/health/streams")
+async def streams_health_check():
+    """Active streaming pollers and subscriptions."""
+    return {"status": "healthy", "streams": quote_stream_hub.stats(), "alerts": alert_engine.stats()}
+
+
+@app.get("/health/ingestion")
+async def ingestion_health_check():
+    """Background quote refresh: hot symbols, schedule and refresh lag."""
+    return {"status": "healthy", "ingestion": quote_ingestion.stats()}
+
+
+@app.get("/health/executors")
+async def executors_health_check():
+    """Thread pool usage and queue depth for blocking DB and bcrypt work, and the password hash cost."""
+    return {
+        "status": "healthy",
+        "password_hash": password_executor.stats(),
+        "password_hashing": password_hasher.stats(),
+        "db": db_executor.stats(),
+    }
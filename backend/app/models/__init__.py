@@ -1,2 +1,6 @@
 from app.models.user import User
-__all__ = ["User"]
\ No newline at end of file
+from app.models.revoked_token import RevokedToken
+from app.models.candle import Candle, CandleCoverage
+from app.models.watchlist import Watchlist, WatchlistItem
+from app.models.alert import PriceAlert
+__all__ = ["User", "RevokedToken", "Candle", "CandleCoverage", "Watchlist", "WatchlistItem", "PriceAlert"]
\ No newline at end of file
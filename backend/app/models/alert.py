@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class PriceAlert(Base):
+    """A one-shot alert that fires the first time a symbol's price reaches the threshold."""
+    __tablename__ = "price_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    symbol = Column(String(10), nullable=False)
+    direction = Column(String(5), nullable=False)  # "above" or "below"
+    threshold = Column(Float, nullable=False)
+    active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    triggered_at = Column(DateTime, nullable=True)
+    triggered_price = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_price_alerts_active_symbol", "active", "symbol"),
+    )
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Index
+from app.core.database import Base
+
+
+class Candle(Base):
+    __tablename__ = "candles"
+
+    symbol = Column(String(10), primary_key=True)
+    resolution = Column(String(2), primary_key=True)
+    ts = Column(BigInteger, primary_key=True, autoincrement=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
+
+
+class CandleCoverage(Base):
+    """Time ranges already fetched from upstream, including ranges with no bars."""
+    __tablename__ = "candle_coverage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(10), nullable=False)
+    resolution = Column(String(2), nullable=False)
+    start_ts = Column(BigInteger, nullable=False)
+    end_ts = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_candle_coverage_symbol_resolution", "symbol", "resolution", "start_ts"),
+    )
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, DateTime
+from app.core.database import Base
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, index=True, nullable=False)
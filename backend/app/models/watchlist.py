@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Watchlist(Base):
+    __tablename__ = "watchlists"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    name = Column(String(100), nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    items = relationship(
+        "WatchlistItem",
+        cascade="all, delete-orphan",
+        order_by="(WatchlistItem.position, WatchlistItem.id)",
+        lazy="selectin",
+    )
+
+
+class WatchlistItem(Base):
+    """A symbol on a watchlist. user_id is copied from the watchlist so symbols can be looked up per user."""
+    __tablename__ = "watchlist_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    watchlist_id = Column(Integer, ForeignKey("watchlists.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    symbol = Column(String(10), nullable=False)
+    # Order within the watchlist, as the user last arranged it
+    position = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("watchlist_id", "symbol", name="uq_watchlist_items_watchlist_symbol"),
+        Index("ix_watchlist_items_user_symbol", "user_id", "symbol"),
+    )
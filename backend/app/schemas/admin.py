@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+
+
+class ProfilingConfig(BaseModel):
+    enabled: bool
+    sample_rate: float = Field(0.0, ge=0.0, le=1.0, description="Fraction of requests to profile (0-1)")
+
+
+class ProfileSummary(BaseModel):
+    id: int
+    method: str
+    path: str
+    started_at: float = Field(..., description="Request start (UNIX seconds)")
+    duration_seconds: float
+    samples: int = Field(..., description="Stack samples captured")
+
+
+class ProfilingStatus(ProfilingConfig):
+    worker_pid: int = Field(..., description="Worker process this status applies to; profiling is set per worker")
+    profiles: list[ProfileSummary]
@@ -0,0 +1,37 @@
+from pydantic import BaseModel, Field, ConfigDict
+from datetime import datetime
+from typing import Literal, Optional
+
+
+class PriceAlertCreate(BaseModel):
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "symbol": "AAPL",
+                "direction": "above",
+                "threshold": 200.0
+            }
+        }
+    )
+    
+    symbol: str = Field(..., description="Stock symbol (e.g., AAPL, GOOGL)", pattern="^[A-Z]{1,5}$")
+    direction: Literal["above", "below"] = Field(..., description="Fire when the price rises to or falls to the threshold")
+    threshold: float = Field(..., gt=0, description="Price threshold")
+
+
+class PriceAlertUpdate(BaseModel):
+    direction: Optional[Literal["above", "below"]] = None
+    threshold: Optional[float] = Field(None, gt=0)
+
+
+class PriceAlert(BaseModel):
+    id: int
+    symbol: str
+    direction: str
+    threshold: float
+    active: bool
+    created_at: datetime
+    triggered_at: Optional[datetime] = None
+    triggered_price: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional
 
 
 class StockQuoteRequest(BaseModel):
@@ -32,4 +33,108 @@ class StockQuoteResponse(BaseModel):
     current_price: float = Field(..., description="Current price")
     high_price: float = Field(..., description="Day's high price")
     low_price: float = Field(..., description="Day's low price")
-    previous_close: float = Field(..., description="Previous closing price")
\ No newline at end of file
+    previous_close: float = Field(..., description="Previous closing price")
+
+
+class BatchQuoteItem(BaseModel):
+    symbol: str
+    quote: Optional[StockQuoteResponse] = Field(None, description="Quote data, if the fetch succeeded")
+    status_code: int = Field(200, description="HTTP status of this symbol's fetch")
+    error: Optional[str] = Field(None, description="Error detail, if the fetch failed")
+    stale: bool = Field(False, description="True if this is the last known quote served while upstream is unavailable")
+
+
+class BatchQuoteResponse(BaseModel):
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "quotes": [
+                    {
+                        "symbol": "AAPL",
+                        "quote": {
+                            "symbol": "AAPL",
+                            "opening_price": 150.25,
+                            "current_price": 152.50,
+                            "high_price": 153.00,
+                            "low_price": 149.50,
+                            "previous_close": 150.00
+                        },
+                        "status_code": 200,
+                        "error": None,
+                        "stale": False
+                    },
+                    {
+                        "symbol": "FAKE",
+                        "quote": None,
+                        "status_code": 404,
+                        "error": "No data found for symbol: FAKE",
+                        "stale": False
+                    }
+                ]
+            }
+        }
+    )
+    
+    quotes: list[BatchQuoteItem]
+
+
+class CandlesResponse(BaseModel):
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "symbol": "AAPL",
+                "resolution": "D",
+                "timestamps": [1704153600, 1704240000],
+                "open": [187.15, 184.22],
+                "high": [188.44, 185.88],
+                "low": [183.89, 183.43],
+                "close": [185.64, 184.25],
+                "volume": [82488700, 58414500]
+            }
+        }
+    )
+    
+    symbol: str
+    resolution: str = Field(..., description="Bar resolution: 1, 5, 15, 30, 60 (minutes), D, W or M")
+    timestamps: list[int] = Field(..., description="Bar open times (UNIX seconds)")
+    open: list[float] = Field(..., description="Opening prices")
+    high: list[float] = Field(..., description="High prices")
+    low: list[float] = Field(..., description="Low prices")
+    close: list[float] = Field(..., description="Closing prices")
+    volume: list[float] = Field(..., description="Volumes")
+
+
+class IndicatorsResponse(BaseModel):
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "symbol": "AAPL",
+                "resolution": "D",
+                "timestamps": [1704153600, 1704240000],
+                "sma": [190.12, 189.87],
+                "ema": [189.95, 189.37],
+                "rsi": [44.1, 40.8],
+                "macd": [-0.42, -0.71],
+                "macd_signal": [0.15, 0.02],
+                "macd_histogram": [-0.57, -0.73],
+                "bollinger_upper": [196.3, 196.1],
+                "bollinger_middle": [190.12, 189.87],
+                "bollinger_lower": [183.94, 183.64],
+                "vwap": [190.4, 190.02]
+            }
+        }
+    )
+    
+    symbol: str
+    resolution: str = Field(..., description="Bar resolution: 1, 5, 15, 30, 60 (minutes), D, W or M")
+    timestamps: list[int] = Field(..., description="Bar open times (UNIX seconds)")
+    sma: list[Optional[float]] = Field(..., description="Simple moving average of close (20 bars)")
+    ema: list[Optional[float]] = Field(..., description="Exponential moving average of close (20 bars)")
+    rsi: list[Optional[float]] = Field(..., description="Relative strength index (14 bars, Wilder smoothing)")
+    macd: list[Optional[float]] = Field(..., description="MACD line (12/26 EMA difference)")
+    macd_signal: list[Optional[float]] = Field(..., description="MACD signal line (9-bar EMA of MACD)")
+    macd_histogram: list[Optional[float]] = Field(..., description="MACD line minus signal line")
+    bollinger_upper: list[Optional[float]] = Field(..., description="Upper Bollinger band (20 bars, 2 std devs)")
+    bollinger_middle: list[Optional[float]] = Field(..., description="Middle Bollinger band")
+    bollinger_lower: list[Optional[float]] = Field(..., description="Lower Bollinger band")
+    vwap: list[Optional[float]] = Field(..., description="Rolling volume-weighted average price (20 bars)")
@@ -0,0 +1,60 @@
+import re
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from datetime import datetime
+from typing import Optional
+
+SYMBOL_PATTERN = re.compile(r"^[A-Z]{1,5}$")
+
+
+def _validate_symbols(symbols: list[str]) -> list[str]:
+    """Upper-case, validate and deduplicate symbols, keeping their order."""
+    normalized = [symbol.strip().upper() for symbol in symbols]
+    invalid = [symbol for symbol in normalized if not SYMBOL_PATTERN.match(symbol)]
+    if invalid:
+        raise ValueError(f"Invalid stock symbols: {', '.join(invalid)}")
+    return list(dict.fromkeys(normalized))
+
+
+class WatchlistCreate(BaseModel):
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "name": "Tech",
+                "symbols": ["AAPL", "MSFT", "GOOGL"]
+            }
+        }
+    )
+    
+    name: str = Field(..., min_length=1, max_length=100)
+    symbols: list[str] = Field(default_factory=list, description="Stock symbols (e.g., AAPL, GOOGL)")
+    
+    @field_validator('symbols')
+    @classmethod
+    def validate_symbols(cls, symbols: list[str]) -> list[str]:
+        return _validate_symbols(symbols)
+
+
+class WatchlistUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    symbols: Optional[list[str]] = Field(None, description="Replaces the watchlist's symbols when given")
+    
+    @field_validator('symbols')
+    @classmethod
+    def validate_symbols(cls, symbols: Optional[list[str]]) -> Optional[list[str]]:
+        return None if symbols is None else _validate_symbols(symbols)
+
+
+class WatchlistItemCreate(BaseModel):
+    symbol: str = Field(..., description="Stock symbol (e.g., AAPL, GOOGL)")
+    
+    @field_validator('symbol')
+    @classmethod
+    def validate_symbol(cls, symbol: str) -> str:
+        return _validate_symbols([symbol])[0]
+
+
+class Watchlist(BaseModel):
+    id: int
+    name: str
+    symbols: list[str]
+    created_at: datetime
@@ -0,0 +1,386 @@
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import astuple, dataclass
+from datetime import datetime
+from typing import Awaitable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.executors import db_executor
+from app.core.quote_cache import QuoteCache, quote_cache
+from app.core.shared_state import SharedStateClient, SharedStateError, shared_state
+from app.models.alert import PriceAlert
+from app.schemas.stock import StockQuoteResponse
+from app.services.streaming import QuoteStreamHub, quote_stream_hub
+
+ABOVE = "above"
+BELOW = "below"
+
+logger = logging.getLogger(__name__)
+
+# Alerts marked triggered per UPDATE statement
+PERSIST_BATCH_SIZE = 500
+
+# How long one poll of the shared alert change log waits for a change
+ALERT_POLL_SECONDS = 10.0
+
+
+@dataclass(frozen=True)
+class AlertRef:
+    id: int
+    user_id: int
+    symbol: str
+    direction: str
+    threshold: float
+
+
+class ThresholdBook:
+    """Alert thresholds for one symbol and direction, kept sorted with their alert ids alongside."""
+
+    __slots__ = ("thresholds", "ids")
+
+    def __init__(self):
+        self.thresholds: List[float] = []
+        self.ids: List[int] = []
+
+    def add(self, threshold: float, alert_id: int) -> None:
+        index = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(index, threshold)
+        self.ids.insert(index, alert_id)
+
+    def remove(self, threshold: float, alert_id: int) -> bool:
+        index = bisect_left(self.thresholds, threshold)
+        while index < len(self.thresholds) and self.thresholds[index] == threshold:
+            if self.ids[index] == alert_id:
+                del self.thresholds[index]
+                del self.ids[index]
+                return True
+            index += 1
+        return False
+
+    def pop_up_to(self, price: float) -> List[int]:
+        """Remove and return alerts with threshold <= price."""
+        index = bisect_right(self.thresholds, price)
+        crossed = self.ids[:index]
+        del self.thresholds[:index]
+        del self.ids[:index]
+        return crossed
+
+    def pop_from(self, price: float) -> List[int]:
+        """Remove and return alerts with threshold >= price."""
+        index = bisect_left(self.thresholds, price)
+        crossed = self.ids[index:]
+        del self.thresholds[index:]
+        del self.ids[index:]
+        return crossed
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class AlertIndex:
+    """
+    Active alerts indexed by symbol and direction for fast matching.
+
+    Each symbol has a sorted book of "above" thresholds and one of "below"
+    thresholds, so matching a price is a binary search plus work proportional
+    to the number of alerts it actually crosses, not to the number of alerts.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self._books: Dict[str, Tuple[ThresholdBook, ThresholdBook]] = {}
+        self._alerts: Dict[int, AlertRef] = {}
+
+    def _book(self, symbol: str, direction: str) -> ThresholdBook:
+        books = self._books.get(symbol)
+        if books is None:
+            books = self._books[symbol] = (ThresholdBook(), ThresholdBook())
+        return books[0] if direction == ABOVE else books[1]
+
+    def add(self, alert: AlertRef) -> None:
+        self.remove(alert.id)
+        self._alerts[alert.id] = alert
+        self._book(alert.symbol, alert.direction).add(alert.threshold, alert.id)
+
+    def load(self, alerts: Iterable[AlertRef]) -> None:
+        """Add many alerts, sorting each book once instead of inserting one by one."""
+        grouped: Dict[Tuple[str, str], List[AlertRef]] = defaultdict(list)
+        for alert in alerts:
+            self.remove(alert.id)
+            self._alerts[alert.id] = alert
+            grouped[(alert.symbol, alert.direction)].append(alert)
+
+        for (symbol, direction), new_alerts in grouped.items():
+            book = self._book(symbol, direction)
+            pairs = sorted(
+                list(zip(book.thresholds, book.ids)) + [(alert.threshold, alert.id) for alert in new_alerts]
+            )
+            book.thresholds = [threshold for threshold, _ in pairs]
+            book.ids = [alert_id for _, alert_id in pairs]
+
+    def remove(self, alert_id: int) -> Optional[AlertRef]:
+        alert = self._alerts.pop(alert_id, None)
+        if alert is not None:
+            self._book(alert.symbol, alert.direction).remove(alert.threshold, alert.id)
+            self._drop_if_empty(alert.symbol)
+        return alert
+
+    def match(self, symbol: str, price: float) -> List[AlertRef]:
+        """Remove and return the alerts on symbol that price reaches."""
+        books = self._books.get(symbol)
+        if books is None:
+            return []
+        above, below = books
+        crossed = above.pop_up_to(price) + below.pop_from(price)
+        if crossed:
+            self._drop_if_empty(symbol)
+        return [self._alerts.pop(alert_id) for alert_id in crossed]
+
+    def _drop_if_empty(self, symbol: str) -> None:
+        above, below = self._books[symbol]
+        if not above and not below:
+            del self._books[symbol]
+
+    def symbols(self) -> List[str]:
+        """Symbols with active alerts, most alerts first."""
+        return sorted(self._books, key=lambda symbol: -sum(len(book) for book in self._books[symbol]))
+
+    @property
+    def symbol_count(self) -> int:
+        return len(self._books)
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._alerts
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+
+def _load_active_alerts(session_factory) -> List[AlertRef]:
+    with session_factory() as db:
+        rows = (
+            db.query(PriceAlert.id, PriceAlert.user_id, PriceAlert.symbol, PriceAlert.direction, PriceAlert.threshold)
+            .filter(PriceAlert.active.is_(True))
+            .yield_per(10000)
+        )
+        return [AlertRef(row.id, row.user_id, row.symbol, row.direction, row.threshold) for row in rows]
+
+
+def _mark_triggered(session_factory, alert_ids: List[int], price: float, triggered_at: datetime) -> None:
+    with session_factory() as db:
+        for start in range(0, len(alert_ids), PERSIST_BATCH_SIZE):
+            db.query(PriceAlert).filter(
+                PriceAlert.id.in_(alert_ids[start:start + PERSIST_BATCH_SIZE]),
+                PriceAlert.active.is_(True),
+            ).update(
+                {"active": False, "triggered_at": triggered_at, "triggered_price": price},
+                synchronize_session=False,
+            )
+        db.commit()
+
+
+class AlertEngine:
+    """
+    Evaluates active price alerts against every fresh quote.
+
+    The engine listens to the quote cache, so quotes fetched for users, streams
+    and background ingestion all drive alerts. Triggered alerts are pushed to
+    the owner's open WebSocket/SSE streams and marked triggered in the database.
+
+    With a `shared` state server, every worker keeps the same index: alert
+    changes are published to the server's change log, which each worker
+    follows. A crossed alert fires once, on whichever worker claims it first,
+    and the triggered event reaches the owner's streams on every worker.
+    """
+
+    def __init__(
+        self,
+        cache: QuoteCache,
+        hub: QuoteStreamHub,
+        session_factory=None,
+        shared: Optional[SharedStateClient] = None,
+    ):
+        self.cache = cache
+        self.hub = hub
+        self.session_factory = session_factory
+        self.shared = shared
+        self.index = AlertIndex()
+        self._writes: Set[asyncio.Task] = set()
+        self._follow_task: Optional[asyncio.Task] = None
+        self._seq = 0
+        self.triggered = 0
+        self.shared_errors = 0
+
+    def _sessions(self):
+        if self.session_factory is None:
+            from app.core.database import SessionLocal
+            return SessionLocal
+        return self.session_factory
+
+    async def start(self) -> None:
+        """Load active alerts and start listening for quotes. Called from the application lifespan."""
+        if self.shared is not None:
+            try:
+                # Changes from here on are replayed on top of the database load
+                self._seq, _ = await self.shared.call("alerts_poll", -1, 0)
+            except SharedStateError as e:
+                self.shared_errors += 1
+                logger.warning("Shared alert log unavailable: %s", e)
+        await self._reload()
+        self.cache.add_listener(self.on_quote)
+        if self.shared is not None and self._follow_task is None:
+            self._follow_task = asyncio.create_task(self._follow())
+
+    async def close(self) -> None:
+        """Stop listening and wait for pending triggered-alert writes. Called on application shutdown."""
+        self.cache.remove_listener(self.on_quote)
+        if self._follow_task is not None:
+            self._follow_task.cancel()
+            await asyncio.gather(self._follow_task, return_exceptions=True)
+            self._follow_task = None
+        await self.flush()
+
+    async def _reload(self) -> None:
+        index = AlertIndex()
+        index.load(await db_executor.run(_load_active_alerts, self._sessions()))
+        self.index = index
+
+    async def add(self, alert: AlertRef) -> None:
+        """Index a new or changed alert, on every worker."""
+        self.index.add(alert)
+        await self._publish({"type": "add", "alert": list(astuple(alert))})
+
+    async def remove(self, alert_id: int) -> None:
+        """Stop evaluating a deleted alert, on every worker."""
+        self.index.remove(alert_id)
+        await self._publish({"type": "remove", "id": alert_id})
+
+    async def _publish(self, event: dict) -> None:
+        if self.shared is None:
+            return
+        try:
+            await self.shared.call("alerts_publish", event)
+        except SharedStateError as e:
+            # Other workers catch up when they next reload from the database
+            self.shared_errors += 1
+            logger.warning("Could not publish alert change: %s", e)
+
+    async def _follow(self) -> None:
+        """Apply alert changes and triggers published by every worker, this one included."""
+        while True:
+            try:
+                seq, events = await self.shared.call(
+                    "alerts_poll", self._seq, ALERT_POLL_SECONDS, timeout=ALERT_POLL_SECONDS + self.shared.timeout
+                )
+            except SharedStateError as e:
+                self.shared_errors += 1
+                logger.debug("Shared alert log unavailable: %s", e)
+                await asyncio.sleep(1.0)
+                continue
+            if events is None:
+                # Changes were missed (log overflow or a server restart): start over from the database
+                self._seq = seq
+                await self._reload()
+                continue
+            self._seq = seq
+            for event in events:
+                self._apply(event)
+
+    def _apply(self, event: dict) -> None:
+        if event["type"] == "add":
+            self.index.add(AlertRef(*event["alert"]))
+        elif event["type"] == "remove":
+            self.index.remove(event["id"])
+        elif event["type"] == "triggered":
+            for alert in event["alerts"]:
+                alert = AlertRef(*alert)
+                self.index.remove(alert.id)
+                self._notify(alert, event["price"], event["triggered_at"])
+
+    def symbols(self) -> List[str]:
+        return self.index.symbols()
+
+    def on_quote(self, symbol: str, quote: StockQuoteResponse) -> List[AlertRef]:
+        """Fire the alerts a new quote crosses and return them."""
+        crossed = self.index.match(symbol, quote.current_price)
+        if not crossed:
+            return crossed
+
+        triggered_at = datetime.utcnow()
+        if self.shared is None:
+            self._fire(crossed, quote.current_price, triggered_at)
+        else:
+            self._track(self._fire_shared(crossed, quote.current_price, triggered_at))
+        return crossed
+
+    def _fire(self, alerts: List[AlertRef], price: float, triggered_at: datetime) -> None:
+        self.triggered += len(alerts)
+        for alert in alerts:
+            self._notify(alert, price, triggered_at.isoformat())
+        self._persist(alerts, price, triggered_at)
+
+    async def _fire_shared(self, crossed: List[AlertRef], price: float, triggered_at: datetime) -> None:
+        try:
+            fired = await self.shared.call(
+                "alerts_trigger", [list(astuple(alert)) for alert in crossed], price, triggered_at.isoformat()
+            )
+        except SharedStateError as e:
+            # Better a possible duplicate from another worker than a lost alert
+            self.shared_errors += 1
+            logger.warning("Shared alert log unavailable, firing locally: %s", e)
+            self._fire(crossed, price, triggered_at)
+            return
+        # Streams are notified when the triggered event comes back through the log
+        alerts = [AlertRef(*alert) for alert in fired]
+        self.triggered += len(alerts)
+        if alerts:
+            self._persist(alerts, price, triggered_at)
+
+    def _notify(self, alert: AlertRef, price: float, triggered_at: str) -> None:
+        self.hub.notify_user(alert.user_id, f"alert:{alert.id}", {
+            "type": "alert",
+            "data": {
+                "id": alert.id,
+                "symbol": alert.symbol,
+                "direction": alert.direction,
+                "threshold": alert.threshold,
+                "price": price,
+                "triggered_at": triggered_at,
+            },
+        })
+
+    def _persist(self, alerts: List[AlertRef], price: float, triggered_at: datetime) -> None:
+        self._track(db_executor.run(
+            _mark_triggered, self._sessions(), [alert.id for alert in alerts], price, triggered_at
+        ))
+
+    def _track(self, work: Awaitable) -> None:
+        task = asyncio.ensure_future(work)
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def flush(self) -> None:
+        """Wait until triggered alerts are written to the database."""
+        while self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def clear(self) -> None:
+        self.index.clear()
+        self.triggered = 0
+        self.shared_errors = 0
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.index),
+            "symbols": self.index.symbol_count,
+            "triggered": self.triggered,
+            "pending_writes": len(self._writes),
+            "shared": self.shared is not None,
+            "shared_errors": self.shared_errors,
+        }
+
+
+alert_engine = AlertEngine(quote_cache, quote_stream_hub, shared=shared_state)
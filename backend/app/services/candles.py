@@ -0,0 +1,231 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.executors import db_executor
+from app.core.http_client import UpstreamClient
+from app.models.candle import Candle, CandleCoverage
+from app.schemas.stock import CandlesResponse
+from app.services.providers import call_finnhub
+
+# Bar length per Finnhub resolution, in seconds (months approximated as 31 days)
+RESOLUTION_SECONDS = {
+    "1": 60,
+    "5": 300,
+    "15": 900,
+    "30": 1800,
+    "60": 3600,
+    "D": 86400,
+    "W": 604800,
+    "M": 2678400,
+}
+
+
+class FillLocks:
+    """
+    One lock per (symbol, resolution), for work on a series that must not
+    interleave within this process: concurrent chart loads would fetch and
+    insert the same gap twice, and indicator requests would reset each other's
+    buffers.
+
+    A lock is kept only while some request holds or waits on it, so the map
+    stays as small as the number of series being filled right now.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._users: Dict[Tuple[str, str], int] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Tuple[str, str]) -> AsyncIterator[None]:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+_fill_locks = FillLocks()
+
+
+def _load_coverage(db: Session, symbol: str, resolution: str, start: int, end: int) -> List[Tuple[int, int]]:
+    rows = (
+        db.query(CandleCoverage.start_ts, CandleCoverage.end_ts)
+        .filter(
+            CandleCoverage.symbol == symbol,
+            CandleCoverage.resolution == resolution,
+            CandleCoverage.start_ts <= end,
+            CandleCoverage.end_ts >= start,
+        )
+        .order_by(CandleCoverage.start_ts)
+        .all()
+    )
+    return [(row.start_ts, row.end_ts) for row in rows]
+
+
+def missing_ranges(coverage: List[Tuple[int, int]], start: int, end: int) -> List[Tuple[int, int]]:
+    """Return the parts of [start, end] not covered by the sorted coverage intervals."""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_start > cursor:
+            gaps.append((cursor, min(covered_start - 1, end)))
+        cursor = max(cursor, covered_end + 1)
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _store_range(db: Session, symbol: str, resolution: str, start: int, end: int, covered_end: int, data: dict) -> None:
+    """
+    Replace the stored bars in [start, end] and record [start, covered_end] as fetched.
+
+    Fills are only serialized within a process: another worker may commit bars
+    for the same gap first. Those came from the same upstream call, so on a
+    duplicate key its rows are kept and only the missing ones are added.
+    """
+    try:
+        _write_range(db, symbol, resolution, start, end, covered_end, data, replace=True)
+    except IntegrityError:
+        db.rollback()
+        _write_range(db, symbol, resolution, start, end, covered_end, data, replace=False)
+
+
+def _write_range(
+    db: Session,
+    symbol: str,
+    resolution: str,
+    start: int,
+    end: int,
+    covered_end: int,
+    data: dict,
+    replace: bool,
+) -> None:
+    in_range = db.query(Candle).filter(
+        Candle.symbol == symbol,
+        Candle.resolution == resolution,
+        Candle.ts >= start,
+        Candle.ts <= end,
+    )
+    if replace:
+        in_range.delete(synchronize_session=False)
+        existing = set()
+    else:
+        existing = {ts for ts, in in_range.with_entities(Candle.ts)}
+
+    if data.get("s") == "ok":
+        db.bulk_insert_mappings(Candle, [
+            {
+                "symbol": symbol,
+                "resolution": resolution,
+                "ts": ts,
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume,
+            }
+            for ts, open_, high, low, close, volume in zip(
+                data["t"], data["o"], data["h"], data["l"], data["c"], data["v"]
+            )
+            if start <= ts <= end and ts not in existing
+        ])
+
+    if covered_end >= start:
+        # Merge the new range with any overlapping or adjacent coverage rows
+        overlapping = (
+            db.query(CandleCoverage)
+            .filter(
+                CandleCoverage.symbol == symbol,
+                CandleCoverage.resolution == resolution,
+                CandleCoverage.start_ts <= covered_end + 1,
+                CandleCoverage.end_ts >= start - 1,
+            )
+            .all()
+        )
+        merged_start = min([start] + [row.start_ts for row in overlapping])
+        merged_end = max([covered_end] + [row.end_ts for row in overlapping])
+        for row in overlapping:
+            db.delete(row)
+        db.add(CandleCoverage(symbol=symbol, resolution=resolution, start_ts=merged_start, end_ts=merged_end))
+
+    db.commit()
+
+
+def _read_range(db: Session, symbol: str, resolution: str, start: int, end: int) -> CandlesResponse:
+    rows = (
+        db.query(Candle.ts, Candle.open, Candle.high, Candle.low, Candle.close, Candle.volume)
+        .filter(
+            Candle.symbol == symbol,
+            Candle.resolution == resolution,
+            Candle.ts >= start,
+            Candle.ts <= end,
+        )
+        .order_by(Candle.ts)
+        .all()
+    )
+    return CandlesResponse(
+        symbol=symbol,
+        resolution=resolution,
+        timestamps=[row.ts for row in rows],
+        open=[row.open for row in rows],
+        high=[row.high for row in rows],
+        low=[row.low for row in rows],
+        close=[row.close for row in rows],
+        volume=[row.volume for row in rows],
+    )
+
+
+async def get_candles(
+    symbol: str,
+    resolution: str,
+    start: int,
+    end: int,
+    upstream: UpstreamClient,
+    db: Session
+) -> CandlesResponse:
+    """
+    Return OHLCV bars for [start, end] from the local store.
+
+    Only the parts of the range that were never fetched go to upstream. Bars that
+    may still be forming (within one bar of now) are not marked as covered, so
+    they are refreshed on the next request.
+    """
+    if resolution not in RESOLUTION_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Resolution must be one of: {', '.join(RESOLUTION_SECONDS)}"
+        )
+
+    end = min(end, int(time.time()))
+    async with _fill_locks.hold((symbol, resolution)):
+        coverage = await db_executor.run(_load_coverage, db, symbol, resolution, start, end)
+        complete_before = int(time.time()) - RESOLUTION_SECONDS[resolution]
+
+        for gap_start, gap_end in missing_ranges(coverage, start, end):
+            data = await call_finnhub(
+                "/stock/candle",
+                {"symbol": symbol, "resolution": resolution, "from": gap_start, "to": gap_end},
+                upstream
+            )
+            covered_end = min(gap_end, complete_before)
+            await db_executor.run(_store_range, db, symbol, resolution, gap_start, gap_end, covered_end, data)
+
+    return await db_executor.run(_read_range, db, symbol, resolution, start, end)
@@ -0,0 +1,323 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.http_client import UpstreamClient
+from app.schemas.stock import IndicatorsResponse
+from app.services.candles import RESOLUTION_SECONDS, FillLocks, get_candles
+
+INDICATORS = (
+    "sma",
+    "ema",
+    "rsi",
+    "macd",
+    "macd_signal",
+    "macd_histogram",
+    "bollinger_upper",
+    "bollinger_middle",
+    "bollinger_lower",
+    "vwap",
+)
+
+
+@dataclass(frozen=True)
+class IndicatorConfig:
+    sma_period: int = 20
+    ema_period: int = 20
+    rsi_period: int = 14
+    macd_fast: int = 12
+    macd_slow: int = 26
+    macd_signal: int = 9
+    bollinger_period: int = 20
+    bollinger_stddev: float = 2.0
+    vwap_period: int = 20
+
+    @property
+    def warmup_bars(self) -> int:
+        """Bars of history needed before indicator values settle."""
+        return 3 * max(self.sma_period, self.ema_period, self.rsi_period, self.macd_slow + self.macd_signal,
+                       self.bollinger_period, self.vwap_period)
+
+
+def ema(values: np.ndarray, alpha: float, previous: Optional[float] = None) -> np.ndarray:
+    """
+    Exponential moving average, y[i] = alpha * x[i] + (1 - alpha) * y[i - 1].
+
+    The recurrence is solved in closed form a block at a time, so the work is
+    done by NumPy rather than a per-bar Python loop. Blocks are sized to keep
+    the scaling factors well inside float64 precision.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty_like(values)
+    if len(values) == 0:
+        return result
+    if previous is None:
+        previous = values[0]
+
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        result[:] = values
+        return result
+
+    block = max(1, int(15 * math.log(10) / -math.log(decay)))
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        result[start:start + len(chunk)] = powers * (previous + alpha * np.cumsum(chunk / powers))
+        previous = result[start + len(chunk) - 1]
+    return result
+
+
+def _rolling(values: np.ndarray, history: np.ndarray, window: int, count: int, reducer) -> np.ndarray:
+    """Apply reducer over a trailing window for the last `count` positions of history + values."""
+    full = np.concatenate((history[-(window - 1):] if window > 1 else history[:0], values))
+    result = np.full(count, np.nan)
+    if len(full) >= window:
+        reduced = reducer(sliding_window_view(full, window), axis=1)
+        result[count - len(reduced):] = reduced[-count:]
+    return result
+
+
+class _Buffer:
+    """Growable NumPy array with amortized O(1) appends."""
+
+    def __init__(self, dtype=np.float64):
+        self._data = np.empty(1024, dtype=dtype)
+        self._size = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    def extend(self, values: np.ndarray) -> None:
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    def drop_front(self, count: int) -> None:
+        self._data[:self._size - count] = self._data[count:self._size]
+        self._size -= count
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class IndicatorSeries:
+    """
+    Price-series buffer for one symbol and resolution, with indicators kept up to date.
+
+    New bars are appended with `append`, which computes indicator values only
+    for those bars, carrying EMA/RSI state and the last few bars of history
+    forward instead of recomputing the whole series.
+    """
+
+    def __init__(self, config: IndicatorConfig = IndicatorConfig(), max_bars: int = settings.INDICATOR_MAX_BARS):
+        self.config = config
+        self.max_bars = max(max_bars, config.warmup_bars)
+        self.reset()
+
+    def reset(self) -> None:
+        self.timestamps = _Buffer(np.int64)
+        self._inputs = {name: _Buffer() for name in ("close", "high", "low", "volume")}
+        self._outputs = {name: _Buffer() for name in INDICATORS}
+        self._count = 0
+        self._ema: Optional[float] = None
+        self._ema_fast: Optional[float] = None
+        self._ema_slow: Optional[float] = None
+        self._macd_signal: Optional[float] = None
+        self._avg_gain: Optional[float] = None
+        self._avg_loss: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def first_timestamp(self) -> Optional[int]:
+        return int(self.timestamps.values[0]) if len(self) else None
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.timestamps.values[-1]) if len(self) else None
+
+    def append(self, timestamps, close, high, low, volume) -> int:
+        """Append bars newer than the last one held and return how many were added."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        new = slice(None)
+        if len(self) and len(timestamps):
+            new = slice(int(np.searchsorted(timestamps, self.last_timestamp, side="right")), None)
+        timestamps = timestamps[new]
+        count = len(timestamps)
+        if count == 0:
+            return 0
+
+        close = np.asarray(close, dtype=np.float64)[new]
+        high = np.asarray(high, dtype=np.float64)[new]
+        low = np.asarray(low, dtype=np.float64)[new]
+        volume = np.asarray(volume, dtype=np.float64)[new]
+        config = self.config
+        index = np.arange(self._count, self._count + count)
+
+        # Rolling windows only look back (window - 1) bars, so carry just that tail
+        lookback = max(config.sma_period, config.bollinger_period, config.vwap_period)
+        history = {name: buffer.values[-lookback:] for name, buffer in self._inputs.items()}
+        outputs = {}
+
+        outputs["sma"] = _rolling(close, history["close"], config.sma_period, count, np.mean)
+        middle = _rolling(close, history["close"], config.bollinger_period, count, np.mean)
+        deviation = _rolling(close, history["close"], config.bollinger_period, count, np.std)
+        outputs["bollinger_middle"] = middle
+        outputs["bollinger_upper"] = middle + config.bollinger_stddev * deviation
+        outputs["bollinger_lower"] = middle - config.bollinger_stddev * deviation
+
+        typical_price = (high + low + close) / 3
+        history_typical = (history["high"] + history["low"] + history["close"]) / 3
+        price_volume = _rolling(typical_price * volume, history_typical * history["volume"],
+                                config.vwap_period, count, np.sum)
+        total_volume = _rolling(volume, history["volume"], config.vwap_period, count, np.sum)
+        outputs["vwap"] = np.divide(price_volume, total_volume, out=np.full(count, np.nan),
+                                    where=total_volume > 0)
+
+        # Recursive indicators carry their last value forward
+        ema_values = ema(close, 2 / (config.ema_period + 1), self._ema)
+        outputs["ema"] = np.where(index >= config.ema_period - 1, ema_values, np.nan)
+
+        fast = ema(close, 2 / (config.macd_fast + 1), self._ema_fast)
+        slow = ema(close, 2 / (config.macd_slow + 1), self._ema_slow)
+        macd = fast - slow
+        signal = ema(macd, 2 / (config.macd_signal + 1), self._macd_signal)
+        macd_ready = index >= config.macd_slow - 1
+        signal_ready = index >= config.macd_slow + config.macd_signal - 2
+        outputs["macd"] = np.where(macd_ready, macd, np.nan)
+        outputs["macd_signal"] = np.where(signal_ready, signal, np.nan)
+        outputs["macd_histogram"] = np.where(signal_ready, macd - signal, np.nan)
+
+        rsi = np.full(count, np.nan)
+        if len(history["close"]):
+            deltas = np.diff(close, prepend=history["close"][-1])
+            rsi_slice = slice(None)
+        else:
+            deltas = np.diff(close)
+            rsi_slice = slice(1, None)
+        if len(deltas):
+            alpha = 1 / config.rsi_period
+            avg_gain = ema(np.clip(deltas, 0, None), alpha, self._avg_gain)
+            avg_loss = ema(np.clip(-deltas, 0, None), alpha, self._avg_loss)
+            strength = np.divide(avg_gain, avg_loss, out=np.full(len(deltas), np.inf), where=avg_loss > 0)
+            rsi[rsi_slice] = 100 - 100 / (1 + strength)
+            self._avg_gain, self._avg_loss = avg_gain[-1], avg_loss[-1]
+        outputs["rsi"] = np.where(index >= config.rsi_period, rsi, np.nan)
+
+        self._ema, self._ema_fast, self._ema_slow, self._macd_signal = ema_values[-1], fast[-1], slow[-1], signal[-1]
+
+        self.timestamps.extend(timestamps)
+        for name, values in (("close", close), ("high", high), ("low", low), ("volume", volume)):
+            self._inputs[name].extend(values)
+        for name, values in outputs.items():
+            self._outputs[name].extend(values)
+        self._count += count
+
+        # Trim in batches so appends stay amortized O(new bars)
+        if len(self) > self.max_bars * 5 // 4:
+            excess = len(self) - self.max_bars
+            self.timestamps.drop_front(excess)
+            for buffer in (*self._inputs.values(), *self._outputs.values()):
+                buffer.drop_front(excess)
+        return count
+
+    def values(self, name: str) -> np.ndarray:
+        return self._outputs[name].values
+
+    def window(self, start: int, end: int, limit: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Return timestamps and indicator values for bars in [start, end], at most the last `limit`."""
+        timestamps = self.timestamps.values
+        lo = int(np.searchsorted(timestamps, start, side="left"))
+        hi = int(np.searchsorted(timestamps, end, side="right"))
+        lo = max(lo, hi - limit)
+        return timestamps[lo:hi], {name: self._outputs[name].values[lo:hi] for name in INDICATORS}
+
+
+class IndicatorEngine:
+    """Keeps an IndicatorSeries per (symbol, resolution), evicting the least recently used."""
+
+    def __init__(self, max_series: int = settings.INDICATOR_MAX_SERIES):
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple[str, str], IndicatorSeries]" = OrderedDict()
+
+    def series(self, symbol: str, resolution: str) -> IndicatorSeries:
+        key = (symbol, resolution)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = IndicatorSeries()
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        self._series.move_to_end(key)
+        return series
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+indicator_engine = IndicatorEngine()
+# Held from checking a series until its new bars are appended, so an overlapping
+# request cannot reset or extend it while another is still loading candles
+_series_locks = FillLocks()
+
+
+def _to_list(values: np.ndarray) -> List[Optional[float]]:
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+async def get_indicators(
+    symbol: str,
+    resolution: str,
+    start: int,
+    end: int,
+    limit: int,
+    upstream: UpstreamClient,
+    db: Session
+) -> IndicatorsResponse:
+    """
+    Compute indicators for [start, end] from the symbol's price-series buffer.
+
+    Bars come from the local candle store. When the buffer already reaches the
+    requested range, only bars newer than its last one are loaded and computed.
+    Only complete bars are added, so buffered values never need revising.
+    Requests for the same series take turns, as each may reset or extend it.
+    """
+    async with _series_locks.hold((symbol, resolution)):
+        series = indicator_engine.series(symbol, resolution)
+        bar_seconds = RESOLUTION_SECONDS[resolution]
+        # Twice the bar count in calendar time to allow for weekends and holidays
+        warmup_start = max(0, start - 2 * series.config.warmup_bars * bar_seconds)
+        complete_before = int(time.time()) - bar_seconds
+
+        if not len(series) or series.first_timestamp > warmup_start or series.last_timestamp < warmup_start:
+            series.reset()
+            load_from = warmup_start
+        else:
+            load_from = series.last_timestamp + 1
+
+        load_to = min(end, complete_before)
+        if load_from <= load_to:
+            candles = await get_candles(symbol, resolution, load_from, load_to, upstream, db)
+            series.append(candles.timestamps, candles.close, candles.high, candles.low, candles.volume)
+
+        # The window is a view into the buffers, so copy it out before releasing the series
+        timestamps, values = series.window(start, end, limit)
+        return IndicatorsResponse(
+            symbol=symbol,
+            resolution=resolution,
+            timestamps=timestamps.tolist(),
+            **{name: _to_list(series_values) for name, series_values in values.items()}
+        )
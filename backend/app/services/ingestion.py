@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, time as clock, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.hot_symbols import HotSymbols, hot_symbols
+from app.core.metrics import Histogram
+from app.core.quote_cache import QuoteCache, quote_cache
+from app.core.rate_limiter import upstream_rate_limiter
+from app.core.shared_state import SharedStateClient, SharedStateError, shared_state
+from app.services.alerts import alert_engine
+from app.services.providers import QuoteProvider, quote_provider
+
+logger = logging.getLogger(__name__)
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TIMEZONE = ZoneInfo("America/New_York")
+except Exception:
+    # No tz database available: use Eastern Standard Time year round
+    MARKET_TIMEZONE = timezone(timedelta(hours=-5))
+
+MARKET_OPEN = clock(9, 30)
+MARKET_CLOSE = clock(16, 0)
+
+# How often to look for newly hot symbols while nothing is due
+IDLE_POLL_SECONDS = 1.0
+
+# With several workers, one holds this lease and runs ingestion for all of them
+LEADER_LEASE = "quote-ingestion"
+LEADER_LEASE_SECONDS = 15.0
+
+# Refresh lag buckets in seconds
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """Whether US equity markets are in regular trading hours (holidays are not accounted for)."""
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TIMEZONE)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+class QuoteIngestionScheduler:
+    """
+    Background worker that keeps quotes for the hottest symbols in the cache.
+
+    The most requested symbols are refreshed on a per-symbol schedule, ahead of
+    the cache TTL, so user requests for them are served without an upstream
+    call. Intervals are short during market hours and long while the market is
+    closed, are stretched so refreshes stay within a share of the upstream rate
+    limit, and are jittered so symbols do not all come due together. The hot
+    set is capped at what that share can refresh within the cache TTL; beyond
+    it, refreshed quotes would expire before their next refresh.
+
+    Symbols returned by `watched` (such as those with active price alerts) are
+    refreshed too, whether or not users are requesting them.
+
+    With a `shared` state server, only the worker holding the leader lease
+    refreshes; its quotes reach the other workers through the shared quote
+    cache. The hot set is the leader's own, which tracks the overall one as
+    long as requests are spread evenly across workers.
+    """
+
+    def __init__(
+        self,
+        hot: HotSymbols,
+        cache: QuoteCache,
+        provider: QuoteProvider,
+        hot_set_size: int = settings.INGESTION_HOT_SET_SIZE,
+        market_interval: float = settings.INGESTION_MARKET_INTERVAL_SECONDS,
+        closed_interval: float = settings.INGESTION_CLOSED_INTERVAL_SECONDS,
+        jitter: float = settings.INGESTION_JITTER,
+        budget_share: float = settings.INGESTION_BUDGET_SHARE,
+        watched: Optional[Callable[[], List[str]]] = None,
+        shared: Optional[SharedStateClient] = None,
+    ):
+        self.hot = hot
+        self.cache = cache
+        self.provider = provider
+        self.hot_set_size = hot_set_size
+        self.market_interval = market_interval
+        self.closed_interval = closed_interval
+        self.jitter = jitter
+        self.budget_share = budget_share
+        self.watched = watched
+        self.shared = shared
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.leader = shared is None
+        self.refresh_lag = Histogram(LAG_BUCKETS)
+        self._task: Optional[asyncio.Task] = None
+        self._next_due: Dict[str, float] = {}
+        self.refreshed = 0
+        self.skipped_fresh = 0
+        self.errors = 0
+
+    def interval(self, hot_count: int) -> float:
+        """Seconds between refreshes of each hot symbol."""
+        interval = self.market_interval if is_market_open() else self.closed_interval
+        rate = upstream_rate_limiter.rate * self.budget_share
+        if rate > 0 and hot_count:
+            interval = max(interval, hot_count / rate)
+        return interval
+
+    def capacity(self) -> Optional[int]:
+        """Most symbols whose refreshes fit the budget with each landing before the cache TTL, or None if unpaced."""
+        rate = upstream_rate_limiter.rate * self.budget_share
+        if rate <= 0:
+            return None
+        return int(rate * self.cache.ttl / (1 + self.jitter))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def start(self) -> None:
+        """Start the background loop. Called from the application lifespan."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background loop. Called on application shutdown."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                delay = await self.run_once()
+            except Exception:
+                logger.exception("Quote ingestion cycle failed")
+                delay = IDLE_POLL_SECONDS
+            await asyncio.sleep(delay)
+
+    async def run_once(self) -> float:
+        """Refresh every hot symbol that is due and return seconds until the next one is."""
+        if self.shared is not None:
+            self.leader = await self._acquire_leadership()
+            if not self.leader:
+                self._next_due.clear()
+                return IDLE_POLL_SECONDS
+
+        now = time.monotonic()
+        watched = self.watched() if self.watched is not None else []
+        # Watched symbols are polled regardless; hot ones only as far as the budget keeps them fresh
+        hot_limit = self.hot_set_size
+        capacity = self.capacity()
+        if capacity is not None:
+            hot_limit = min(hot_limit, max(0, capacity - len(watched)))
+        hot = list(dict.fromkeys(self.hot.top(hot_limit) + watched))
+        interval = self.interval(len(hot))
+
+        # Symbols that left the hot set stop being scheduled; new ones are due now
+        self._next_due = {symbol: self._next_due.get(symbol, now) for symbol in hot}
+        due = [symbol for symbol, due_at in self._next_due.items() if due_at <= now]
+        if due:
+            await self._refresh(due, interval)
+
+        if not self._next_due:
+            return IDLE_POLL_SECONDS
+        return max(0.0, min(min(self._next_due.values()) - time.monotonic(), IDLE_POLL_SECONDS))
+
+    async def _acquire_leadership(self) -> bool:
+        try:
+            return await self.shared.call("lease", LEADER_LEASE, self.holder, LEADER_LEASE_SECONDS)
+        except SharedStateError as e:
+            # Stand down rather than risk every worker polling upstream at once
+            logger.debug("Ingestion leader lease unavailable: %s", e)
+            return False
+
+    async def _refresh(self, due: List[str], interval: float) -> None:
+        """Refresh the due symbols as one provider batch, skipping ones fetched recently."""
+        started = time.monotonic()
+        symbols = []
+        for symbol in due:
+            self.refresh_lag.observe(started - self._next_due[symbol])
+
+            # A user request may already have fetched it recently
+            entry = self.cache.peek(symbol)
+            if entry is not None and not entry.stale and entry.age < interval / 2:
+                self.skipped_fresh += 1
+                self._next_due[symbol] = started + self._jittered(interval) - entry.age
+            else:
+                symbols.append(symbol)
+        if not symbols:
+            return
+
+        for symbol, result in (await self.provider.fetch_quotes(symbols)).items():
+            if isinstance(result, HTTPException):
+                self.errors += 1
+                logger.debug("Refreshing %s failed: %s", symbol, result.detail)
+            else:
+                self.cache.set(symbol, result)
+                self.refreshed += 1
+            self._next_due[symbol] = started + self._jittered(interval)
+
+    def lag(self) -> float:
+        """Seconds the most overdue hot symbol is behind its scheduled refresh."""
+        if not self._next_due:
+            return 0.0
+        return max(0.0, time.monotonic() - min(self._next_due.values()))
+
+    def hot_set(self) -> List[str]:
+        return list(self._next_due)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "leader": self.leader,
+            "market_open": is_market_open(),
+            "hot_symbols": self.hot_set(),
+            "capacity": self.capacity(),
+            "interval_seconds": round(self.interval(len(self._next_due)), 3),
+            "lag_seconds": round(self.lag(), 3),
+            "refresh_lag": self.refresh_lag.snapshot(),
+            "refreshed": self.refreshed,
+            "skipped_fresh": self.skipped_fresh,
+            "errors": self.errors,
+        }
+
+
+quote_ingestion = QuoteIngestionScheduler(
+    hot_symbols,
+    quote_cache,
+    quote_provider,
+    watched=lambda: alert_engine.symbols()[:settings.ALERTS_MAX_POLLED_SYMBOLS],
+    shared=shared_state,
+)
@@ -0,0 +1,372 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Union
+
+import httpx
+import orjson
+from fastapi import HTTPException, status
+
+from app.core.circuit_breaker import CircuitOpenError, upstream_circuit_breaker
+from app.core.config import settings
+from app.core.http_client import UpstreamClient, upstream_client
+from app.core.metrics import upstream_errors
+from app.core.rate_limiter import UpstreamRateLimited
+from app.schemas.stock import StockQuoteResponse
+
+# Weight of the newest call in a provider's smoothed latency
+LATENCY_SMOOTHING = 0.2
+
+
+async def call_finnhub(path: str, params: dict, upstream: UpstreamClient) -> dict:
+    """
+    Call a Finnhub endpoint and return its JSON body.
+
+    Calls go through the circuit breaker and the outbound rate limiter, and
+    upstream problems are raised as HTTPException.
+    """
+    try:
+        upstream_circuit_breaker.before_call()
+    except CircuitOpenError as e:
+        # Fail fast while the upstream is known to be unhealthy
+        upstream_errors.inc("circuit_open")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Stock data provider is temporarily unavailable",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+
+    # True/False feed the circuit breaker; None (rate limited) counts as neither
+    succeeded = None
+    try:
+        response = await upstream.get(
+            f"{settings.FINNHUB_BASE_URL}{path}",
+            params={**params, "token": settings.FINNHUB_API_KEY}
+        )
+        if response.status_code == 429:
+            upstream_errors.inc("throttled")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Stock data provider rate limit reached",
+                headers={"Retry-After": response.headers.get("Retry-After", "5")}
+            )
+        response.raise_for_status()
+        data = response.json()
+        succeeded = True
+        return data
+
+    except HTTPException:
+        # Re-raise HTTPException without catching it
+        raise
+    except UpstreamRateLimited as e:
+        # Shed early instead of queueing past the wait budget
+        upstream_errors.inc("rate_limited")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Stock data provider rate limit reached",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    except httpx.HTTPStatusError:
+        # Upstream error responses
+        succeeded = False
+        upstream_errors.inc("http_status")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to fetch stock data"
+        )
+    except httpx.TransportError:
+        # Timeouts, connection failures and pool exhaustion
+        succeeded = False
+        upstream_errors.inc("transport")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to fetch stock data"
+        )
+    except Exception as e:
+        succeeded = False
+        upstream_errors.inc("other")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching stock data"
+        )
+    finally:
+        if succeeded is True:
+            upstream_circuit_breaker.record_success()
+        elif succeeded is False:
+            upstream_circuit_breaker.record_failure()
+        else:
+            upstream_circuit_breaker.release()
+
+
+def parse_quote(symbol: str, data: dict) -> StockQuoteResponse:
+    """Build a quote from a Finnhub /quote response body."""
+    try:
+        # Check if we got valid data
+        if data.get("o") == 0 and data.get("h") == 0 and data.get("l") == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No data found for symbol: {symbol}"
+            )
+
+        return StockQuoteResponse(
+            symbol=symbol,
+            opening_price=data.get("o", 0),
+            current_price=data.get("c", 0),
+            high_price=data.get("h", 0),
+            low_price=data.get("l", 0),
+            previous_close=data.get("pc", 0)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching stock data"
+        )
+
+
+class QuoteProvider(ABC):
+    """
+    Interface for market data sources.
+
+    Failures are raised (or, from fetch_quotes, returned per symbol) as the
+    HTTPException a quote request should answer with: 404 for an unknown
+    symbol and 5xx when the provider is unavailable.
+    """
+
+    name = "provider"
+
+    async def start(self) -> None:
+        """Prepare the provider. Called from the application lifespan."""
+
+    async def close(self) -> None:
+        """Release the provider's resources. Called on application shutdown."""
+
+    @abstractmethod
+    async def fetch_quote(self, symbol: str) -> StockQuoteResponse:
+        ...
+
+    async def fetch_quotes(self, symbols: Iterable[str]) -> Dict[str, Union[StockQuoteResponse, HTTPException]]:
+        """Fetch quotes for many symbols concurrently, returning failures per symbol."""
+        async def fetch_one(symbol: str) -> Union[StockQuoteResponse, HTTPException]:
+            try:
+                return await self.fetch_quote(symbol)
+            except HTTPException as e:
+                return e
+
+        unique_symbols = list(dict.fromkeys(symbols))
+        results = await asyncio.gather(*(fetch_one(symbol) for symbol in unique_symbols))
+        return dict(zip(unique_symbols, results))
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+
+class FinnhubProvider(QuoteProvider):
+    """Quotes from the Finnhub REST API through the shared upstream client."""
+
+    name = "finnhub"
+
+    def __init__(self, upstream: UpstreamClient):
+        self.upstream = upstream
+
+    async def fetch_quote(self, symbol: str) -> StockQuoteResponse:
+        data = await call_finnhub("/quote", {"symbol": symbol}, self.upstream)
+        return parse_quote(symbol, data)
+
+
+class ReplayProvider(QuoteProvider):
+    """
+    Deterministic quotes replayed from a recorded tick file, for offline load
+    tests and benchmarks.
+
+    The file holds one JSON object per line: a Finnhub /quote body (c, o, h, l,
+    pc and its t timestamp in seconds) plus the symbol. Replay starts at the
+    earliest tick on startup and advances `speed` recorded seconds per second
+    (0 holds the first tick); each symbol's quote is its latest tick at or
+    before that point. With `loop`, replay wraps around at the end of the
+    recording, otherwise it stays on the last ticks.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._times: Dict[str, List[float]] = {}
+        self._quotes: Dict[str, List[StockQuoteResponse]] = {}
+        self._first = self._last = 0.0
+        self._started_at: Optional[float] = None
+        self.ticks = 0
+        self.served = 0
+
+    def load(self) -> None:
+        """Read the tick file and index it per symbol by timestamp."""
+        ticks: Dict[str, List[tuple]] = {}
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                tick = orjson.loads(line)
+                symbol = tick["symbol"]
+                ticks.setdefault(symbol, []).append((float(tick["t"]), parse_quote(symbol, tick)))
+
+        if not ticks:
+            raise ValueError(f"No ticks in replay file {self.path}")
+        self._times, self._quotes = {}, {}
+        for symbol, series in ticks.items():
+            series.sort(key=lambda tick: tick[0])
+            self._times[symbol] = [t for t, _ in series]
+            self._quotes[symbol] = [quote for _, quote in series]
+        self._first = min(times[0] for times in self._times.values())
+        self._last = max(times[-1] for times in self._times.values())
+        self.ticks = sum(len(times) for times in self._times.values())
+
+    async def start(self) -> None:
+        if self._started_at is None:
+            self.load()
+            self._started_at = time.monotonic()
+
+    def position(self) -> float:
+        """The recorded timestamp replay has reached."""
+        elapsed = (time.monotonic() - self._started_at) * self.speed
+        span = self._last - self._first
+        if self.loop and span > 0:
+            elapsed %= span
+        return self._first + min(elapsed, span)
+
+    async def fetch_quote(self, symbol: str) -> StockQuoteResponse:
+        if self._started_at is None:
+            await self.start()
+        times = self._times.get(symbol)
+        if times is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No data found for symbol: {symbol}"
+            )
+        self.served += 1
+        # A symbol not traded yet at this point shows its first tick
+        index = max(0, bisect_right(times, self.position()) - 1)
+        return self._quotes[symbol][index]
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "symbols": len(self._times),
+            "ticks": self.ticks,
+            "position": round(self.position(), 3) if self._started_at is not None else None,
+            "speed": self.speed,
+            "served": self.served,
+        }
+
+
+class FailoverProvider(QuoteProvider):
+    """
+    Chain of providers that sends each call to the fastest healthy one.
+
+    Providers are ranked by their smoothed latency of successful calls (ones
+    not measured yet are tried first). A provider that fails with a 5xx is
+    skipped for `cooldown` seconds and the call moves on to the next one; a 4xx
+    (such as an unknown symbol) also moves on, without counting as a failure.
+    When every provider fails, the first 5xx is raised, or the 4xx if all of
+    them answered one.
+    """
+
+    name = "failover"
+
+    def __init__(self, providers: List[QuoteProvider], cooldown: float = settings.QUOTE_PROVIDER_COOLDOWN_SECONDS):
+        if not providers:
+            raise ValueError("FailoverProvider needs at least one provider")
+        self.providers = providers
+        self.cooldown = cooldown
+        self._latency: Dict[int, float] = {}
+        self._unhealthy_until: Dict[int, float] = {}
+        self._calls = [0] * len(providers)
+        self._failures = [0] * len(providers)
+        self.failovers = 0
+
+    async def start(self) -> None:
+        for provider in self.providers:
+            await provider.start()
+
+    async def close(self) -> None:
+        for provider in self.providers:
+            await provider.close()
+
+    def healthy(self, index: int) -> bool:
+        return self._unhealthy_until.get(index, 0.0) <= time.monotonic()
+
+    def ranked(self) -> List[int]:
+        """Provider indexes in the order calls try them."""
+        return sorted(
+            range(len(self.providers)),
+            key=lambda index: (not self.healthy(index), self._latency.get(index, 0.0), index)
+        )
+
+    async def fetch_quote(self, symbol: str) -> StockQuoteResponse:
+        unavailable: Optional[HTTPException] = None
+        not_found: Optional[HTTPException] = None
+        for attempt, index in enumerate(self.ranked()):
+            if attempt:
+                self.failovers += 1
+            self._calls[index] += 1
+            started = time.monotonic()
+            try:
+                quote = await self.providers[index].fetch_quote(symbol)
+            except HTTPException as e:
+                if e.status_code < 500:
+                    not_found = not_found or e
+                    continue
+                self._failures[index] += 1
+                self._unhealthy_until[index] = time.monotonic() + self.cooldown
+                unavailable = unavailable or e
+                continue
+
+            latency = time.monotonic() - started
+            previous = self._latency.get(index)
+            self._latency[index] = latency if previous is None else (
+                previous + LATENCY_SMOOTHING * (latency - previous)
+            )
+            self._unhealthy_until.pop(index, None)
+            return quote
+        raise unavailable or not_found
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "failovers": self.failovers,
+            "providers": [
+                {
+                    **provider.stats(),
+                    "healthy": self.healthy(index),
+                    "latency_ms": round(self._latency[index] * 1000, 3) if index in self._latency else None,
+                    "calls": self._calls[index],
+                    "failures": self._failures[index],
+                }
+                for index, provider in enumerate(self.providers)
+            ],
+        }
+
+
+def create_quote_provider(name: str = settings.QUOTE_PROVIDER) -> QuoteProvider:
+    if name == "finnhub":
+        return FinnhubProvider(upstream_client)
+    if name == "replay":
+        if not settings.QUOTE_REPLAY_FILE:
+            raise RuntimeError("QUOTE_REPLAY_FILE must be set for the replay provider")
+        return ReplayProvider(settings.QUOTE_REPLAY_FILE, settings.QUOTE_REPLAY_SPEED, settings.QUOTE_REPLAY_LOOP)
+    if name == "failover":
+        chain = [provider.strip() for provider in settings.QUOTE_PROVIDER_CHAIN.split(",") if provider.strip()]
+        if "failover" in chain:
+            raise ValueError("QUOTE_PROVIDER_CHAIN cannot contain failover")
+        return FailoverProvider([create_quote_provider(provider) for provider in chain])
+    raise ValueError(f"Unknown QUOTE_PROVIDER: {name}")
+
+
+quote_provider: QuoteProvider = create_quote_provider()
+
+
+def get_quote_provider() -> QuoteProvider:
+    return quote_provider
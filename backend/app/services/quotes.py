@@ -0,0 +1,74 @@
+import asyncio
+from typing import Dict, Iterable, List, Union
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.hot_symbols import hot_symbols
+from app.core.quote_cache import CacheEntry, quote_cache
+from app.schemas.stock import BatchQuoteItem
+from app.services.providers import QuoteProvider
+
+
+async def get_quote(symbol: str, provider: QuoteProvider) -> CacheEntry:
+    """
+    Get a quote from the cache, coalescing concurrent upstream fetches per symbol.
+    
+    If a recent-enough quote is known, it is served marked as stale when the
+    upstream fails or the circuit is open, or when the fetch exceeds the latency
+    budget. In the latter case the fetch keeps running and refreshes the cache
+    for the next request.
+    """
+    # Feed the background ingestion hot set
+    hot_symbols.record(symbol)
+    
+    last_known = quote_cache.peek(symbol)
+    try:
+        return await quote_cache.get_or_fetch(
+            symbol,
+            lambda: provider.fetch_quote(symbol),
+            timeout=settings.QUOTE_LATENCY_BUDGET_SECONDS if last_known else None
+        )
+    except asyncio.TimeoutError:
+        return quote_cache.serve_stale(last_known)
+    except HTTPException as e:
+        if last_known is not None and e.status_code >= 500:
+            return quote_cache.serve_stale(last_known)
+        raise
+
+
+async def get_quotes(
+    symbols: Iterable[str],
+    provider: QuoteProvider,
+    concurrency: int = settings.BATCH_QUOTE_CONCURRENCY
+) -> Dict[str, Union[CacheEntry, HTTPException]]:
+    """
+    Get quotes for many symbols concurrently, at most `concurrency` at a time.
+
+    Repeated symbols are fetched once. Failures are returned per symbol as the
+    HTTPException that a single quote request would have raised.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def fetch_one(symbol: str) -> Union[CacheEntry, HTTPException]:
+        async with semaphore:
+            try:
+                return await get_quote(symbol, provider)
+            except HTTPException as e:
+                return e
+    
+    unique_symbols = list(dict.fromkeys(symbols))
+    results = await asyncio.gather(*(fetch_one(symbol) for symbol in unique_symbols))
+    return dict(zip(unique_symbols, results))
+
+
+async def get_quote_items(symbols: List[str], provider: QuoteProvider) -> List[BatchQuoteItem]:
+    """Get quotes for many symbols as batch response items, in the order given."""
+    results = await get_quotes(symbols, provider)
+    
+    items = []
+    for symbol in symbols:
+        result = results[symbol]
+        if isinstance(result, HTTPException):
+            items.append(BatchQuoteItem(symbol=symbol, status_code=result.status_code, error=result.detail))
+        else:
+            items.append(BatchQuoteItem(symbol=symbol, quote=result.value, stale=result.stale))
+    return items
@@ -0,0 +1,144 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.providers import quote_provider
+from app.services.quotes import get_quote
+
+
+class Subscription:
+    """
+    One streaming client's pending messages.
+
+    Messages are coalesced per symbol, so a slow consumer only ever holds the
+    latest update for each symbol it watches rather than an unbounded backlog.
+    """
+
+    def __init__(self, max_pending: int = settings.STREAM_MAX_PENDING_MESSAGES, user_id: Optional[int] = None):
+        self.symbols: Set[str] = set()
+        self.user_id = user_id
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: "OrderedDict[str, dict]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def push(self, key: str, message: dict) -> None:
+        """Queue a message, replacing any undelivered one with the same key (usually the symbol)."""
+        if key in self._pending:
+            self.dropped += 1
+        elif len(self._pending) >= self.max_pending:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = message
+        self._pending.move_to_end(key)
+        self._ready.set()
+
+    async def next_batch(self) -> List[dict]:
+        """Wait for and drain all pending messages."""
+        await self._ready.wait()
+        messages = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        return messages
+
+
+class QuoteStreamHub:
+    """
+    Fans quote updates out to streaming subscribers.
+
+    Each symbol has exactly one background poller no matter how many clients
+    subscribe to it, and only quotes that changed since the last poll are pushed.
+    Messages for a user, such as triggered alerts, go to all of their streams.
+    """
+
+    def __init__(self, poll_interval: float = settings.STREAM_POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._last_messages: Dict[str, dict] = {}
+        self._users: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, subscription: Subscription, symbols: Iterable[str]) -> None:
+        if subscription.user_id is not None:
+            self._users.setdefault(subscription.user_id, set()).add(subscription)
+        for symbol in symbols:
+            if symbol in subscription.symbols:
+                continue
+            subscription.symbols.add(symbol)
+            self._subscribers.setdefault(symbol, set()).add(subscription)
+
+            # New subscribers get the last known quote straight away
+            last_message = self._last_messages.get(symbol)
+            if last_message is not None:
+                subscription.push(symbol, last_message)
+
+            if symbol not in self._pollers:
+                self._pollers[symbol] = asyncio.create_task(self._poll(symbol))
+
+    def unsubscribe(self, subscription: Subscription, symbols: Optional[Iterable[str]] = None) -> None:
+        """Unsubscribe from symbols, or close the subscription entirely when symbols is None."""
+        if symbols is None and subscription.user_id is not None:
+            streams = self._users.get(subscription.user_id)
+            if streams is not None:
+                streams.discard(subscription)
+                if not streams:
+                    del self._users[subscription.user_id]
+        for symbol in list(subscription.symbols if symbols is None else symbols):
+            subscription.symbols.discard(symbol)
+            subscribers = self._subscribers.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                # Last subscriber left: stop polling this symbol
+                del self._subscribers[symbol]
+                self._last_messages.pop(symbol, None)
+                poller = self._pollers.pop(symbol, None)
+                if poller is not None:
+                    poller.cancel()
+
+    def notify_user(self, user_id: int, key: str, message: dict) -> int:
+        """Push a message to every open stream of a user and return how many received it."""
+        streams = self._users.get(user_id, ())
+        for subscription in streams:
+            subscription.push(key, message)
+        return len(streams)
+
+    async def _poll(self, symbol: str) -> None:
+        while True:
+            try:
+                entry = await get_quote(symbol, quote_provider)
+                message = {"type": "quote", "data": entry.value.model_dump(), "stale": entry.stale}
+            except HTTPException as e:
+                message = {"type": "error", "symbol": symbol, "status_code": e.status_code, "detail": e.detail}
+
+            if message != self._last_messages.get(symbol):
+                self._last_messages[symbol] = message
+                for subscription in self._subscribers.get(symbol, ()):
+                    subscription.push(symbol, message)
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self) -> None:
+        """Stop all pollers. Called on application shutdown."""
+        pollers = list(self._pollers.values())
+        for poller in pollers:
+            poller.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        self._pollers.clear()
+        self._subscribers.clear()
+        self._last_messages.clear()
+        self._users.clear()
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self._pollers),
+            "subscriptions": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "users": len(self._users),
+        }
+
+
+quote_stream_hub = QuoteStreamHub()
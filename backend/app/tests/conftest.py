@@ -3,6 +3,10 @@ import os
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+
+# Keep the background quote refresh from calling the mocked upstream between assertions
+os.environ.setdefault("INGESTION_ENABLED", "false")
+
 from app.main import app
 from app.core.database import Base, get_db
 from app.models.user import User
@@ -36,9 +40,43 @@ def client(setup_database):
     from app.core.token_blacklist import clear_blacklist
     clear_blacklist()       # Clear token blacklist
     
+    from app.core.quote_cache import quote_cache
+    quote_cache.clear()     # Clear cached quotes
+    
+    from app.core.circuit_breaker import upstream_circuit_breaker
+    upstream_circuit_breaker.reset()    # Close the upstream circuit
+    
+    from app.core.user_cache import user_cache
+    user_cache.clear()      # Clear cached users
+    
+    from app.core.security import verified_token_cache
+    verified_token_cache.clear()    # Clear cached token verifications
+    
+    from app.core.hot_symbols import hot_symbols
+    hot_symbols.clear()     # Forget requested symbols
+    
+    from app.core.profiling import request_profiler
+    request_profiler.configure(enabled=False, sample_rate=0.0)
+    request_profiler.clear()    # Turn off request profiling
+    
+    from app.core.request_limits import request_limiter
+    request_limiter.clear()     # Reset request rate limits
+    
+    from app.services.alerts import alert_engine
+    alert_engine.session_factory = TestingSessionLocal
+    alert_engine.clear()    # Drop indexed alerts
+    
+    from app.services.indicators import indicator_engine
+    indicator_engine.clear()    # Drop buffered indicator series
+    
     # Clean up test data from previous tests
     with engine.connect() as conn:
+        conn.execute(text("DELETE FROM price_alerts"))
+        conn.execute(text("DELETE FROM watchlist_items"))
+        conn.execute(text("DELETE FROM watchlists"))
         conn.execute(text("DELETE FROM users"))
+        conn.execute(text("DELETE FROM candles"))
+        conn.execute(text("DELETE FROM candle_coverage"))
         conn.commit()
     
     app.dependency_overrides[get_db] = override_get_db
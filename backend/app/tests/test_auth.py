@@ -94,6 +94,31 @@ def test_login_wrong_password(client):
     assert response.status_code == 401
     assert "Incorrect email or password" in response.json()["detail"]
 
+
+def test_login_rate_limited_per_ip(client):
+    """Test repeated login attempts from one IP are cut off with 429 and Retry-After."""
+    from unittest.mock import patch
+    from app.core.request_limits import RateLimitPolicy, request_limiter
+    
+    policy = RateLimitPolicy("auth", 3, 60.0, "ip", paths=("/auth/login",), methods=("POST",))
+    credentials = {"email": "bruteforce@example.com", "password": "wrongpassword"}
+    with patch.object(request_limiter, "policies", [policy]):
+        responses = [client.post("/auth/login", json=credentials) for _ in range(4)]
+        # Other routes are not counted against the login limit
+        assert client.get("/auth/validate").status_code == 403
+    
+    assert [response.status_code for response in responses] == [401, 401, 401, 429]
+    assert [response.headers["RateLimit-Remaining"] for response in responses] == ["2", "1", "0", "0"]
+    assert responses[0].headers["RateLimit-Limit"] == "3"
+    assert responses[0].headers["RateLimit-Policy"] == "3;w=60"
+    
+    limited = responses[3]
+    assert limited.json() == {"detail": "Too many requests"}
+    assert limited.headers["Retry-After"] == "20"
+    assert "RateLimit-Remaining" in limited.headers
+    assert client.get("/health/rate-limits").json()["rate_limits"]["limited"] == 1
+
+
 def test_logout_endpoint(client):
     """Test logout endpoint blacklists token."""
     # Sign up and login
@@ -149,4 +174,412 @@ def test_security_headers_present(client):
     assert response.headers["X-Frame-Options"] == "DENY"
     
     assert "X-XSS-Protection" in response.headers
-    assert response.headers["X-XSS-Protection"] == "1; mode=block"
\ No newline at end of file
+    assert response.headers["X-XSS-Protection"] == "1; mode=block"
+
+
+def test_login_token_carries_user_id(client):
+    """Test access tokens embed the user id for stateless authentication."""
+    from app.core.security import decode_access_token_claims
+    
+    signup_response = client.post(
+        "/auth/signup",
+        json={"email": "claims@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "claims@example.com", "password": "testpassword123"}
+    )
+    claims = decode_access_token_claims(login_response.json()["access_token"])
+    assert claims["sub"] == "claims@example.com"
+    assert claims["uid"] == signup_response.json()["id"]
+
+
+def test_stateless_principal_skips_user_lookup(client):
+    """Test quote requests authenticate from token claims without the users table."""
+    from unittest.mock import patch
+    from app.core.security import create_access_token
+    
+    # No user row exists for this token
+    token = create_access_token(data={"sub": "ghost@example.com", "uid": 12345})
+    
+    with patch("app.core.deps._load_user") as mock_load_user:
+        response = client.get(
+            "/stocks/quotes?symbols=bad!",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 422
+        mock_load_user.assert_not_called()
+    
+    # Endpoints that need the full user row still check it exists
+    response = client.get("/auth/validate", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_user_cache_invalidated_on_delete(client, db_session):
+    """Test cached principals are dropped when the user is deleted."""
+    import asyncio
+    from app.core.deps import authenticate_principal
+    from app.core.security import create_access_token, get_password_hash
+    from app.core.user_cache import user_cache
+    
+    user = User(email="cached@example.com", hashed_password=get_password_hash("testpassword123"))
+    db_session.add(user)
+    db_session.commit()
+    
+    # Tokens without a user id claim resolve through the user cache
+    token = create_access_token(data={"sub": "cached@example.com"})
+    principal = asyncio.run(authenticate_principal(token, db_session))
+    assert principal.id == user.id
+    assert user_cache.get("cached@example.com") == principal
+    
+    db_session.delete(user)
+    db_session.commit()
+    assert user_cache.get("cached@example.com") is None
+
+
+def test_login_runs_bcrypt_off_event_loop(client):
+    """Test password hashing and verification go through the bounded executor."""
+    client.post(
+        "/auth/signup",
+        json={"email": "executor@example.com", "password": "testpassword123"}
+    )
+    client.post(
+        "/auth/login",
+        json={"email": "executor@example.com", "password": "testpassword123"}
+    )
+    
+    stats = client.get("/health/executors").json()
+    assert stats["password_hash"]["completed"] >= 2
+    assert stats["password_hash"]["queued"] == 0
+    assert stats["db"]["completed"] >= 3
+
+
+def test_login_rehashes_outdated_password_hash(client):
+    """Test a hash at an old cost is upgraded to the calibrated cost on successful login."""
+    from app.core.security import build_password_context, password_hasher
+    from app.tests.conftest import TestingSessionLocal
+    
+    client.post("/auth/signup", json={"email": "rehash@example.com", "password": "testpassword123"})
+    
+    # Stored before the cost changed
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.email == "rehash@example.com").first()
+    user.hashed_password = build_password_context("bcrypt", 4).hash("testpassword123")
+    db.commit()
+    rehashed_before = password_hasher.rehashed
+    
+    # A failed login leaves the hash alone
+    wrong = client.post("/auth/login", json={"email": "rehash@example.com", "password": "wrongpassword1"})
+    assert wrong.status_code == 401
+    db.expire_all()
+    assert user.hashed_password.startswith("$2b$04$")
+    
+    for _ in range(2):
+        response = client.post("/auth/login", json={"email": "rehash@example.com", "password": "testpassword123"})
+        assert response.status_code == 200
+    
+    db.expire_all()
+    assert user.hashed_password.startswith(f"$2b${password_hasher.rounds:02d}$")
+    assert password_hasher.rehashed == rehashed_before + 1
+    db.close()
+    
+    hashing = client.get("/health/executors").json()["password_hashing"]
+    assert hashing["scheme"] == "bcrypt"
+    assert 10 <= hashing["rounds"] <= 16
+    assert hashing["verify_ms"] > 0
+
+
+def test_password_hasher_never_downgrades_stronger_hashes(monkeypatch):
+    """Test hashes above the current cost are kept, and workers sharing state need a fixed cost."""
+    from app.core.config import settings
+    from app.core.security import MIN_ROUNDS, PasswordHasher, build_password_context, calibrate_rounds
+    
+    hasher = PasswordHasher("bcrypt", rounds=5)
+    weaker = build_password_context("bcrypt", 4).hash("testpassword123")
+    stronger = build_password_context("bcrypt", 6).hash("testpassword123")
+    
+    verified, new_hash = hasher.verify_and_update("testpassword123", weaker)
+    assert verified and new_hash.startswith("$2b$05$")
+    # Another worker (or an earlier deploy) calibrated higher: leave it alone
+    assert hasher.verify_and_update("testpassword123", stronger) == (True, None)
+    assert hasher.rehashed == 1
+    
+    # Calibrating separately in each worker could pick different costs
+    monkeypatch.setattr(settings, "SHARED_STATE_SOCKET", "/tmp/stockapp-state.sock")
+    with pytest.raises(RuntimeError):
+        PasswordHasher("bcrypt").configure()
+    PasswordHasher("bcrypt", rounds=5).configure()
+    
+    # A target no cost can meet falls back to the floor instead of failing startup
+    assert calibrate_rounds("bcrypt", 0) == calibrate_rounds("bcrypt", -1) == MIN_ROUNDS["bcrypt"]
+
+
+def test_blocking_executor_sheds_when_queue_full():
+    """Test work is rejected with 503 once the executor queue is full."""
+    import asyncio
+    import threading
+    from fastapi import HTTPException
+    from app.core.executors import BlockingExecutor
+    
+    executor = BlockingExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    
+    async def run():
+        busy = asyncio.ensure_future(executor.run(release.wait))
+        waiting = asyncio.ensure_future(executor.run(lambda: "done"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as error:
+            await executor.run(lambda: "rejected")
+        release.set()
+        return error.value, await busy, await waiting
+    
+    error, busy_result, waiting_result = asyncio.run(run())
+    executor.shutdown()
+    
+    assert error.status_code == 503
+    assert waiting_result == "done"
+    assert executor.rejected == 1
+
+
+def test_logout_revokes_by_jti_until_expiry(client):
+    """Test logout stores the token's jti with its expiry instead of the raw token."""
+    import asyncio
+    from app.core.security import create_access_token, decode_access_token_claims
+    from app.core.token_blacklist import revoked_tokens, is_token_blacklisted
+    
+    token = create_access_token(data={"sub": "revoke@example.com", "uid": 1})
+    claims = decode_access_token_claims(token)
+    
+    response = client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    
+    assert revoked_tokens.contains(claims["jti"])
+    assert not revoked_tokens.contains(token)
+    assert asyncio.run(is_token_blacklisted(token))
+    
+    # A fresh token for the same user is unaffected
+    assert not asyncio.run(is_token_blacklisted(create_access_token(data={"sub": "revoke@example.com", "uid": 1})))
+
+
+def test_memory_revocation_store_evicts_expired_entries():
+    """Test expired revocations are evicted automatically."""
+    import time
+    from app.core.token_blacklist import MemoryRevocationStore
+    
+    store = MemoryRevocationStore()
+    store.add("expired", time.time() - 1)
+    store.add("short", time.time() + 0.05)
+    store.add("long", time.time() + 3600)
+    assert not store.contains("expired")
+    assert store.contains("short")
+    
+    time.sleep(0.06)
+    assert store.cleanup() == 1
+    assert len(store) == 1
+    assert store.contains("long")
+
+
+def test_memory_revocation_store_tolerates_concurrent_writers(monkeypatch):
+    """Test logout threads and the sweeper can write while lookups run."""
+    import heapq
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+    from app.core import token_blacklist
+    
+    def slow_heappop(heap):
+        # Yield between checking the heap top and popping it, where another writer could slip in
+        time.sleep(0.0001)
+        return heapq.heappop(heap)
+    
+    monkeypatch.setattr(token_blacklist, "heapq", SimpleNamespace(heappush=heapq.heappush, heappop=slow_heappop))
+    store = token_blacklist.MemoryRevocationStore()
+    stop = threading.Event()
+    
+    def churn(worker):
+        # Entries expiring right away keep cleanup popping the heap
+        for i in range(300):
+            store.add(f"short-{worker}-{i}", time.time() + 0.0001)
+            store.add(f"long-{worker}-{i}", time.time() + 3600)
+    
+    def sweep():
+        while not stop.is_set():
+            store.cleanup()
+            store.contains("short-0-0")
+    
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        sweepers = [pool.submit(sweep) for _ in range(2)]
+        for future in [pool.submit(churn, worker) for worker in range(4)]:
+            future.result()
+        stop.set()
+        for future in sweepers:
+            future.result()
+    
+    time.sleep(0.01)
+    store.cleanup()
+    # No long-lived revocation was popped by a racing cleanup
+    assert len(store) == 4 * 300
+    assert all(store.contains(f"long-{worker}-{i}") for worker in range(4) for i in range(300))
+
+
+def test_sql_revocation_store_shared_between_instances(setup_database):
+    """Test revocations in the SQL store are visible to other workers' stores."""
+    import asyncio
+    import time
+    from app.core.token_blacklist import SQLRevocationStore
+    from app.tests.conftest import TestingSessionLocal
+    
+    worker_a = SQLRevocationStore(session_factory=TestingSessionLocal, negative_ttl=0)
+    worker_b = SQLRevocationStore(session_factory=TestingSessionLocal, negative_ttl=0)
+    worker_a.clear()
+    
+    assert not asyncio.run(worker_b.is_revoked("shared-jti"))
+    worker_a.add("shared-jti", time.time() + 3600)
+    worker_a.add("stale-jti", time.time() - 1)
+    assert asyncio.run(worker_b.is_revoked("shared-jti"))
+    assert not asyncio.run(worker_b.is_revoked("stale-jti"))
+    
+    assert worker_a.cleanup() == 1
+    worker_a.clear()
+
+
+def test_local_revocation_store_shared_between_workers(tmp_path):
+    """Test revocations held by the shared state server are visible to other workers' stores."""
+    import asyncio
+    import threading
+    import time
+    from app.core.shared_state import SharedStateServer
+    from app.core.token_blacklist import LocalRevocationStore
+    
+    path = str(tmp_path / "state.sock")
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server = asyncio.run_coroutine_threadsafe(SharedStateServer().serve(path), loop)
+    deadline = time.monotonic() + 5
+    while not (tmp_path / "state.sock").exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    
+    worker_a = LocalRevocationStore(path, negative_ttl=0)
+    worker_b = LocalRevocationStore(path, negative_ttl=0)
+    
+    async def lookups():
+        results = [await worker_b.is_revoked("shared-jti")]
+        await asyncio.to_thread(worker_a.add, "shared-jti", time.time() + 3600)
+        await asyncio.to_thread(worker_a.add, "stale-jti", time.time() - 1)
+        results += [await worker_b.is_revoked("shared-jti"), await worker_b.is_revoked("stale-jti")]
+        await asyncio.to_thread(worker_b.clear)
+        worker_c = LocalRevocationStore(path, negative_ttl=0)
+        results.append(await worker_c.is_revoked("shared-jti"))
+        for worker in (worker_a, worker_b, worker_c):
+            await worker._async_client.close()
+        return results
+    
+    assert asyncio.run(lookups()) == [False, True, False, False]
+    server.cancel()
+
+
+def test_revocation_lookup_fails_open_or_closed(tmp_path):
+    """Test an unreachable shared store accepts unknown tokens, or rejects them with 503 when failing closed."""
+    import asyncio
+    import time
+    from fastapi import HTTPException
+    from app.core.token_blacklist import LocalRevocationStore
+    
+    path = str(tmp_path / "missing.sock")
+    fail_open = LocalRevocationStore(path, fail_open=True)
+    fail_closed = LocalRevocationStore(path, fail_open=False)
+    # Revocations this worker made itself are still honoured
+    fail_open._revoked.add("known-jti", time.time() + 60)
+    
+    assert asyncio.run(fail_open.is_revoked("other-jti")) is False
+    assert asyncio.run(fail_open.is_revoked("known-jti")) is True
+    assert fail_open.lookup_errors == 1
+    
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(fail_closed.is_revoked("other-jti"))
+    assert error.value.status_code == 503
+    assert fail_closed.lookup_errors == 1
+
+
+def test_revocation_sweeper_removes_expired_rows(setup_database):
+    """Test the periodic sweep deletes expired revocations from the shared store."""
+    import asyncio
+    import time
+    from unittest.mock import patch
+    from app.core import token_blacklist
+    from app.core.token_blacklist import RevocationSweeper, SQLRevocationStore
+    from app.tests.conftest import TestingSessionLocal
+    
+    store = SQLRevocationStore(session_factory=TestingSessionLocal, negative_ttl=0)
+    store.clear()
+    store.add("expired-jti", time.time() - 1)
+    store.add("live-jti", time.time() + 3600)
+    
+    async def sweep():
+        sweeper = RevocationSweeper(interval=0.01)
+        await sweeper.start()
+        await asyncio.sleep(0.1)
+        await sweeper.close()
+        return sweeper.removed
+    
+    with patch.object(token_blacklist, "revoked_tokens", store):
+        assert asyncio.run(sweep()) == 1
+    assert asyncio.run(store.is_revoked("live-jti"))
+    store.clear()
+
+
+def test_verified_token_cache_skips_repeat_decodes(client):
+    """Test repeated bearer tokens are verified once and served from the cache."""
+    from unittest.mock import patch
+    from app.core import security
+    from app.core.security import create_access_token, verified_token_cache
+    
+    token = create_access_token(data={"sub": "jwtcache@example.com", "uid": 1})
+    
+    with patch.object(security.jwt, "decode", wraps=security.jwt.decode) as mock_decode:
+        for _ in range(3):
+            client.get("/stocks/quotes?symbols=bad!", headers={"Authorization": f"Bearer {token}"})
+        assert mock_decode.call_count == 1
+    
+    # The rate limiter and the auth dependency both read the one cached verification
+    assert verified_token_cache.stats()["hits"] == 5
+    
+    # Blacklisting drops the cached verification
+    client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"})
+    assert token not in verified_token_cache._entries
+
+
+def test_verified_token_cache_expires_with_token():
+    """Test cached claims are not served past the token's own expiry."""
+    import time
+    from app.core.security import VerifiedTokenCache
+    
+    cache = VerifiedTokenCache(max_size=2)
+    cache.set("expired", {"sub": "a", "exp": time.time() - 1})
+    cache.set("valid", {"sub": "b", "exp": time.time() + 60})
+    assert cache.get("expired") is None
+    assert cache.get("valid")["sub"] == "b"
+    
+    cache.set("other", {"sub": "c", "exp": time.time() + 60})
+    cache.set("newest", {"sub": "d", "exp": time.time() + 60})
+    assert cache.get("valid") is None
+
+
+def test_db_health_reports_pool_usage(client):
+    """Test the database health check reports reachability and pool metrics."""
+    response = client.get("/health/db")
+    assert response.status_code == 200
+    database = response.json()["database"]
+    assert database["reachable"] is True
+    assert "checkout_wait_seconds" in database["pool"]
+
+
+def test_db_health_unreachable(client):
+    """Test the database health check fails when the database is down."""
+    from unittest.mock import patch
+    
+    with patch("app.main.check_db", return_value={"reachable": False, "latency_seconds": 0.0, "pool": {}}):
+        response = client.get("/health/db")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unhealthy"
@@ -1,5 +1,7 @@
 import pytest
 from unittest.mock import patch, Mock, AsyncMock
+import httpx
+from app.core.http_client import upstream_client
 
 
 def test_get_stock_quote_unauthorized(client):
@@ -22,7 +24,7 @@ def test_get_stock_quote_authorized(client):
     token = login_response.json()["access_token"]
     
     # Mock the external API call
-    with patch('app.api.stocks.httpx.AsyncClient') as mock_client:
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
         mock_response = Mock()
         mock_response.json.return_value = {
             "o": 150.25,
@@ -32,12 +34,7 @@ def test_get_stock_quote_authorized(client):
             "pc": 150.00
         }
         mock_response.raise_for_status = Mock()
-        
-        # Create async context manager mock
-        mock_instance = AsyncMock()
-        mock_instance.get = AsyncMock(return_value=mock_response)
-        mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_instance)
-        mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
+        mock_get.return_value = mock_response
         
         # Make request with auth (now using GET with path parameter)
         response = client.get(
@@ -129,7 +126,7 @@ def test_get_stock_quote_not_found(client):
     token = login_response.json()["access_token"]
     
     # Mock the external API call with no data
-    with patch('app.api.stocks.httpx.AsyncClient') as mock_client:
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
         mock_response = Mock()
         # Finnhub returns these specific values for invalid symbols
         mock_response.json.return_value = {
@@ -143,12 +140,7 @@ def test_get_stock_quote_not_found(client):
             "t": 0
         }
         mock_response.raise_for_status = Mock()
-        
-        # Create async context manager mock
-        mock_instance = AsyncMock()
-        mock_instance.get = AsyncMock(return_value=mock_response)
-        mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_instance)
-        mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
+        mock_get.return_value = mock_response
         
         # Make request with auth (using valid format but non-existent symbol)
         response = client.get(
@@ -174,16 +166,13 @@ def test_get_stock_quote_external_api_error(client):
     token = login_response.json()["access_token"]
     
     # Mock the external API call to raise an error
-    with patch('app.api.stocks.httpx.AsyncClient') as mock_client:
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
         from httpx import HTTPStatusError
         
-        # Create async context manager mock that raises an error
-        mock_instance = AsyncMock()
+        # Shared upstream client raises an error
         mock_response = Mock()
         mock_response.status_code = 500
-        mock_instance.get = AsyncMock(side_effect=HTTPStatusError("API Error", request=Mock(), response=mock_response))
-        mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_instance)
-        mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
+        mock_get.side_effect = HTTPStatusError("API Error", request=Mock(), response=mock_response)
         
         # Make request with auth
         response = client.get(
@@ -192,4 +181,1408 @@ def test_get_stock_quote_external_api_error(client):
         )
         
         assert response.status_code == 503
-        assert "Unable to fetch stock data" in response.json()["detail"]
\ No newline at end of file
+        assert "Unable to fetch stock data" in response.json()["detail"]
+
+
+def test_get_stock_quote_upstream_timeout(client):
+    """Test stock quote when the upstream call times out."""
+    client.post(
+        "/auth/signup",
+        json={"email": "timeout@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "timeout@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        from httpx import ReadTimeout
+        mock_get.side_effect = ReadTimeout("Upstream too slow")
+        
+        response = client.get(
+            "/stocks/quote/AAPL",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        
+        assert response.status_code == 503
+        assert "Unable to fetch stock data" in response.json()["detail"]
+
+
+def test_upstream_pool_metrics(client):
+    """Test that the shared upstream client reports pool metrics."""
+    response = client.get("/health/upstream")
+    assert response.status_code == 200
+    pool = response.json()["pool"]
+    assert pool["started"] is True
+    assert pool["max_connections"] > 0
+    assert pool["in_flight"] == 0
+    assert "saturation" in pool
+
+
+def test_get_stock_quote_served_from_cache(client):
+    """Test repeated quotes for a symbol hit the cache instead of upstream."""
+    client.post(
+        "/auth/signup",
+        json={"email": "cache@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "cache@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_response = Mock()
+        mock_response.json.return_value = {"o": 150.25, "c": 152.50, "h": 153.00, "l": 149.50, "pc": 150.00}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+        
+        first = client.get("/stocks/quote/AAPL", headers={"Authorization": f"Bearer {token}"})
+        second = client.get("/stocks/quote/AAPL", headers={"Authorization": f"Bearer {token}"})
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json() == first.json()
+        assert float(second.headers["X-Quote-Age"]) >= 0
+        assert mock_get.await_count == 1
+    
+    stats = client.get("/health/cache").json()["cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_quote_cache_coalesces_concurrent_misses():
+    """Test concurrent misses for one symbol share a single upstream fetch."""
+    import asyncio
+    from app.core.quote_cache import QuoteCache
+    
+    cache = QuoteCache(ttl=60, max_size=2)
+    calls = 0
+    
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "quote"
+    
+    async def run():
+        return await asyncio.gather(*(cache.get_or_fetch("AAPL", fetch) for _ in range(10)))
+    
+    entries = asyncio.run(run())
+    
+    assert calls == 1
+    assert all(entry.value == "quote" for entry in entries)
+    assert cache.misses == 1
+    assert cache.coalesced == 9
+    
+    # Least recently used symbols are evicted once the cache is full
+    cache.set("MSFT", "quote")
+    cache.set("GOOG", "quote")
+    assert cache.get("AAPL") is None
+    assert cache.evictions == 1
+
+
+def test_get_stock_quotes_batch(client):
+    """Test batch quotes dedupe symbols and report per-symbol errors inline."""
+    client.post(
+        "/auth/signup",
+        json={"email": "batch@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "batch@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    def fake_quote(url, params):
+        mock_response = Mock()
+        mock_response.raise_for_status = Mock()
+        if params["symbol"] == "FAKE":
+            mock_response.json.return_value = {"o": 0, "c": 0, "h": 0, "l": 0, "pc": 0}
+        else:
+            mock_response.json.return_value = {"o": 150.25, "c": 152.50, "h": 153.00, "l": 149.50, "pc": 150.00}
+        return mock_response
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = fake_quote
+        
+        response = client.get(
+            "/stocks/quotes?symbols=AAPL,MSFT,AAPL,FAKE",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        
+        assert response.status_code == 200
+        quotes = response.json()["quotes"]
+        assert [item["symbol"] for item in quotes] == ["AAPL", "MSFT", "FAKE"]
+        assert quotes[0]["quote"]["current_price"] == 152.50
+        assert quotes[2]["status_code"] == 404
+        assert "No data found" in quotes[2]["error"]
+        assert mock_get.await_count == 3
+
+
+def test_get_stock_quotes_batch_invalid_symbol(client):
+    """Test batch quotes reject malformed symbols."""
+    client.post(
+        "/auth/signup",
+        json={"email": "batchinvalid@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "batchinvalid@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    response = client.get(
+        "/stocks/quotes?symbols=AAPL,toolong",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 422
+    assert "toolong" in response.json()["detail"]
+
+
+def test_websocket_stream_pushes_quotes(client):
+    """Test WebSocket subscribers receive quotes from a shared per-symbol poller."""
+    client.post(
+        "/auth/signup",
+        json={"email": "stream@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "stream@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_response = Mock()
+        mock_response.json.return_value = {"o": 150.25, "c": 152.50, "h": 153.00, "l": 149.50, "pc": 150.00}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+        
+        with client.websocket_connect(f"/stocks/ws?token={token}&symbols=AAPL") as first, \
+                client.websocket_connect(f"/stocks/ws?token={token}&symbols=AAPL") as second:
+            for websocket in (first, second):
+                message = websocket.receive_json()
+                assert message["type"] == "quote"
+                assert message["data"]["symbol"] == "AAPL"
+                assert message["data"]["current_price"] == 152.50
+            
+            streams = client.get("/health/streams").json()["streams"]
+            assert streams["symbols"] == 1
+            assert streams["subscriptions"] == 2
+            
+            first.send_json({"action": "subscribe", "symbols": ["bad!"]})
+            assert first.receive_json()["status_code"] == 422
+        
+        assert mock_get.await_count == 1
+
+
+def test_websocket_stream_requires_valid_token(client):
+    """Test WebSocket connections are rejected without a valid token."""
+    from starlette.websockets import WebSocketDisconnect
+    
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/stocks/ws?token=invalid&symbols=AAPL") as websocket:
+            websocket.receive_json()
+
+
+def test_websocket_stream_reports_malformed_commands(client):
+    """Test malformed commands get an error message and keep the stream open."""
+    client.post(
+        "/auth/signup",
+        json={"email": "malformed@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "malformed@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    with client.websocket_connect(f"/stocks/ws?token={token}") as websocket:
+        websocket.send_text("not json")
+        assert websocket.receive_json() == {"type": "error", "status_code": 400, "detail": "Commands must be JSON"}
+        
+        websocket.send_bytes(b"\xff")
+        assert websocket.receive_json()["status_code"] == 400
+        
+        websocket.send_json({"action": "watch"})
+        assert websocket.receive_json()["status_code"] == 422
+        
+        # A bare string would otherwise be split into one-letter symbols
+        websocket.send_json({"action": "subscribe", "symbols": "AAPL"})
+        assert websocket.receive_json() == {
+            "type": "error", "status_code": 422, "detail": "Symbols must be a list of strings"
+        }
+        websocket.send_json({"action": "subscribe", "symbols": [1]})
+        assert websocket.receive_json()["detail"] == "Symbols must be a list of strings"
+        
+        # The stream is still open after every rejected command
+        websocket.send_json({"action": "unsubscribe", "symbols": ["AAPL"]})
+        websocket.send_text("not json")
+        assert websocket.receive_json()["status_code"] == 400
+
+
+def test_stream_subscription_coalesces_slow_consumers():
+    """Test a slow consumer only keeps the latest pending update per symbol."""
+    import asyncio
+    from app.services.streaming import Subscription
+    
+    async def run():
+        subscription = Subscription(max_pending=2)
+        subscription.push("AAPL", {"price": 1})
+        subscription.push("AAPL", {"price": 2})
+        subscription.push("MSFT", {"price": 3})
+        subscription.push("GOOG", {"price": 4})
+        return subscription, await subscription.next_batch()
+    
+    subscription, messages = asyncio.run(run())
+    
+    assert messages == [{"price": 3}, {"price": 4}]
+    assert subscription.dropped == 2
+
+
+def test_get_stock_quote_upstream_rate_limited(client):
+    """Test a 429 from upstream is surfaced as 503 with Retry-After."""
+    client.post(
+        "/auth/signup",
+        json={"email": "ratelimited@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "ratelimited@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_response = Mock()
+        mock_response.status_code = 429
+        mock_response.headers = {"Retry-After": "30"}
+        mock_get.return_value = mock_response
+        
+        response = client.get(
+            "/stocks/quote/AAPL",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "30"
+
+
+def test_upstream_rate_limiter_paces_and_sheds():
+    """Test the outbound limiter allows a burst, delays, then sheds past the wait budget."""
+    import asyncio
+    from app.core.rate_limiter import UpstreamRateLimiter, UpstreamRateLimited
+    
+    limiter = UpstreamRateLimiter(rate=20, burst=2, max_wait=0.06, max_queue=10)
+    
+    async def run():
+        await limiter.acquire()
+        await limiter.acquire()
+        assert limiter.delayed == 0
+        
+        # Next caller waits one emission interval (50ms); later ones would
+        # need 100ms+ which is beyond the 60ms budget, so they are shed
+        results = await asyncio.gather(*(limiter.acquire() for _ in range(3)), return_exceptions=True)
+        assert results[0] is None
+        assert all(isinstance(result, UpstreamRateLimited) for result in results[1:])
+        assert limiter.delayed == 1
+        
+        # Retry-After from upstream blocks every caller
+        await limiter.penalize("10")
+        with pytest.raises(UpstreamRateLimited) as error:
+            await limiter.acquire()
+        return error.value
+    
+    error = asyncio.run(run())
+    assert error.retry_after > 9
+    assert limiter.shed == 3
+    assert limiter.throttled == 1
+
+
+def test_get_stock_quote_serves_stale_when_upstream_fails(client):
+    """Test the last known quote is served, marked stale, when upstream errors."""
+    from httpx import ConnectError
+    from app.core.quote_cache import quote_cache
+    from app.schemas.stock import StockQuoteResponse
+    
+    client.post(
+        "/auth/signup",
+        json={"email": "stale@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "stale@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    # An expired but still recent quote is known
+    entry = quote_cache.set("AAPL", StockQuoteResponse(
+        symbol="AAPL", opening_price=150.25, current_price=152.50,
+        high_price=153.00, low_price=149.50, previous_close=150.00
+    ))
+    entry.fetched_at -= quote_cache.ttl + 1
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = ConnectError("Upstream down")
+        
+        response = client.get(
+            "/stocks/quote/AAPL",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["current_price"] == 152.50
+        assert response.headers["X-Quote-Stale"] == "true"
+        assert response.headers["Cache-Control"] == "private, max-age=0"
+
+
+def test_circuit_breaker_opens_and_fails_fast(client):
+    """Test repeated upstream failures open the circuit so later calls skip upstream."""
+    from httpx import ConnectError
+    from app.core.circuit_breaker import upstream_circuit_breaker
+    
+    client.post(
+        "/auth/signup",
+        json={"email": "breaker@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "breaker@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = ConnectError("Upstream down")
+        
+        for _ in range(upstream_circuit_breaker.min_calls):
+            client.get("/stocks/quote/AAPL", headers={"Authorization": f"Bearer {token}"})
+        assert upstream_circuit_breaker.state == "open"
+        
+        calls_before = mock_get.await_count
+        response = client.get("/stocks/quote/AAPL", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 503
+        assert "temporarily unavailable" in response.json()["detail"]
+        assert "Retry-After" in response.headers
+        assert mock_get.await_count == calls_before
+    
+    breaker = client.get("/health/upstream").json()["circuit_breaker"]
+    assert breaker["state"] == "open"
+    assert breaker["rejected"] == 1
+
+
+def test_circuit_breaker_half_open_recovery():
+    """Test the circuit lets a trial call through after the open period and closes on success."""
+    import time
+    from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+    
+    breaker = CircuitBreaker(window_size=4, min_calls=2, failure_rate=0.5, open_seconds=0.05)
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_quote_cache_timeout_keeps_revalidating():
+    """Test a fetch past the latency budget keeps running and refreshes the cache."""
+    import asyncio
+    from app.core.quote_cache import QuoteCache
+    
+    cache = QuoteCache(ttl=60, max_size=10)
+    
+    async def slow_fetch():
+        await asyncio.sleep(0.05)
+        return "fresh"
+    
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await cache.get_or_fetch("AAPL", slow_fetch, timeout=0.01)
+        await asyncio.sleep(0.06)
+        return cache.get("AAPL")
+    
+    assert asyncio.run(run()).value == "fresh"
+
+
+def test_get_stock_candles_fetches_only_missing_ranges(client):
+    """Test candles are stored locally and only uncovered ranges hit upstream."""
+    client.post(
+        "/auth/signup",
+        json={"email": "candles@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "candles@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    day = 86400
+    base = 1_600_000_000 - 1_600_000_000 % day
+    
+    def fake_candles(url, params):
+        timestamps = [ts for ts in range(base, base + 30 * day, day) if params["from"] <= ts <= params["to"]]
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = Mock()
+        mock_response.json.return_value = {
+            "s": "ok" if timestamps else "no_data",
+            "t": timestamps,
+            "o": [100.0] * len(timestamps),
+            "h": [110.0] * len(timestamps),
+            "l": [90.0] * len(timestamps),
+            "c": [105.0] * len(timestamps),
+            "v": [1000.0] * len(timestamps),
+        }
+        return mock_response
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = fake_candles
+        
+        response = client.get(f"/stocks/candles/AAPL?resolution=D&from={base}&to={base + 9 * day}", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["timestamps"]) == 10
+        assert data["close"][0] == 105.0
+        assert mock_get.await_count == 1
+        
+        # A sub-range is served entirely from the local store
+        response = client.get(f"/stocks/candles/AAPL?resolution=D&from={base + day}&to={base + 5 * day}", headers=headers)
+        assert len(response.json()["timestamps"]) == 5
+        assert mock_get.await_count == 1
+        
+        # Extending the range only fetches the new part
+        response = client.get(f"/stocks/candles/AAPL?resolution=D&from={base}&to={base + 19 * day}", headers=headers)
+        assert len(response.json()["timestamps"]) == 20
+        assert mock_get.await_count == 2
+        assert mock_get.await_args.kwargs["params"]["from"] == base + 9 * day + 1
+    
+    response = client.get(f"/stocks/candles/AAPL?resolution=X&from={base}&to={base + day}", headers=headers)
+    assert response.status_code == 422
+
+
+def test_candle_fills_tolerate_concurrent_workers(setup_database):
+    """Test fill locks are dropped once unused and bars another worker stored first are kept."""
+    import asyncio
+    from sqlalchemy.orm import Query
+    from app.models.candle import Candle
+    from app.services import candles
+    from app.tests.conftest import TestingSessionLocal
+    
+    async def hold_twice():
+        async with candles._fill_locks.hold(("AAPL", "D")):
+            async with candles._fill_locks.hold(("MSFT", "D")):
+                held = len(candles._fill_locks)
+        return held
+    
+    assert asyncio.run(hold_twice()) == 2
+    assert len(candles._fill_locks) == 0
+    
+    day = 86400
+    base = 1_600_000_000 - 1_600_000_000 % day
+    data = {
+        "s": "ok",
+        "t": [base, base + day, base + 2 * day],
+        "o": [100.0] * 3, "h": [110.0] * 3, "l": [90.0] * 3, "c": [105.0] * 3, "v": [1000.0] * 3,
+    }
+    # Another worker commits the same bar after our delete, before our insert
+    other = TestingSessionLocal()
+    other.add(Candle(symbol="RACE", resolution="D", ts=base + day, open=1, high=1, low=1, close=1, volume=1))
+    other.commit()
+    other.close()
+    query_delete = Query.delete
+    
+    def delete_before_race(self, *args, **kwargs):
+        if self.session.info.get("raced"):
+            return query_delete(self, *args, **kwargs)
+        self.session.info["raced"] = True
+        return 0
+    
+    db = TestingSessionLocal()
+    try:
+        with patch.object(Query, "delete", delete_before_race):
+            candles._store_range(db, "RACE", "D", base, base + 2 * day, base + 2 * day, data)
+        stored = candles._read_range(db, "RACE", "D", base, base + 2 * day)
+    finally:
+        db.close()
+    
+    assert stored.timestamps == [base, base + day, base + 2 * day]
+    assert stored.close == [105.0, 1.0, 105.0]
+
+
+def _naive_ema(values, alpha):
+    result = [values[0]]
+    for value in values[1:]:
+        result.append(alpha * value + (1 - alpha) * result[-1])
+    return result
+
+
+def test_indicators_match_naive_and_incremental():
+    """Test vectorized indicators match a plain loop, whether computed at once or bar by bar."""
+    import numpy as np
+    from app.services.indicators import INDICATORS, IndicatorSeries, ema
+    
+    rng = np.random.default_rng(7)
+    count = 3000
+    close = 100 + np.cumsum(rng.normal(0, 1, count))
+    high = close + rng.uniform(0, 1, count)
+    low = close - rng.uniform(0, 1, count)
+    volume = rng.uniform(1000, 5000, count)
+    timestamps = np.arange(count) * 60
+    
+    assert np.allclose(ema(close, 0.01), _naive_ema(close.tolist(), 0.01))
+    
+    full = IndicatorSeries(max_bars=count)
+    full.append(timestamps, close, high, low, volume)
+    
+    expected_sma = [np.nan] * 19 + [sum(close[i - 19:i + 1]) / 20 for i in range(19, count)]
+    assert np.allclose(full.values("sma"), expected_sma, equal_nan=True)
+    expected_ema = _naive_ema(close.tolist(), 2 / 21)
+    assert np.allclose(full.values("ema")[19:], expected_ema[19:])
+    assert np.isnan(full.values("rsi")[:14]).all()
+    assert ((full.values("rsi")[14:] >= 0) & (full.values("rsi")[14:] <= 100)).all()
+    
+    incremental = IndicatorSeries(max_bars=count)
+    for start in range(0, count, 250):
+        incremental.append(timestamps[:start + 250], close[:start + 250], high[:start + 250],
+                           low[:start + 250], volume[:start + 250])
+    for start in range(count - 5, count):
+        assert incremental.append(timestamps[:start + 1], close[:start + 1], high[:start + 1],
+                                  low[:start + 1], volume[:start + 1]) == 0
+    for name in INDICATORS:
+        assert np.allclose(incremental.values(name), full.values(name), equal_nan=True), name
+
+
+def test_get_stock_indicators(client):
+    """Test the indicators endpoint returns aligned series and only loads new bars on repeat."""
+    client.post(
+        "/auth/signup",
+        json={"email": "indicators@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "indicators@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    day = 86400
+    base = 1_600_000_000 - 1_600_000_000 % day
+    
+    def fake_candles(url, params):
+        timestamps = [ts for ts in range(base - 400 * day, base + 60 * day, day) if params["from"] <= ts <= params["to"]]
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = Mock()
+        mock_response.json.return_value = {
+            "s": "ok" if timestamps else "no_data",
+            "t": timestamps,
+            "o": [100.0 + ts % 7 for ts in timestamps],
+            "h": [110.0 + ts % 7 for ts in timestamps],
+            "l": [90.0 + ts % 7 for ts in timestamps],
+            "c": [100.0 + (ts // day) % 7 for ts in timestamps],
+            "v": [1000.0] * len(timestamps),
+        }
+        return mock_response
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = fake_candles
+        
+        response = client.get(f"/stocks/indicators/AAPL?resolution=D&from={base}&to={base + 29 * day}", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["timestamps"]) == 30
+        for name in ("sma", "ema", "rsi", "macd", "macd_signal", "bollinger_upper", "vwap"):
+            assert len(data[name]) == 30
+            assert None not in data[name]
+        assert data["bollinger_lower"][0] < data["bollinger_middle"][0] < data["bollinger_upper"][0]
+        assert mock_get.await_count == 1
+        
+        response = client.get(
+            f"/stocks/indicators/AAPL?resolution=D&from={base}&to={base + 59 * day}&limit=5", headers=headers
+        )
+        assert len(response.json()["timestamps"]) == 5
+        assert response.json()["timestamps"][-1] == base + 59 * day
+        assert mock_get.await_count == 2
+        assert mock_get.await_args.kwargs["params"]["from"] == base + 29 * day + 1
+    
+    response = client.get(f"/stocks/indicators/AAPL?resolution=X&from={base}&to={base + day}", headers=headers)
+    assert response.status_code == 422
+
+
+def test_concurrent_indicator_requests_share_a_series():
+    """Test overlapping requests for one series each get their full range of bars."""
+    import asyncio
+    import time
+    from app.schemas.stock import CandlesResponse
+    from app.services import indicators
+    
+    day = 86400
+    base = int(time.time()) // day * day - 10 * day
+    
+    async def fake_candles(symbol, resolution, start, end, upstream, db):
+        # The wide load is still in flight when the narrow request arrives
+        await asyncio.sleep(0.05 if end - start > 1000 * day else 0.01)
+        timestamps = [ts for ts in range(base - 5000 * day, base + day, day) if start <= ts <= end]
+        prices = [100.0 + (ts // day) % 7 for ts in timestamps]
+        return CandlesResponse(symbol=symbol, resolution=resolution, timestamps=timestamps, open=prices,
+                               high=prices, low=prices, close=prices, volume=[1000.0] * len(timestamps))
+    
+    async def run():
+        return await asyncio.gather(
+            indicators.get_indicators("AAPL", "D", base - 2999 * day, base, 5000, None, None),
+            indicators.get_indicators("AAPL", "D", base - 99 * day, base, 5000, None, None),
+        )
+    
+    with patch.object(indicators, "get_candles", side_effect=fake_candles) as mock_candles:
+        wide, narrow = asyncio.run(run())
+    
+    assert len(wide.timestamps) == 3000
+    assert len(narrow.timestamps) == 100
+    assert narrow.timestamps == wide.timestamps[-100:]
+    # The narrow request found the series already loaded
+    assert mock_candles.call_count == 1
+    assert len(indicators._series_locks) == 0
+
+
+def test_watchlists_crud_and_shared_quotes(client):
+    """Test watchlist CRUD and that a symbol watched by many users is fetched once."""
+    tokens = []
+    for email in ("watcher1@example.com", "watcher2@example.com"):
+        client.post("/auth/signup", json={"email": email, "password": "testpassword123"})
+        login_response = client.post("/auth/login", json={"email": email, "password": "testpassword123"})
+        tokens.append(login_response.json()["access_token"])
+    headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+    
+    response = client.post("/watchlists", json={"name": "Tech", "symbols": ["aapl", "MSFT", "AAPL"]}, headers=headers[0])
+    assert response.status_code == 201
+    first = response.json()
+    assert first["symbols"] == ["AAPL", "MSFT"]
+    
+    response = client.post(f"/watchlists/{first['id']}/symbols", json={"symbol": "GOOGL"}, headers=headers[0])
+    assert response.json()["symbols"] == ["AAPL", "MSFT", "GOOGL"]
+    response = client.delete(f"/watchlists/{first['id']}/symbols/MSFT", headers=headers[0])
+    assert response.json()["symbols"] == ["AAPL", "GOOGL"]
+    response = client.patch(f"/watchlists/{first['id']}", json={"name": "Mega caps"}, headers=headers[0])
+    assert response.json()["name"] == "Mega caps"
+    assert response.json()["symbols"] == ["AAPL", "GOOGL"]
+    
+    # Reordering alone reuses every row but still moves them
+    response = client.patch(f"/watchlists/{first['id']}", json={"symbols": ["GOOGL", "AAPL"]}, headers=headers[0])
+    assert response.json()["symbols"] == ["GOOGL", "AAPL"]
+    response = client.post(f"/watchlists/{first['id']}/symbols", json={"symbol": "NVDA"}, headers=headers[0])
+    assert response.json()["symbols"] == ["GOOGL", "AAPL", "NVDA"]
+    assert client.get(f"/watchlists/{first['id']}", headers=headers[0]).json()["symbols"] == ["GOOGL", "AAPL", "NVDA"]
+    
+    response = client.post("/watchlists", json={"name": "Mine", "symbols": ["AAPL"]}, headers=headers[1])
+    second = response.json()
+    
+    # Other users' watchlists are not visible
+    assert client.get(f"/watchlists/{first['id']}", headers=headers[1]).status_code == 404
+    assert client.get(f"/watchlists/{first['id']}/quotes", headers=headers[1]).status_code == 404
+    assert [watchlist["id"] for watchlist in client.get("/watchlists", headers=headers[1]).json()] == [second["id"]]
+    
+    assert client.post("/watchlists", json={"name": "Bad", "symbols": ["TOOLONG"]}, headers=headers[0]).status_code == 422
+    
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.raise_for_status = Mock()
+    mock_response.json.return_value = {"c": 150.0, "h": 152.0, "l": 148.0, "o": 149.0, "pc": 147.0, "t": 1234567890}
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+        
+        response = client.get(f"/watchlists/{first['id']}/quotes", headers=headers[0])
+        assert response.status_code == 200
+        assert [item["symbol"] for item in response.json()["quotes"]] == ["GOOGL", "AAPL", "NVDA"]
+        assert response.json()["quotes"][0]["quote"]["current_price"] == 150.0
+        
+        response = client.get(f"/watchlists/{second['id']}/quotes", headers=headers[1])
+        assert [item["symbol"] for item in response.json()["quotes"]] == ["AAPL"]
+        
+        # AAPL was fetched once for both users
+        assert mock_get.await_count == 3
+    
+    assert client.delete(f"/watchlists/{first['id']}", headers=headers[0]).status_code == 204
+    assert client.get(f"/watchlists/{first['id']}", headers=headers[0]).status_code == 404
+
+
+def test_ingestion_prewarms_hot_symbols():
+    """Test the ingestion scheduler refreshes the most requested symbols into the cache."""
+    import asyncio
+    from datetime import datetime, timezone
+    from app.core.hot_symbols import HotSymbols
+    from app.core.quote_cache import QuoteCache
+    from app.services.ingestion import QuoteIngestionScheduler, is_market_open
+    from app.services.providers import quote_provider
+    
+    # Saturday, then a Monday at 10:00 New York time
+    assert not is_market_open(datetime(2024, 1, 6, 16, 0, tzinfo=timezone.utc))
+    assert is_market_open(datetime(2024, 1, 8, 15, 0, tzinfo=timezone.utc))
+    
+    hot = HotSymbols(half_life=300, max_tracked=100)
+    for symbol in ["AAPL"] * 5 + ["MSFT"] * 3 + ["TSLA"]:
+        hot.record(symbol)
+    assert hot.top(2) == ["AAPL", "MSFT"]
+    
+    cache = QuoteCache(ttl=60, max_size=10)
+    scheduler = QuoteIngestionScheduler(hot, cache, quote_provider, hot_set_size=2, market_interval=60,
+                                        closed_interval=60, budget_share=0)
+    
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.raise_for_status = Mock()
+    mock_response.json.return_value = {"c": 150.0, "h": 152.0, "l": 148.0, "o": 149.0, "pc": 147.0, "t": 1234567890}
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+        
+        asyncio.run(scheduler.run_once())
+        assert mock_get.await_count == 2
+        assert cache.get("AAPL").value.current_price == 150.0
+        assert cache.get("MSFT") is not None
+        assert cache.get("TSLA") is None
+        
+        # Nothing is due again until the interval has passed
+        asyncio.run(scheduler.run_once())
+        assert mock_get.await_count == 2
+    
+    stats = scheduler.stats()
+    assert stats["refreshed"] == 2
+    assert stats["hot_symbols"] == ["AAPL", "MSFT"]
+    assert stats["lag_seconds"] == 0.0
+    assert stats["refresh_lag"]["count"] == 2
+
+
+def test_ingestion_keeps_hot_set_fresh_with_default_settings():
+    """Test the default budget only takes on symbols it can refresh before their cached quotes expire."""
+    import asyncio
+    import time
+    from app.core.config import settings
+    from app.core.hot_symbols import HotSymbols
+    from app.core.quote_cache import QuoteCache
+    from app.services.ingestion import QuoteIngestionScheduler
+    from app.services.providers import quote_provider
+    
+    hot = HotSymbols(half_life=300, max_tracked=100)
+    for rank in range(settings.INGESTION_HOT_SET_SIZE):
+        for _ in range(settings.INGESTION_HOT_SET_SIZE - rank):
+            hot.record(f"S{rank:02d}")
+    cache = QuoteCache(ttl=settings.QUOTE_CACHE_TTL_SECONDS, max_size=settings.QUOTE_CACHE_MAX_SIZE)
+    scheduler = QuoteIngestionScheduler(hot, cache, quote_provider, watched=lambda: ["ALRT"])
+    
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.raise_for_status = Mock()
+    mock_response.json.return_value = {"c": 150.0, "h": 152.0, "l": 148.0, "o": 149.0, "pc": 147.0, "t": 1234567890}
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get, \
+            patch("app.services.ingestion.is_market_open", return_value=True):
+        mock_get.return_value = mock_response
+        asyncio.run(scheduler.run_once())
+        interval = scheduler.interval(len(scheduler.hot_set()))
+    
+    capacity = scheduler.capacity()
+    assert capacity < settings.INGESTION_HOT_SET_SIZE
+    # Alerted symbols are polled first; the most requested fill the rest of the budget
+    assert scheduler.hot_set() == hot.top(capacity - 1) + ["ALRT"]
+    assert interval * (1 + scheduler.jitter) <= cache.ttl
+    assert all(due - time.monotonic() < cache.ttl for due in scheduler._next_due.values())
+
+
+def test_alert_index_only_touches_crossed_alerts():
+    """Test the alert index fires exactly the alerts a price reaches."""
+    from app.services.alerts import AlertIndex, AlertRef
+    
+    index = AlertIndex()
+    index.load([
+        AlertRef(1, 10, "AAPL", "above", 200.0),
+        AlertRef(2, 10, "AAPL", "above", 180.0),
+        AlertRef(3, 11, "AAPL", "below", 150.0),
+        AlertRef(4, 11, "AAPL", "below", 120.0),
+    ])
+    index.add(AlertRef(5, 12, "MSFT", "above", 300.0))
+    index.add(AlertRef(6, 12, "AAPL", "above", 190.0))
+    
+    assert index.match("AAPL", 170.0) == []
+    assert sorted(alert.id for alert in index.match("AAPL", 190.0)) == [2, 6]
+    assert index.remove(4).threshold == 120.0
+    assert [alert.id for alert in index.match("AAPL", 100.0)] == [3]
+    assert 1 in index and 2 not in index
+    assert index.symbols() == ["AAPL", "MSFT"]
+    
+    assert [alert.id for alert in index.match("AAPL", 250.0)] == [1]
+    assert index.symbols() == ["MSFT"]
+    assert len(index) == 1
+
+
+def test_price_alerts_fire_on_quotes(client):
+    """Test alerts fire once when a quote crosses them and are pushed to the user's stream."""
+    import time
+    
+    client.post(
+        "/auth/signup",
+        json={"email": "alerts@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "alerts@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    crossed = client.post("/alerts", json={"symbol": "AAPL", "direction": "above", "threshold": 150.0}, headers=headers)
+    assert crossed.status_code == 201
+    pending = client.post("/alerts", json={"symbol": "AAPL", "direction": "below", "threshold": 100.0}, headers=headers)
+    moved = client.post("/alerts", json={"symbol": "AAPL", "direction": "above", "threshold": 300.0}, headers=headers)
+    response = client.patch(f"/alerts/{moved.json()['id']}", json={"threshold": 151.0}, headers=headers)
+    assert response.json()["threshold"] == 151.0
+    deleted = client.post("/alerts", json={"symbol": "AAPL", "direction": "above", "threshold": 120.0}, headers=headers)
+    assert client.delete(f"/alerts/{deleted.json()['id']}", headers=headers).status_code == 204
+    assert client.post("/alerts", json={"symbol": "AAPL", "direction": "sideways", "threshold": 1.0}, headers=headers).status_code == 422
+    
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.raise_for_status = Mock()
+    mock_response.json.return_value = {"c": 152.5, "h": 153.0, "l": 149.5, "o": 150.25, "pc": 150.0, "t": 1234567890}
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+        
+        with client.websocket_connect(f"/stocks/ws?token={token}") as websocket:
+            assert client.get("/stocks/quote/AAPL", headers=headers).status_code == 200
+            
+            fired = sorted([websocket.receive_json(), websocket.receive_json()], key=lambda message: message["data"]["id"])
+            assert [message["type"] for message in fired] == ["alert", "alert"]
+            assert [message["data"]["id"] for message in fired] == [crossed.json()["id"], moved.json()["id"]]
+            assert fired[0]["data"]["price"] == 152.5
+    
+    # Triggered alerts are written in the background
+    for _ in range(50):
+        triggered = client.get("/alerts?active=false", headers=headers).json()
+        if len(triggered) == 2:
+            break
+        time.sleep(0.05)
+    assert sorted(alert["id"] for alert in triggered) == [crossed.json()["id"], moved.json()["id"]]
+    assert triggered[0]["triggered_price"] == 152.5
+    assert [alert["id"] for alert in client.get("/alerts?active=true", headers=headers).json()] == [pending.json()["id"]]
+    assert client.patch(f"/alerts/{crossed.json()['id']}", json={"threshold": 1.0}, headers=headers).status_code == 409
+
+
+def test_prometheus_metrics(client):
+    """Test /metrics exposes per-route latency, stage timers and upstream errors."""
+    client.post(
+        "/auth/signup",
+        json={"email": "metrics@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "metrics@example.com", "password": "testpassword123"}
+    )
+    token = login_response.json()["access_token"]
+    
+    quote_errors = 'http_request_duration_seconds_count{method="GET",route="/stocks/quote/{symbol}",status="503"}'
+    
+    def sample(body, name):
+        for line in body.splitlines():
+            if line.startswith(name + " "):
+                return float(line.split()[-1])
+        return 0.0
+    
+    before = client.get("/metrics").text
+    with patch.object(upstream_client.client, "get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = httpx.ConnectError("connection refused")
+        response = client.get("/stocks/quote/AAPL", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 503
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    
+    assert sample(body, quote_errors) == sample(before, quote_errors) + 1
+    assert sample(body, 'upstream_errors_total{reason="transport"}') == sample(before, 'upstream_errors_total{reason="transport"}') + 1
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/auth/login",status="200",le="+Inf"}' in body
+    assert 'stage_duration_seconds_count{stage="auth"}' in body
+    assert 'stage_duration_seconds_count{stage="upstream"}' in body
+    assert 'stage_duration_seconds_count{stage="password-hash"}' in body
+    assert "http_requests_in_flight 1" in body
+    assert "upstream_requests_in_flight 0" in body
+    
+    # Breaker and cache counters are exported too, not only in the health JSON
+    assert sample(body, 'quote_cache_lookups_total{result="miss"}') == sample(before, 'quote_cache_lookups_total{result="miss"}') + 1
+    assert sample(body, 'jwt_cache_lookups_total{result="hit"}') > sample(before, 'jwt_cache_lookups_total{result="hit"}')
+    assert "upstream_circuit_state 0" in body
+    assert "upstream_circuit_opened_total 0" in body
+    assert "# TYPE upstream_circuit_rejected_calls_total counter" in body
+
+
+def test_request_profiling_is_admin_gated(client):
+    """Test runtime profiling can be enabled by an admin and captures folded stacks."""
+    import os
+    from app.core.config import settings
+    
+    assert client.get("/admin/profiling").status_code == 404
+    
+    with patch.object(settings, "ADMIN_API_KEY", "admin-key"):
+        admin = {"X-Admin-Key": "admin-key"}
+        assert client.get("/admin/profiling", headers={"X-Admin-Key": "wrong"}).status_code == 404
+        
+        # Disabled by default: the header alone does not profile
+        assert "X-Profile-Id" not in client.get("/health", headers={"X-Profile": "admin-key"}).headers
+        
+        response = client.put("/admin/profiling", json={"enabled": True, "sample_rate": 0.0}, headers=admin)
+        assert response.json()["enabled"] is True
+        assert response.json()["worker_pid"] == os.getpid()
+        
+        assert "X-Profile-Id" not in client.get("/health").headers
+        assert "X-Profile-Id" not in client.get("/health", headers={"X-Profile": "wrong"}).headers
+        response = client.get("/health", headers={"X-Profile": "admin-key"})
+        assert response.status_code == 200
+        profile_id = response.headers["X-Profile-Id"]
+        
+        profiles = client.get("/admin/profiling", headers=admin).json()["profiles"]
+        assert [profile["id"] for profile in profiles] == [int(profile_id)]
+        assert profiles[0]["path"] == "/health"
+        
+        response = client.get(f"/admin/profiling/{profile_id}", headers=admin)
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+        for line in response.text.splitlines():
+            stack, samples = line.rsplit(" ", 1)
+            assert int(samples) > 0
+        
+        client.put("/admin/profiling", json={"enabled": False}, headers=admin)
+        assert client.delete("/admin/profiling", headers=admin).status_code == 204
+        assert client.get("/admin/profiling", headers=admin).json()["profiles"] == []
+
+
+def test_quote_response_encoded_once_and_negotiated(client):
+    """Test cached quotes reuse their encoded body and Accept picks JSON or MessagePack."""
+    from app.core import responses
+    from app.core.quote_cache import quote_cache
+    
+    client.post(
+        "/auth/signup",
+        json={"email": "encoding@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "encoding@example.com", "password": "testpassword123"}
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_response = Mock()
+        mock_response.json.return_value = {"o": 150.25, "c": 152.5, "h": 153, "l": 149.5, "pc": 150}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+        
+        first = client.get("/stocks/quote/AAPL", headers=headers)
+        assert first.status_code == 200
+        assert first.headers["content-type"] == "application/json"
+        assert first.headers["vary"] == "Accept"
+        assert first.json() == {
+            "symbol": "AAPL",
+            "opening_price": 150.25,
+            "current_price": 152.5,
+            "high_price": 153.0,
+            "low_price": 149.5,
+            "previous_close": 150.0
+        }
+        
+        entry = quote_cache.peek("AAPL")
+        assert list(entry.rendered) == ["application/json"]
+        with patch.object(responses, "encode", side_effect=AssertionError("re-encoded")):
+            second = client.get("/stocks/quote/AAPL", headers=headers)
+        assert second.content == first.content
+        
+        binary = client.get("/stocks/quote/AAPL", headers={**headers, "Accept": "application/msgpack"})
+        batch = client.get(
+            "/stocks/quotes?symbols=AAPL", headers={**headers, "Accept": "application/msgpack, */*;q=0.5"}
+        )
+    
+    assert batch.status_code == 200
+    if responses.msgpack_available():
+        assert binary.headers["content-type"] == "application/msgpack"
+        assert responses.msgpack.unpackb(binary.content) == first.json()
+        assert responses.msgpack.unpackb(batch.content)["quotes"][0]["quote"] == first.json()
+    else:
+        # Without the optional msgpack package every client gets JSON
+        assert binary.json() == first.json()
+        assert batch.json()["quotes"][0]["quote"] == first.json()
+    
+    assert responses.negotiate(None) == "application/json"
+    assert responses.negotiate("application/json, application/msgpack;q=0.9") == "application/json"
+
+
+def test_quote_conditional_requests(client):
+    """Test quotes carry ETag/Last-Modified/Cache-Control and unchanged ones are answered with 304."""
+    import time
+    from app.core import responses
+    from app.core.quote_cache import quote_cache
+    
+    client.post(
+        "/auth/signup",
+        json={"email": "etag@example.com", "password": "testpassword123"}
+    )
+    login_response = client.post(
+        "/auth/login",
+        json={"email": "etag@example.com", "password": "testpassword123"}
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        mock_response = Mock()
+        mock_response.json.return_value = {"o": 150.25, "c": 152.5, "h": 153, "l": 149.5, "pc": 150}
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+        
+        first = client.get("/stocks/quote/AAPL", headers=headers)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')
+        assert first.headers["cache-control"] in ("private, max-age=4", "private, max-age=5")
+        assert "last-modified" in first.headers
+        
+        # An unchanged quote is neither re-encoded nor sent again, whatever its media type
+        with patch.object(responses, "encode", side_effect=AssertionError("re-encoded")):
+            revalidated = client.get("/stocks/quote/AAPL", headers={**headers, "If-None-Match": etag})
+            listed = client.get("/stocks/quote/AAPL", headers={**headers, "If-None-Match": f'"other", {etag}'})
+            binary = client.get(
+                "/stocks/quote/AAPL",
+                headers={**headers, "If-None-Match": etag.removeprefix("W/"), "Accept": "application/msgpack"}
+            )
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+        assert "cache-control" in revalidated.headers
+        assert listed.status_code == 304
+        assert binary.status_code == 304
+        
+        since = client.get(
+            "/stocks/quote/AAPL", headers={**headers, "If-Modified-Since": first.headers["last-modified"]}
+        )
+        assert since.status_code == 304
+        
+        # The cached quote keeps its Last-Modified however far the clock has moved on
+        wall_clock = time.time
+        with patch("time.time", lambda: wall_clock() + 1.5):
+            later = client.get("/stocks/quote/AAPL", headers=headers)
+        assert later.headers["last-modified"] == first.headers["last-modified"]
+        
+        # A new price is a new version
+        quote_cache.clear()
+        mock_response.json.return_value = {"o": 150.25, "c": 153.5, "h": 154, "l": 149.5, "pc": 150}
+        changed = client.get("/stocks/quote/AAPL", headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["current_price"] == 153.5
+        assert changed.headers["etag"] != etag
+
+
+def test_shared_state_coordinates_workers(tmp_path):
+    """Test worker processes share quotes, fetch each symbol once, and elect one ingestion leader."""
+    import asyncio
+    from app.core.hot_symbols import HotSymbols
+    from app.core.quote_cache import QuoteCache, SharedQuoteTier
+    from app.core.shared_state import SharedStateClient, SharedStateServer
+    from app.services.ingestion import QuoteIngestionScheduler
+    from app.services.providers import quote_provider
+    
+    path = str(tmp_path / "state.sock")
+    calls = []
+    
+    async def fetch():
+        calls.append("AAPL")
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise RuntimeError("upstream failed")
+        return {"current_price": 150.0}
+    
+    def worker_cache(socket_path):
+        # One cache and client per simulated worker process
+        tier = SharedQuoteTier(SharedStateClient(socket_path), encode=lambda value: value, decode=lambda value: value)
+        return QuoteCache(ttl=60, max_size=10, shared=tier)
+    
+    async def run():
+        server = asyncio.ensure_future(SharedStateServer().serve(path))
+        while not (tmp_path / "state.sock").exists():
+            await asyncio.sleep(0.01)
+        
+        workers = [worker_cache(path) for _ in range(3)]
+        results = await asyncio.gather(
+            *(cache.get_or_fetch("AAPL", fetch) for cache in workers for _ in range(5)),
+            return_exceptions=True
+        )
+        
+        # A fresh worker is served the published quote without fetching
+        late = worker_cache(path)
+        late_entry = await late.get_or_fetch("AAPL", fetch)
+        
+        # Without a reachable server, workers fall back to fetching themselves
+        isolated = worker_cache(str(tmp_path / "missing.sock"))
+        isolated_entry = await isolated.get_or_fetch("AAPL", fetch)
+        
+        schedulers = [
+            QuoteIngestionScheduler(HotSymbols(half_life=300, max_tracked=10), cache, quote_provider,
+                                    shared=cache.shared.client)
+            for cache in workers[:2]
+        ]
+        for scheduler in schedulers:
+            await scheduler.run_once()
+        
+        for cache in workers + [late]:
+            await cache.shared.client.close()
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+        return workers, results, late, late_entry, isolated, isolated_entry, schedulers
+    
+    workers, results, late, late_entry, isolated, isolated_entry, schedulers = asyncio.run(run())
+    
+    # The failed fetch released its claim and one other worker fetched for everyone
+    failed = [result for result in results if isinstance(result, Exception)]
+    assert len(failed) == 5
+    assert all(result.value == {"current_price": 150.0} for result in results if result not in failed)
+    assert len(calls) == 3
+    assert sum(cache.shared_hits for cache in workers) == 1
+    
+    assert late_entry.value == {"current_price": 150.0}
+    assert late.shared_hits == 1
+    # Every worker reports the fetch time of the one that fetched
+    assert {result.modified_at for result in results if result not in failed} == {late_entry.modified_at}
+    assert isolated_entry.value == {"current_price": 150.0}
+    assert isolated.stats()["shared_errors"] == 1
+    
+    assert [scheduler.leader for scheduler in schedulers] == [True, False]
+
+
+def test_price_alerts_shared_between_workers(tmp_path, setup_database):
+    """Test alert changes reach every worker, and a crossed alert fires once but reaches the owner's streams on all."""
+    import asyncio
+    from app.core.quote_cache import QuoteCache
+    from app.core.shared_state import SharedStateClient, SharedStateServer
+    from app.schemas.stock import StockQuoteResponse
+    from app.services.alerts import ABOVE, AlertEngine, AlertRef
+    from app.services.streaming import QuoteStreamHub, Subscription
+    from app.tests.conftest import TestingSessionLocal
+    
+    path = str(tmp_path / "state.sock")
+    
+    def quote(price):
+        return StockQuoteResponse(symbol="AAPL", opening_price=price, current_price=price, high_price=price,
+                                  low_price=price, previous_close=price)
+    
+    async def run():
+        server = asyncio.ensure_future(SharedStateServer().serve(path))
+        while not (tmp_path / "state.sock").exists():
+            await asyncio.sleep(0.01)
+        
+        workers = [
+            AlertEngine(QuoteCache(ttl=60, max_size=10), QuoteStreamHub(),
+                        session_factory=TestingSessionLocal, shared=SharedStateClient(path))
+            for _ in range(2)
+        ]
+        streams = []
+        for worker in workers:
+            await worker.start()
+            stream = Subscription(user_id=7)
+            worker.hub.subscribe(stream, [])
+            streams.append(stream)
+        first, second = workers
+        
+        # Changes made through one worker are applied by the other
+        await first.add(AlertRef(1, 7, "AAPL", ABOVE, 150.0))
+        await first.add(AlertRef(2, 7, "AAPL", ABOVE, 160.0))
+        await first.remove(2)
+        await asyncio.sleep(0.1)
+        indexed = [(1 in worker.index, 2 in worker.index) for worker in workers]
+        
+        # Both workers see a crossing quote; the alert fires once and reaches both workers' streams
+        first.cache.set("AAPL", quote(155.0))
+        second.cache.set("AAPL", quote(155.0))
+        messages = [await asyncio.wait_for(stream.next_batch(), 1.0) for stream in streams]
+        for worker in workers:
+            await worker.flush()
+        remaining = [len(worker.index) for worker in workers]
+        triggered = sum(worker.triggered for worker in workers)
+        
+        for worker in workers:
+            await worker.close()
+            await worker.shared.close()
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+        return indexed, messages, remaining, triggered
+    
+    indexed, messages, remaining, triggered = asyncio.run(run())
+    
+    assert indexed == [(True, False), (True, False)]
+    assert triggered == 1
+    assert remaining == [0, 0]
+    for batch in messages:
+        assert [message["data"]["id"] for message in batch] == [1]
+        assert batch[0]["data"]["price"] == 155.0
+
+
+def test_replay_provider_serves_recorded_ticks(client, tmp_path):
+    """Test quotes are replayed from a tick file at the configured speed, offline."""
+    import asyncio
+    import json
+    import time
+    from app.main import app
+    from app.services.providers import ReplayProvider, get_quote_provider
+    
+    ticks = tmp_path / "ticks.jsonl"
+    ticks.write_text("\n".join(json.dumps(tick) for tick in [
+        {"symbol": "AAPL", "t": 1020, "o": 149.0, "h": 153.0, "l": 148.0, "c": 152.0, "pc": 147.0},
+        {"symbol": "AAPL", "t": 1000, "o": 149.0, "h": 150.0, "l": 148.0, "c": 150.0, "pc": 147.0},
+        {"symbol": "MSFT", "t": 1005, "o": 399.0, "h": 401.0, "l": 398.0, "c": 400.0, "pc": 395.0},
+        {"symbol": "AAPL", "t": 1010, "o": 149.0, "h": 151.0, "l": 148.0, "c": 151.0, "pc": 147.0},
+    ]) + "\n")
+    
+    provider = ReplayProvider(str(ticks), speed=1.0, loop=True)
+    asyncio.run(provider.start())
+    assert provider.stats()["ticks"] == 4
+    
+    # 12 recorded seconds in: the tick at t=1010
+    provider._started_at = time.monotonic() - 12
+    assert asyncio.run(provider.fetch_quote("AAPL")).current_price == 151.0
+    # 25 seconds in wraps around the 20 second recording to t=1005
+    provider._started_at = time.monotonic() - 25
+    assert asyncio.run(provider.fetch_quote("AAPL")).current_price == 150.0
+    assert asyncio.run(provider.fetch_quote("MSFT")).current_price == 400.0
+    
+    client.post("/auth/signup", json={"email": "replay@example.com", "password": "testpassword123"})
+    token = client.post(
+        "/auth/login", json={"email": "replay@example.com", "password": "testpassword123"}
+    ).json()["access_token"]
+    
+    app.dependency_overrides[get_quote_provider] = lambda: provider
+    with patch.object(upstream_client, "get", new_callable=AsyncMock) as mock_get:
+        response = client.get("/stocks/quote/MSFT", headers={"Authorization": f"Bearer {token}"})
+        missing = client.get("/stocks/quote/TSLA", headers={"Authorization": f"Bearer {token}"})
+        assert mock_get.await_count == 0
+    del app.dependency_overrides[get_quote_provider]
+    
+    assert response.status_code == 200
+    assert response.json()["current_price"] == 400.0
+    assert missing.status_code == 404
+
+
+def test_failover_provider_prefers_fastest_healthy():
+    """Test the failover chain routes to the fastest provider and skips failed ones."""
+    import asyncio
+    from fastapi import HTTPException
+    from app.schemas.stock import StockQuoteResponse
+    from app.services.providers import FailoverProvider, QuoteProvider
+    
+    class FakeProvider(QuoteProvider):
+        def __init__(self, name, delay, price):
+            self.name, self.delay, self.price = name, delay, price
+            self.failing = False
+            self.symbols = {"AAPL"}
+            self.calls = 0
+        
+        async def fetch_quote(self, symbol):
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if self.failing:
+                raise HTTPException(status_code=503, detail="Unable to fetch stock data")
+            if symbol not in self.symbols:
+                raise HTTPException(status_code=404, detail=f"No data found for symbol: {symbol}")
+            return StockQuoteResponse(symbol=symbol, opening_price=1, current_price=self.price,
+                                      high_price=1, low_price=1, previous_close=1)
+    
+    slow, fast = FakeProvider("slow", 0.02, 1.0), FakeProvider("fast", 0.0, 2.0)
+    chain = FailoverProvider([slow, fast], cooldown=60)
+    
+    async def run():
+        # Both are measured once, then the faster one takes the traffic
+        prices = [(await chain.fetch_quote("AAPL")).current_price for _ in range(4)]
+        
+        fast.failing = True
+        failed_over = await chain.fetch_quote("AAPL")
+        # The failed provider sits out its cooldown
+        calls_before = fast.calls
+        after_failure = await chain.fetch_quote("AAPL")
+        skipped = fast.calls == calls_before
+        
+        # An unknown symbol falls through to the next provider without marking it unhealthy
+        slow.failing, fast.failing = False, False
+        chain._unhealthy_until.clear()
+        slow.symbols.add("MSFT")
+        msft = await chain.fetch_quote("MSFT")
+        
+        slow.failing = fast.failing = True
+        chain._unhealthy_until.clear()
+        try:
+            await chain.fetch_quote("AAPL")
+        except HTTPException as e:
+            all_failed = e.status_code
+        return prices, failed_over, after_failure, skipped, msft, all_failed
+    
+    prices, failed_over, after_failure, skipped, msft, all_failed = asyncio.run(run())
+    
+    assert prices == [1.0, 2.0, 2.0, 2.0]
+    assert failed_over.current_price == 1.0
+    assert after_failure.current_price == 1.0
+    assert skipped
+    assert msft.current_price == 1.0
+    assert all_failed == 503
+    
+    stats = chain.stats()
+    assert stats["failovers"] >= 2
+    assert [provider["name"] for provider in stats["providers"]] == ["slow", "fast"]
+    assert stats["providers"][1]["failures"] == 2
+
+
+def test_request_rate_limit_keyed_per_user():
+    """Test stock routes are limited per user id from the token, and idle clients expire."""
+    import asyncio
+    import time
+    from app.core.request_limits import MemoryRateLimitBackend, RateLimitPolicy, RequestRateLimiter
+    from app.core.security import create_access_token
+    
+    policy = RateLimitPolicy("stocks", 2, 60.0, "user", paths=("/stocks/",))
+    limiter = RequestRateLimiter([policy], backend=MemoryRateLimitBackend(max_keys=2))
+    
+    def scope(token=None, ip="10.0.0.1"):
+        headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+        return {"type": "http", "method": "GET", "path": "/stocks/quote/AAPL", "headers": headers, "client": (ip, 5000)}
+    
+    alice = create_access_token(data={"sub": "alice@example.com", "uid": 1})
+    bob = create_access_token(data={"sub": "bob@example.com", "uid": 2})
+    
+    assert limiter.policy_for("GET", "/stocks/quote/AAPL") is policy
+    assert limiter.policy_for("GET", "/health/cache") is None
+    assert limiter.client_key(policy, scope(alice)) == "stocks:user:1"
+    # Invalid tokens and anonymous requests are keyed by IP
+    assert limiter.client_key(policy, scope("forged.token.value")) == "stocks:ip:10.0.0.1"
+    assert limiter.client_key(policy, scope()) == "stocks:ip:10.0.0.1"
+    
+    async def run():
+        results = []
+        for token in [alice, alice, alice, bob]:
+            headers = await limiter.check(policy, limiter.client_key(policy, scope(token)))
+            results.append("Retry-After" not in headers)
+        return results
+    
+    # Alice is cut off after two; Bob has his own budget from the same IP
+    assert asyncio.run(run()) == [True, True, False, True]
+    
+    # State is bounded: the least recently used client is dropped past max_keys
+    asyncio.run(limiter.check(policy, "stocks:ip:10.0.0.9"))
+    assert len(limiter.backend) == 2
+    assert "stocks:user:1" not in limiter.backend._tats
+    
+    # A key whose burst has fully recovered carries no state and is swept
+    limiter.backend._tats["stocks:ip:10.0.0.9"] = time.time() - 1
+    limiter.backend._tats.move_to_end("stocks:ip:10.0.0.9", last=False)
+    asyncio.run(limiter.check(policy, "stocks:user:2"))
+    assert "stocks:ip:10.0.0.9" not in limiter.backend._tats
@@ -0,0 +1,116 @@
+"""
+Save benchmark results as JSON baselines and compare them across commits.
+
+A baseline file holds run metadata and a flat mapping of result names to
+metrics, for example:
+
+    {"meta": {"commit": "abc1234", ...},
+     "results": {"login@c10": {"rps": 812.4, "p50_ms": 11.2, ...}}}
+
+Latencies ("*_ms", "us_per_op") are lower-is-better and throughputs
+("rps", "*_rps") are higher-is-better. Other metrics (such as error counts and the derived
+"ops_per_sec") are kept in the file but not compared.
+
+Compare two saved files from the backend directory:
+
+    python -m benchmarks.baseline old.json new.json --max-regression 10
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+HIGHER_IS_BETTER_SUFFIXES = ("rps",)
+LOWER_IS_BETTER_SUFFIXES = ("_ms", "us_per_op")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save(path: str, kind: str, results: Dict[str, Dict[str, float]], config: Optional[dict] = None) -> None:
+    document = {
+        "meta": {
+            "kind": kind,
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": config or {},
+        },
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(document, indent=2, sort_keys=True) + "\n")
+    print(f"Saved baseline to {path}")
+
+
+def load(path: str) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def _direction(metric: str) -> int:
+    """1 if higher is better, -1 if lower is better, 0 if the metric is not judged."""
+    if metric.endswith(HIGHER_IS_BETTER_SUFFIXES):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER_SUFFIXES):
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, max_regression: float) -> Tuple[List[str], List[str]]:
+    """
+    Compare new results to old ones.
+
+    Returns report lines and the subset describing regressions worse than
+    max_regression percent.
+    """
+    lines, regressions = [], []
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        before, after = old["results"][name], new["results"][name]
+        for metric in sorted(set(before) & set(after)):
+            direction = _direction(metric)
+            if not direction or not before[metric]:
+                continue
+            change = (after[metric] - before[metric]) / before[metric] * 100
+            worse_by = -change * direction
+            line = f"{name:<28} {metric:<12} {before[metric]:>12.3f} -> {after[metric]:>12.3f} ({change:+.1f}%)"
+            if worse_by > max_regression:
+                line += "  REGRESSION"
+                regressions.append(line)
+            lines.append(line)
+    return lines, regressions
+
+
+def report(old: dict, new: dict, max_regression: float) -> int:
+    """Print a comparison and return a process exit code (1 if anything regressed)."""
+    print(f"Comparing {old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    lines, regressions = compare(old, new, max_regression)
+    for line in lines:
+        print(line)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {max_regression:g}%")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark baselines")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+    sys.exit(report(load(args.old), load(args.new), args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark the indexed alert matcher against scanning every alert per quote.
+
+Loads one million active alerts spread over 1,000 symbols, then replays
+random-walk quotes through both matchers.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_alerts
+"""
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("FINNHUB_API_KEY", "benchmark-api-key")
+
+from app.services.alerts import AlertIndex, AlertRef  # noqa: E402
+
+ALERTS = 1_000_000
+SYMBOLS = 1_000
+INDEXED_TICKS = 200_000
+SCAN_TICKS = 50
+
+
+def make_alerts(rng: random.Random, prices: dict) -> list:
+    symbols = list(prices)
+    alerts = []
+    for alert_id in range(1, ALERTS + 1):
+        symbol = rng.choice(symbols)
+        direction = rng.choice(("above", "below"))
+        # Thresholds mostly a few percent away, as users tend to set them
+        offset = abs(rng.gauss(0, 0.05))
+        threshold = prices[symbol] * (1 + offset if direction == "above" else 1 - offset)
+        alerts.append(AlertRef(alert_id, alert_id % 50_000, symbol, direction, round(threshold, 2)))
+    return alerts
+
+
+def make_ticks(rng: random.Random, prices: dict, count: int) -> list:
+    prices = dict(prices)
+    symbols = list(prices)
+    ticks = []
+    for _ in range(count):
+        symbol = rng.choice(symbols)
+        prices[symbol] *= 1 + rng.gauss(0, 0.002)
+        ticks.append((symbol, prices[symbol]))
+    return ticks
+
+
+def scan_match(alerts: dict, symbol: str, price: float) -> list:
+    """Check every active alert against the quote."""
+    crossed = [
+        alert for alert in alerts.values()
+        if alert.symbol == symbol and (
+            (alert.direction == "above" and price >= alert.threshold)
+            or (alert.direction == "below" and price <= alert.threshold)
+        )
+    ]
+    for alert in crossed:
+        del alerts[alert.id]
+    return crossed
+
+
+def main():
+    rng = random.Random(42)
+    prices = {f"S{number:04d}": rng.uniform(10, 500) for number in range(SYMBOLS)}
+    alerts = make_alerts(rng, prices)
+    ticks = make_ticks(rng, prices, INDEXED_TICKS)
+
+    index = AlertIndex()
+    start = time.perf_counter()
+    index.load(alerts)
+    print(f"load         {time.perf_counter() - start:10.2f} s for {ALERTS:,} alerts")
+
+    scan_alerts = {alert.id: alert for alert in alerts}
+    start = time.perf_counter()
+    scanned = sum(len(scan_match(scan_alerts, symbol, price)) for symbol, price in ticks[:SCAN_TICKS])
+    scan_us = (time.perf_counter() - start) / SCAN_TICKS * 1e6
+    print(f"full scan    {scan_us:10.1f} us per quote")
+
+    start = time.perf_counter()
+    fired = sum(len(index.match(symbol, price)) for symbol, price in ticks[:SCAN_TICKS])
+    assert fired == scanned
+    fired += sum(len(index.match(symbol, price)) for symbol, price in ticks[SCAN_TICKS:])
+    indexed_us = (time.perf_counter() - start) / INDEXED_TICKS * 1e6
+    print(f"indexed      {indexed_us:10.1f} us per quote ({scan_us / indexed_us:.0f}x faster)")
+    print(f"fired        {fired:10,} alerts over {INDEXED_TICKS:,} quotes, {len(index):,} still active")
+
+    start = time.perf_counter()
+    for alert in alerts[:10_000]:
+        index.add(AlertRef(alert.id + ALERTS, alert.user_id, alert.symbol, alert.direction, alert.threshold))
+    print(f"add          {(time.perf_counter() - start) / 10_000 * 1e6:10.1f} us per alert")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the vectorized indicator engine against plain Python loops.
+
+Computes SMA, EMA, RSI, MACD, Bollinger bands and VWAP over one million
+synthetic bars, then times single-bar incremental appends.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_indicators
+"""
+import math
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("FINNHUB_API_KEY", "benchmark-api-key")
+
+import numpy as np  # noqa: E402
+
+from app.services.indicators import IndicatorConfig, IndicatorSeries  # noqa: E402
+
+BARS = 1_000_000
+APPENDS = 10_000
+
+
+def naive_indicators(close, high, low, volume, config: IndicatorConfig) -> dict:
+    """Reference implementation with one Python loop iteration per bar."""
+    ema_alpha = 2 / (config.ema_period + 1)
+    fast_alpha = 2 / (config.macd_fast + 1)
+    slow_alpha = 2 / (config.macd_slow + 1)
+    signal_alpha = 2 / (config.macd_signal + 1)
+    rsi_alpha = 1 / config.rsi_period
+    ema = fast = slow = close[0]
+    signal = 0.0
+    avg_gain = avg_loss = None
+    out = {name: [] for name in ("sma", "ema", "rsi", "macd", "bollinger_upper", "vwap")}
+
+    for i, price in enumerate(close):
+        window = close[max(0, i - config.sma_period + 1):i + 1]
+        mean = sum(window) / len(window)
+        out["sma"].append(mean)
+        variance = sum((value - mean) ** 2 for value in window) / len(window)
+        out["bollinger_upper"].append(mean + config.bollinger_stddev * math.sqrt(variance))
+
+        start = max(0, i - config.vwap_period + 1)
+        typical = [(high[j] + low[j] + close[j]) / 3 * volume[j] for j in range(start, i + 1)]
+        out["vwap"].append(sum(typical) / sum(volume[start:i + 1]))
+
+        ema = ema_alpha * price + (1 - ema_alpha) * ema
+        fast = fast_alpha * price + (1 - fast_alpha) * fast
+        slow = slow_alpha * price + (1 - slow_alpha) * slow
+        signal = signal_alpha * (fast - slow) + (1 - signal_alpha) * signal
+        out["ema"].append(ema)
+        out["macd"].append(fast - slow)
+
+        if i:
+            delta = price - close[i - 1]
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            avg_gain = gain if avg_gain is None else rsi_alpha * gain + (1 - rsi_alpha) * avg_gain
+            avg_loss = loss if avg_loss is None else rsi_alpha * loss + (1 - rsi_alpha) * avg_loss
+            out["rsi"].append(100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss))
+    return out
+
+
+def main():
+    rng = np.random.default_rng(42)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, BARS + APPENDS))
+    high = close + rng.uniform(0, 1, len(close))
+    low = close - rng.uniform(0, 1, len(close))
+    volume = rng.uniform(1_000, 50_000, len(close))
+    timestamps = np.arange(len(close), dtype=np.int64) * 60
+    config = IndicatorConfig()
+
+    series = IndicatorSeries(config, max_bars=BARS + APPENDS)
+    start = time.perf_counter()
+    series.append(timestamps[:BARS], close[:BARS], high[:BARS], low[:BARS], volume[:BARS])
+    vectorized = time.perf_counter() - start
+    print(f"vectorized   {vectorized * 1000:10.1f} ms for {BARS:,} bars")
+
+    lists = [values[:BARS].tolist() for values in (close, high, low, volume)]
+    start = time.perf_counter()
+    naive = naive_indicators(*lists, config)
+    loop = time.perf_counter() - start
+    print(f"python loop  {loop * 1000:10.1f} ms for {BARS:,} bars ({loop / vectorized:.0f}x slower)")
+
+    settled = slice(config.warmup_bars, None)
+    for name in ("sma", "ema", "macd", "bollinger_upper", "vwap"):
+        assert np.allclose(series.values(name)[settled], naive[name][settled]), name
+    assert np.allclose(series.values("rsi")[settled], naive["rsi"][config.warmup_bars - 1:])
+
+    start = time.perf_counter()
+    for i in range(BARS, BARS + APPENDS):
+        series.append(timestamps[i:i + 1], close[i:i + 1], high[i:i + 1], low[i:i + 1], volume[i:i + 1])
+    per_append_us = (time.perf_counter() - start) / APPENDS * 1e6
+    print(f"append       {per_append_us:10.1f} us per new bar (buffer of {len(series):,} bars)")
+
+
+if __name__ == "__main__":
+    main()
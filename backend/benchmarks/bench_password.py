@@ -0,0 +1,140 @@
+"""
+Benchmark login cost per password hash cost level.
+
+For each cost (bcrypt log2 rounds, or argon2 time cost with --scheme argon2)
+reports verify latency (p50/p99, one at a time) and verify throughput on
+PASSWORD_HASH_WORKERS threads, the pool logins run on. With --http, each cost
+is also measured end to end: the API is started with PASSWORD_HASH_ROUNDS set
+to it and POST /auth/login is driven at --concurrency.
+
+The cost calibration would pick for --target-ms on this host is printed first.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_password --rounds 10,11,12,13 --output password.json
+    python -m benchmarks.bench_password --rounds 10,12 --http
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("FINNHUB_API_KEY", "benchmark-api-key")
+
+import httpx  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import build_password_context, calibrate_rounds  # noqa: E402
+from benchmarks import baseline  # noqa: E402
+from benchmarks.load_test import EMAIL, PASSWORD, authenticate, collect, percentile, running_api, summarize  # noqa: E402
+
+
+def verify_latency(context, hashed: str, samples: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "verify_p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "verify_p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def verify_throughput(context, hashed: str, workers: int, duration: float) -> float:
+    """Verifies per second across `workers` threads (bcrypt and argon2 release the GIL)."""
+    deadline = time.perf_counter() + duration
+
+    def worker() -> int:
+        done = 0
+        while time.perf_counter() < deadline:
+            context.verify(PASSWORD, hashed)
+            done += 1
+        return done
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        total = sum(pool.map(lambda _: worker(), range(workers)))
+    return round(total / (time.perf_counter() - start), 1)
+
+
+def measure_http(args, scheme: str, rounds: int) -> Dict[str, float]:
+    env = {"PASSWORD_HASH_SCHEME": scheme, "PASSWORD_HASH_ROUNDS": str(rounds)}
+    with running_api(args, extra_env=env) as (base_url, _):
+        async def run():
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+                await authenticate(client)
+                login = lambda c: c.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+                return summarize(*await collect(login, client, args.concurrency, args.duration))
+
+        return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login cost per password hash cost level")
+    parser.add_argument("--scheme", choices=("bcrypt", "argon2"), default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--rounds", type=lambda value: [int(r) for r in value.split(",")],
+                        help="Comma-separated cost levels (default 10-13 for bcrypt, 2-5 for argon2)")
+    parser.add_argument("--target-ms", type=float, default=settings.PASSWORD_HASH_TARGET_MS,
+                        help="Verify time target to show the calibrated cost for")
+    parser.add_argument("--samples", type=int, default=10, help="Sequential verifies per cost for latency")
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS, help="Verify threads")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of throughput measurement per cost")
+    parser.add_argument("--http", action="store_true", help="Also measure POST /auth/login end to end")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent logins with --http")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0, help=argparse.SUPPRESS)
+    parser.add_argument("--database-url", help="Database for --http instead of a temporary SQLite file")
+    parser.add_argument("--output", help="Save results to this baseline file")
+    parser.add_argument("--compare", help="Compare results to this baseline file")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+    rounds_list = args.rounds or ([10, 11, 12, 13] if args.scheme == "bcrypt" else [2, 3, 4, 5])
+
+    calibrated = calibrate_rounds(args.scheme, args.target_ms / 1000)
+    print(f"{os.cpu_count()} CPU cores; calibration picks {args.scheme} cost {calibrated} for {args.target_ms:g} ms")
+
+    results: Dict[str, Dict[str, float]] = {}
+    for rounds in rounds_list:
+        context = build_password_context(args.scheme, rounds)
+        hashed = context.hash(PASSWORD)
+        result = verify_latency(context, hashed, args.samples)
+        result["verify_rps"] = verify_throughput(context, hashed, args.workers, args.duration)
+        line = (
+            f"{args.scheme} cost {rounds:<3} verify p50 {result['verify_p50_ms']:>8.2f} ms  "
+            f"p99 {result['verify_p99_ms']:>8.2f} ms  {result['verify_rps']:>7.1f} verifies/s"
+        )
+        if args.http:
+            login = measure_http(args, args.scheme, rounds)
+            result.update({f"login_{name}": value for name, value in login.items() if name != "requests"})
+            line += (
+                f"  | login {login['rps']:>7.1f} req/s  p50 {login['p50_ms']:>8.2f} ms  "
+                f"p99 {login['p99_ms']:>8.2f} ms  errors {login['errors']}"
+            )
+        results[f"{args.scheme}@{rounds}"] = result
+        print(line)
+
+    config = {
+        "scheme": args.scheme,
+        "workers": args.workers,
+        "duration": args.duration,
+        "http": args.http,
+        "concurrency": args.concurrency,
+        "calibrated_rounds": calibrated,
+        "cpu_count": os.cpu_count(),
+    }
+    if args.output:
+        baseline.save(args.output, "password", results, config)
+    if args.compare:
+        current = {"meta": {"commit": baseline.git_commit()}, "results": results}
+        sys.exit(baseline.report(baseline.load(args.compare), current, args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
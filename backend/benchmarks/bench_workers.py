@@ -0,0 +1,138 @@
+"""
+Benchmark throughput scaling from one worker process to N.
+
+For each worker count the API is started (N > 1 uses gunicorn.conf.py and the
+shared state server) and loaded from several client processes with:
+
+    validate     GET /auth/validate (CPU bound: JWT check and serialization)
+    quote_hot    GET /stocks/quote/{one of 50 symbols} (shared quote cache)
+
+Reported per worker count: requests/sec, speedup over one worker, p50/p99
+latency and how many upstream quote calls the fake Finnhub server received.
+With the shared quote cache, upstream calls stay at about one per symbol per
+cache TTL however many workers there are.
+
+Scaling is bounded by the cores left over for the load generator, so run it
+on a machine with more cores than the largest worker count.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_workers --workers 1,2,4 --output workers.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+import httpx
+
+from benchmarks import baseline
+from benchmarks.load_test import authenticate, collect, running_api, summarize
+
+HOT_SYMBOLS = [f"S{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(50)]
+SCENARIOS = ("validate", "quote_hot")
+
+
+def _client_process(base_url: str, headers: dict, scenario: str, concurrency: int, duration: float):
+    """Load generator run in its own process so the client is not the bottleneck."""
+
+    async def run():
+        rng = random.Random(os.getpid())
+        requests = {
+            "validate": lambda c: c.get("/auth/validate", headers=headers),
+            "quote_hot": lambda c: c.get(f"/stocks/quote/{rng.choice(HOT_SYMBOLS)}", headers=headers),
+        }
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            return await collect(requests[scenario], client, concurrency, duration)
+
+    return asyncio.run(run())
+
+
+def load(base_url: str, headers: dict, scenario: str, clients: int, concurrency: int, duration: float) -> dict:
+    per_client = max(1, concurrency // clients)
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        runs = list(pool.map(
+            _client_process,
+            *zip(*[(base_url, headers, scenario, per_client, duration)] * clients),
+        ))
+    latencies = [latency for run_latencies, _, _ in runs for latency in run_latencies]
+    errors = sum(run_errors for _, run_errors, _ in runs)
+    return summarize(latencies, errors, max(elapsed for _, _, elapsed in runs))
+
+
+def upstream_quote_calls(upstream_url: str) -> int:
+    return httpx.get(f"{upstream_url}/_stats").json()["quote"]
+
+
+def measure(args, workers: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with running_api(args, workers) as (base_url, upstream_url):
+        async def login() -> dict:
+            async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+                return await authenticate(client)
+
+        headers = asyncio.run(login())
+        for scenario in args.scenarios:
+            calls_before = upstream_quote_calls(upstream_url)
+            result = load(base_url, headers, scenario, args.clients, args.concurrency, args.duration)
+            result["upstream_calls"] = upstream_quote_calls(upstream_url) - calls_before
+            results[f"{scenario}@w{workers}"] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scaling across API worker processes")
+    parser.add_argument("--workers", type=lambda value: [int(w) for w in value.split(",")],
+                        default=sorted({1, 2, os.cpu_count() or 1}), help="Comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=max(2, (os.cpu_count() or 2) // 2),
+                        help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent requests across all clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario and worker count")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0, help="Fake Finnhub response delay")
+    parser.add_argument("--database-url", help="Database to test against instead of a temporary SQLite file")
+    parser.add_argument("--output", help="Save results to this baseline file")
+    parser.add_argument("--compare", help="Compare results to this baseline file")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    print(f"{os.cpu_count()} CPU cores, {args.clients} client processes, concurrency {args.concurrency}")
+    results: Dict[str, Dict[str, float]] = {}
+    single: Dict[str, float] = {}
+    for workers in args.workers:
+        for name, result in measure(args, workers).items():
+            scenario = name.split("@")[0]
+            single.setdefault(scenario, result["rps"])
+            result["speedup"] = round(result["rps"] / single[scenario], 2) if single[scenario] else 0.0
+            results[name] = result
+            print(
+                f"{name:<16} {result['rps']:>9.1f} req/s  x{result['speedup']:<5.2f} "
+                f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+                f"upstream calls {result['upstream_calls']:>5}  errors {result['errors']}"
+            )
+
+    config = {
+        "workers": args.workers,
+        "clients": args.clients,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "cpu_count": os.cpu_count(),
+    }
+    if args.output:
+        baseline.save(args.output, "workers", results, config)
+    if args.compare:
+        current = {"meta": {"commit": baseline.git_commit()}, "results": results}
+        sys.exit(baseline.report(baseline.load(args.compare), current, args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Minimal stand-in for the Finnhub API used by the load tests.
+
+Serves deterministic quotes for any symbol so benchmarks run without network
+access or an API key. Each response is delayed by FAKE_FINNHUB_LATENCY_MS
+(default 20) to approximate a real upstream round trip. GET /_stats reports
+how many upstream calls it has served.
+
+Run from the backend directory:
+
+    uvicorn benchmarks.fake_finnhub:app --port 8900
+"""
+import asyncio
+import json
+import os
+import time
+import zlib
+from urllib.parse import parse_qs
+
+LATENCY_SECONDS = float(os.environ.get("FAKE_FINNHUB_LATENCY_MS", "20")) / 1000
+
+served = {"quote": 0, "candle": 0}
+
+
+def quote_for(symbol: str) -> dict:
+    """A stable quote per symbol, with a price in [10, 1010)."""
+    base = 10 + zlib.crc32(symbol.encode()) % 100_000 / 100
+    return {
+        "c": round(base, 2),
+        "d": round(base * 0.01, 2),
+        "dp": 1.0,
+        "h": round(base * 1.02, 2),
+        "l": round(base * 0.98, 2),
+        "o": round(base * 0.995, 2),
+        "pc": round(base * 0.99, 2),
+        "t": int(time.time()),
+    }
+
+
+async def _send_json(send, status: int, body: dict) -> None:
+    payload = json.dumps(body).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"].rstrip("/")
+    if path == "/_stats":
+        await _send_json(send, 200, served)
+        return
+
+    params = {key: values[0] for key, values in parse_qs(scope["query_string"].decode()).items()}
+    if LATENCY_SECONDS:
+        await asyncio.sleep(LATENCY_SECONDS)
+
+    if path.endswith("/quote"):
+        served["quote"] += 1
+        await _send_json(send, 200, quote_for(params.get("symbol", "")))
+    elif path.endswith("/stock/candle"):
+        served["candle"] += 1
+        await _send_json(send, 200, {"s": "no_data"})
+    else:
+        await _send_json(send, 404, {"error": "Not found"})
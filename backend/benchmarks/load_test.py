@@ -0,0 +1,264 @@
+"""
+Load test the auth and quote hot paths against a locally started API.
+
+Starts the fake Finnhub server and the API under uvicorn on free local ports,
+with a throwaway SQLite database (or --database-url, e.g. a local MySQL),
+signs up a benchmark user and then drives each scenario for a fixed time at
+several concurrency levels, reporting requests/sec and p50/p95/p99 latency:
+
+    login              POST /auth/login (password hash bound)
+    validate           GET /auth/validate
+    quote_cached       GET /stocks/quote/AAPL (served from the quote cache)
+    quote_revalidated  the same with If-None-Match of its ETag (304, no body)
+    quote_uncached     GET /stocks/quote/{random symbol} (fake upstream round trip)
+
+With --provider replay the API serves quotes from a generated tick file
+through the replay provider instead of calling the fake Finnhub server, and
+quote_uncached picks from the recorded symbols.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --output baseline.json
+    python -m benchmarks.load_test --compare baseline.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import baseline, ticks
+
+EMAIL = "loadtest@example.com"
+PASSWORD = "loadtest-password1"
+SCENARIOS = ("login", "validate", "quote_cached", "quote_revalidated", "quote_uncached")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def start_server(module: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    """Serve an ASGI app with uvicorn, or with the production gunicorn config for several workers."""
+    if workers > 1:
+        command = [
+            sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", module,
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning",
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", module, "--port", str(port), "--log-level", "warning", "--no-access-log",
+        ]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server for {url} did not start within {timeout:.0f}s")
+
+
+@contextmanager
+def running_api(
+    args,
+    workers: int = 1,
+    replay_symbols: Optional[List[str]] = None,
+    extra_env: Optional[Dict[str, str]] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Start the fake upstream and the API, yielding their base URLs.
+
+    With `replay_symbols`, the API replays a generated tick file for them
+    instead of calling the fake upstream. `extra_env` overrides API settings.
+    """
+    finnhub_port, api_port = free_port(), free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_URL": args.database_url or f"sqlite:///{tmp}/loadtest.db?check_same_thread=false",
+            "SECRET_KEY": os.environ.get("SECRET_KEY", "loadtest-secret-key"),
+            "FINNHUB_API_KEY": "loadtest-api-key",
+            "FINNHUB_BASE_URL": f"http://127.0.0.1:{finnhub_port}/api/v1",
+            "FAKE_FINNHUB_LATENCY_MS": str(args.upstream_latency_ms),
+            # Measure the service, not the free-tier upstream quota
+            "UPSTREAM_RATE_LIMIT_PER_SECOND": "0",
+            "INGESTION_ENABLED": "false",
+            # The login scenario alone would exhaust the per-IP auth limit
+            "RATE_LIMIT_ENABLED": "false",
+            **(extra_env or {}),
+        }
+        if replay_symbols:
+            replay_file = os.path.join(tmp, "ticks.jsonl")
+            ticks.write_ticks(replay_file, replay_symbols, duration=3600, interval=5)
+            env.update(QUOTE_PROVIDER="replay", QUOTE_REPLAY_FILE=replay_file)
+        processes = [start_server("benchmarks.fake_finnhub:app", finnhub_port, env)]
+        try:
+            wait_until_ready(f"http://127.0.0.1:{finnhub_port}/api/v1/quote?symbol=AAPL", processes[0])
+            processes.append(start_server("app.main:app", api_port, env, workers))
+            wait_until_ready(f"http://127.0.0.1:{api_port}/health", processes[1])
+            yield f"http://127.0.0.1:{api_port}", f"http://127.0.0.1:{finnhub_port}"
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=10)
+
+
+async def collect(
+    request: Callable[[httpx.AsyncClient], Awaitable[httpx.Response]],
+    client: httpx.AsyncClient,
+    concurrency: int,
+    duration: float,
+) -> Tuple[List[float], int, float]:
+    """Run `concurrency` closed-loop workers for `duration` seconds; return latencies, errors and elapsed time."""
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await request(client)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def random_symbol(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_uppercase, k=5))
+
+
+async def authenticate(client: httpx.AsyncClient) -> Dict[str, str]:
+    """Sign up the benchmark user if needed and return bearer auth headers."""
+    response = await client.post("/auth/signup", json={"email": EMAIL, "password": PASSWORD})
+    if response.status_code != 400:  # Already registered when reusing --database-url
+        response.raise_for_status()
+    response = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(base_url: str, args, replay_symbols: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(0)
+    cached_symbol = replay_symbols[0] if replay_symbols else "AAPL"
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        headers = await authenticate(client)
+        # Warm the cache for the cached scenarios
+        warm = await client.get(f"/stocks/quote/{cached_symbol}", headers=headers)
+        warm.raise_for_status()
+        revalidate_headers = {**headers, "If-None-Match": warm.headers["etag"]}
+
+        requests = {
+            "login": lambda c: c.post("/auth/login", json={"email": EMAIL, "password": PASSWORD}),
+            "validate": lambda c: c.get("/auth/validate", headers=headers),
+            "quote_cached": lambda c: c.get(f"/stocks/quote/{cached_symbol}", headers=headers),
+            "quote_revalidated": lambda c: c.get(f"/stocks/quote/{cached_symbol}", headers=revalidate_headers),
+            "quote_uncached": lambda c: c.get(
+                f"/stocks/quote/{rng.choice(replay_symbols) if replay_symbols else random_symbol(rng)}",
+                headers=headers,
+            ),
+        }
+
+        results = {}
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                result = summarize(*await collect(requests[scenario], client, concurrency, args.duration))
+                name = f"{scenario}@c{concurrency}"
+                results[name] = result
+                print(
+                    f"{name:<22} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+                    f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}"
+                )
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test auth and quote endpoints")
+    parser.add_argument("--concurrency", type=lambda value: [int(c) for c in value.split(",")], default=[1, 10, 50],
+                        help="Comma-separated concurrency levels (default 1,10,50)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario and level")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0, help="Fake Finnhub response delay")
+    parser.add_argument("--database-url", help="Database to test against instead of a temporary SQLite file")
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes (more than 1 runs gunicorn)")
+    parser.add_argument("--provider", choices=("fake-finnhub", "replay"), default="fake-finnhub",
+                        help="Quote source: the fake Finnhub server or replayed ticks")
+    parser.add_argument("--replay-symbols", type=int, default=1000, help="Symbols in the replayed tick file")
+    parser.add_argument("--output", help="Save results to this baseline file")
+    parser.add_argument("--compare", help="Compare results to this baseline file")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    replay_symbols = ticks.symbols(args.replay_symbols) if args.provider == "replay" else None
+    with running_api(args, args.workers, replay_symbols) as (base_url, _):
+        results = asyncio.run(run(base_url, args, replay_symbols))
+
+    config = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "upstream_latency_ms": args.upstream_latency_ms,
+        "database": "custom" if args.database_url else "sqlite",
+        "workers": args.workers,
+        "provider": args.provider,
+    }
+    if args.output:
+        baseline.save(args.output, "load_test", results, config)
+    if args.compare:
+        current = {"meta": {"commit": baseline.git_commit()}, "results": results}
+        sys.exit(baseline.report(baseline.load(args.compare), current, args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
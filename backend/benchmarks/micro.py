@@ -0,0 +1,105 @@
+"""
+Micro-benchmarks for the per-request CPU work on the auth and quote paths.
+
+    decode_access_token (verified-token cache on and off)
+    verify_password     (at the password hasher's starting cost; see bench_password)
+    parse_quote         (Finnhub body to StockQuoteResponse)
+    quote_json          (StockQuoteResponse to a JSON response body)
+
+Run from the backend directory:
+
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.micro --compare micro.json
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("FINNHUB_API_KEY", "benchmark-api-key")
+
+from app.core.security import (  # noqa: E402
+    create_access_token,
+    decode_access_token,
+    get_password_hash,
+    verified_token_cache,
+    verify_password,
+)
+from app.core.responses import JSON_MEDIA_TYPE, encode  # noqa: E402
+from app.services.providers import parse_quote  # noqa: E402
+from benchmarks import baseline  # noqa: E402
+from benchmarks.fake_finnhub import quote_for  # noqa: E402
+
+
+def measure(name: str, fn: Callable[[], object], iterations: int, repeats: int = 5) -> Dict[str, float]:
+    """Best of `repeats` runs of `iterations` calls, to damp scheduler noise."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    result = {"us_per_op": round(best * 1e6, 3), "ops_per_sec": round(1 / best, 1)}
+    print(f"{name:<24} {result['us_per_op']:>12.3f} us/op  {result['ops_per_sec']:>12.1f} ops/s")
+    return result
+
+
+def run(scale: float) -> Dict[str, Dict[str, float]]:
+    def iterations(count: int) -> int:
+        return max(1, int(count * scale))
+
+    results = {}
+    token = create_access_token(data={"sub": "bench@example.com", "uid": 1})
+
+    cache_size = verified_token_cache.max_size
+    try:
+        verified_token_cache.clear()
+        verified_token_cache.max_size = 0
+        results["decode_access_token_uncached"] = measure(
+            "decode_access_token", lambda: decode_access_token(token), iterations(20_000)
+        )
+        verified_token_cache.max_size = cache_size or 10_000
+        decode_access_token(token)
+        results["decode_access_token_cached"] = measure(
+            "  with token cache", lambda: decode_access_token(token), iterations(200_000)
+        )
+    finally:
+        verified_token_cache.max_size = cache_size
+        verified_token_cache.clear()
+
+    hashed = get_password_hash("benchmark-password")
+    results["verify_password"] = measure(
+        "verify_password", lambda: verify_password("benchmark-password", hashed), iterations(10), repeats=3
+    )
+
+    body = quote_for("AAPL")
+    results["parse_quote"] = measure("parse_quote", lambda: parse_quote("AAPL", body), iterations(100_000))
+
+    quote = parse_quote("AAPL", body)
+    results["quote_json"] = measure(
+        "quote_json", lambda: encode(JSON_MEDIA_TYPE, quote), iterations(100_000)
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark auth and quote helpers")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply iteration counts (e.g. 0.1 for a smoke run)")
+    parser.add_argument("--output", help="Save results to this baseline file")
+    parser.add_argument("--compare", help="Compare results to this baseline file")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    results = run(args.scale)
+    if args.output:
+        baseline.save(args.output, "micro", results, {"scale": args.scale})
+    if args.compare:
+        current = {"meta": {"commit": baseline.git_commit()}, "results": results}
+        sys.exit(baseline.report(baseline.load(args.compare), current, args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
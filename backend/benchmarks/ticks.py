@@ -0,0 +1,69 @@
+"""
+Write a synthetic tick file for the replay quote provider.
+
+Each symbol gets a seeded random walk around its fake Finnhub price, one tick
+per --interval seconds, so the same arguments always produce the same file.
+Lines are Finnhub /quote bodies plus the symbol, the format recorded ticks
+are replayed from.
+
+Run from the backend directory, then point the API at the file:
+
+    python -m benchmarks.ticks --symbols 500 --duration 3600 --output ticks.jsonl
+    QUOTE_PROVIDER=replay QUOTE_REPLAY_FILE=ticks.jsonl uvicorn app.main:app
+"""
+import argparse
+import random
+import string
+from typing import List
+
+import orjson
+
+from benchmarks.fake_finnhub import quote_for
+
+# Recording start (2024-01-02 14:30 UTC, a market open)
+START_TIMESTAMP = 1704205800
+
+
+def symbols(count: int, seed: int = 0) -> List[str]:
+    """`count` distinct random symbols, stable for a seed."""
+    rng = random.Random(seed)
+    chosen = {}
+    while len(chosen) < count:
+        chosen["".join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 5)))] = None
+    return list(chosen)
+
+
+def write_ticks(path: str, symbol_list: List[str], duration: float, interval: float, seed: int = 0) -> int:
+    """Write ticks for every symbol, in time order, and return how many were written."""
+    rng = random.Random(seed)
+    quotes = {symbol: quote_for(symbol) for symbol in symbol_list}
+    written = 0
+    with open(path, "wb") as f:
+        steps = int(duration // interval) + 1
+        for step in range(steps):
+            timestamp = START_TIMESTAMP + step * interval
+            for symbol, quote in quotes.items():
+                price = round(max(0.01, quote["c"] * (1 + rng.gauss(0, 0.001))), 2)
+                quote.update(c=price, h=max(quote["h"], price), l=min(quote["l"], price), t=timestamp)
+                quote["d"] = round(price - quote["pc"], 2)
+                quote["dp"] = round(quote["d"] / quote["pc"] * 100, 4)
+                f.write(orjson.dumps({"symbol": symbol, **quote}) + b"\n")
+                written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic tick file for the replay provider")
+    parser.add_argument("--symbols", type=int, default=100, help="Number of symbols")
+    parser.add_argument("--duration", type=float, default=3600.0, help="Recorded seconds")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between ticks per symbol")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Tick file to write")
+    args = parser.parse_args()
+
+    written = write_ticks(args.output, symbols(args.symbols, args.seed), args.duration, args.interval, args.seed)
+    print(f"Wrote {written} ticks for {args.symbols} symbols to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
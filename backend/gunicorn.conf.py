@@ -0,0 +1,72 @@
+"""
+Production multi-worker mode.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Runs WEB_CONCURRENCY uvicorn workers (default: one per CPU core) and starts
+the shared state server they use for cached quotes, revoked tokens, the
+upstream rate-limit budget, request rate limits and the ingestion leader
+lease. The password hashing cost is calibrated once here, so all workers
+agree on it. Revocations and both rate limits are moved from the per-process
+"memory" backend to "local" so they are not tracked separately in every
+worker.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+bind = os.environ.get("BIND", "0.0.0.0:7777")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Streams are long-lived, so only a silent worker is considered hung
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    from app.core.config import settings
+
+    overrides = {"SHARED_STATE_SOCKET": settings.SHARED_STATE_SOCKET or os.path.join(
+        tempfile.gettempdir(), f"stockapp-state-{os.getpid()}.sock"
+    )}
+    if settings.TOKEN_BLACKLIST_BACKEND == "memory":
+        overrides["TOKEN_BLACKLIST_BACKEND"] = "local"
+    if settings.UPSTREAM_RATE_LIMIT_BACKEND == "memory":
+        overrides["UPSTREAM_RATE_LIMIT_BACKEND"] = "local"
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        overrides["RATE_LIMIT_BACKEND"] = "local"
+    if settings.PASSWORD_HASH_ROUNDS <= 0:
+        from app.core.security import password_hasher
+
+        # Calibrated once here rather than in each worker, so they all hash at the same
+        # cost. Forked workers inherit the calibrated hasher; a re-executed master reads the env.
+        overrides["PASSWORD_HASH_ROUNDS"] = str(password_hasher.calibrate())
+    # Workers are forked with this settings object already imported, so update it
+    # as well as the environment (which a re-executed master reads)
+    for name, value in overrides.items():
+        os.environ[name] = value
+        setattr(settings, name, int(value) if name == "PASSWORD_HASH_ROUNDS" else value)
+    path = overrides["SHARED_STATE_SOCKET"]
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server.shared_state_process = subprocess.Popen(
+        [sys.executable, "-m", "app.core.shared_state", "--socket", path]
+    )
+    deadline = time.monotonic() + 10
+    while not os.path.exists(path):
+        if server.shared_state_process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Shared state server failed to start")
+        time.sleep(0.05)
+    server.log.info("Shared state server listening on %s", path)
+
+
+def on_exit(server):
+    process = getattr(server, "shared_state_process", None)
+    if process is not None:
+        process.terminate()
+        process.wait(timeout=10)